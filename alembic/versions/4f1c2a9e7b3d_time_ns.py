@@ -0,0 +1,63 @@
+"""store timeseries times as integer nanoseconds
+
+Revision ID: 4f1c2a9e7b3d
+Revises: 82b5d89d34d6
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import pandas as pd
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1c2a9e7b3d'
+down_revision = '82b5d89d34d6'
+branch_labels = None
+depends_on = None
+
+timeseries = sa.table(
+    'timeseries',
+    sa.column('tsid', sa.Integer()),
+    sa.column('time', sa.DateTime(timezone=True)),
+    sa.column('time_ns', sa.BigInteger()),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('timeseries') as batch_op:
+        batch_op.add_column(sa.Column('time_ns', sa.BigInteger(), nullable=True))
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(timeseries.c.tsid, timeseries.c.time)).all()
+    if rows:
+        tsids, times = zip(*rows)
+        # stored times have always been UTC, even where the zone was dropped
+        nanoseconds = pd.to_datetime(list(times), utc=True).asi8.tolist()
+        connection.execute(
+            timeseries.update()
+            .where(timeseries.c.tsid == sa.bindparam('_tsid'))
+            .values(time_ns=sa.bindparam('_time_ns')),
+            [{'_tsid': x, '_time_ns': y} for x, y in zip(tsids, nanoseconds)],
+        )
+    with op.batch_alter_table('timeseries') as batch_op:
+        batch_op.drop_column('time')
+
+
+def downgrade():
+    with op.batch_alter_table('timeseries') as batch_op:
+        batch_op.add_column(
+            sa.Column('time', sa.DateTime(timezone=True), nullable=True)
+        )
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(timeseries.c.tsid, timeseries.c.time_ns)).all()
+    if rows:
+        tsids, nanoseconds = zip(*rows)
+        times = pd.to_datetime(list(nanoseconds), utc=True).to_pydatetime().tolist()
+        connection.execute(
+            timeseries.update()
+            .where(timeseries.c.tsid == sa.bindparam('_tsid'))
+            .values(time=sa.bindparam('_time')),
+            [{'_tsid': x, '_time': y} for x, y in zip(tsids, times)],
+        )
+    with op.batch_alter_table('timeseries') as batch_op:
+        batch_op.drop_column('time_ns')
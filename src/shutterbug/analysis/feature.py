@@ -3,6 +3,7 @@ from abc import ABC, abstractmethod
 import numpy as np
 import pandas as pd
 from attr import define, field
+from shutterbug.data.star import ACCUMULATOR_DTYPE
 
 
 @define(slots=True, eq=False)
@@ -22,6 +23,7 @@ class IQR(FeatureBase):
     name: str = field(init=False, default="IQR")
 
     def __call__(self, data: pd.Series) -> float:
+        data = data.astype(ACCUMULATOR_DTYPE)
         q3 = data.quantile(q=0.75)
         q1 = data.quantile(q=0.25)
         # Return as only single value
@@ -40,7 +42,7 @@ class InverseVonNeumann(FeatureBase):
             raise ValueError(
                 "The Von Neumann test requires more than two numbers to operate"
             )
-        numbers = data.to_numpy(dtype="float32")
+        numbers = data.to_numpy(dtype=ACCUMULATOR_DTYPE)
         i_plus_1 = numbers[1:]  # Get all numbers past the first
         i = numbers[:-1]  # Get all numbers until the last
         d = np.sum((i_plus_1 - i) ** 2) / len(i)  # type: ignore
@@ -1,6 +1,6 @@
 import logging
 from pathlib import Path
-from typing import Generator, List, Tuple, Literal, Union
+from typing import Any, Dict, Generator, List, Optional, Tuple, Literal, Union
 from attr import define
 
 from sqlalchemy.engine import Engine
@@ -13,6 +13,7 @@ from shutterbug.data import Dataset, DBReader, DBWriter
 from shutterbug.data.file import FileInput
 from shutterbug.data.graphing.builder import BuilderBase
 from shutterbug.data.graphing.seaborn_builder import SeabornBuilder
+from shutterbug.data.index import IndexCache
 from shutterbug.data.interfaces.external import Input
 from shutterbug.data.interfaces.internal import Reader, Writer
 from shutterbug.init import (
@@ -74,8 +75,26 @@ def initialize_application(
     return config, database
 
 
-def make_file_loader(path: Path) -> Input:
-    return FileInput(path)
+def make_file_loader(
+    path: Path,
+    index_folder: Optional[Path] = None,
+    index_checksum: bool = False,
+    csv_engine: str = "python",
+    workers: int = 1,
+    parse_workers: int = 1,
+    memory_limit: float = 0,
+) -> Input:
+    loader_options: Dict[str, Any] = {
+        "engine": csv_engine,
+        "parse_workers": parse_workers,
+    }
+    if memory_limit > 0:
+        loader_options["memory_limit"] = int(memory_limit * (1 << 20))
+    if index_folder is not None:
+        loader_options["index_cache"] = IndexCache(
+            folder=index_folder, checksum=index_checksum
+        )
+    return FileInput(path, loader_options=loader_options, workers=workers)
 
 
 def make_reader_writer(
@@ -87,6 +106,8 @@ def make_reader_writer(
             session=session,
             mag_limit=magnitude_limit,
             distance_limit=distance_limit,
+            compact=True,
+            lazy=True,
         )
         writer = DBWriter(dataset=dataset_name, session=session)
         yield reader, writer
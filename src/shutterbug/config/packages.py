@@ -6,6 +6,7 @@ from typing import Any, Dict, Union
 
 from attr import asdict, define, field, fields
 from attr.filters import exclude
+from attr.validators import in_
 from shutterbug.config.interfaces.internal import PackageConfig
 
 
@@ -19,6 +20,13 @@ def to_folder(value: Union[str, Path]) -> Path:
     return new_path
 
 
+def to_bool(value: Union[str, bool]) -> bool:
+    """Takes a string or boolean and returns it as a boolean"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("true", "yes", "on", "1")
+
+
 class PackageBase(PackageConfig):
     # as all the Package dataclasses have utility methods as the same
     # implementation, a base class makes sense
@@ -64,6 +72,15 @@ class DataConfig(PackageBase):
     )
     output_folder: Path = field(converter=to_folder, default=Path().cwd())
     database_url: str = field(default=f"sqlite:///{Path.home()}/.shutterbug/db.sqlite")
+    index_folder: Path = field(
+        converter=to_folder, default=Path().home() / ".shutterbug" / "index"
+    )
+    index_checksum: bool = field(converter=to_bool, default=False)
+    csv_engine: str = field(validator=in_(["python", "c"]), default="python")
+    workers: int = field(converter=int, default=1)
+    parse_workers: int = field(converter=int, default=1)
+    # in MiB, 0 to hold entire files in memory
+    memory_limit: float = field(converter=float, default=0)
 
 
 @define(kw_only=True, slots=True, auto_attribs=True)
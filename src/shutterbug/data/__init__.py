@@ -4,4 +4,5 @@ from .db.writer import DBWriter
 from .file import FileInput
 from .graphing.builder import BuilderBase
 from .interfaces.external import Loader
-from .star import Star, StarTimeseries
+from .matrix import LeaveOneOut, StarMatrix
+from .star import ArrayTimeseries, Star, StarTimeseries
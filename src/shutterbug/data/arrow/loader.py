@@ -0,0 +1,139 @@
+import logging
+from pathlib import Path
+from typing import Any, Dict, Generator, List, Literal, Optional, Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from attr import define, field
+from shutterbug.data.csv.columnar import split_by_name
+from shutterbug.data.star import Star, asdatetime, asfloat
+from shutterbug.data.validate import validate_batch
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    ds = None
+
+
+def astime(column: Any) -> pd.DatetimeIndex:
+    """Converts an arrow column to times, using native timestamps as they are and
+    parsing any other column as a CSV time column would be"""
+    if pa.types.is_timestamp(column.type):
+        times = pd.to_datetime(column.to_numpy(zero_copy_only=False), utc=True)
+        return pd.DatetimeIndex(times.round("1us"), name="time")
+    return asdatetime(column.to_numpy(zero_copy_only=False))
+
+
+@define(slots=True)
+class ArrowLoader:
+    """Loads stars from a Parquet or Feather file, reading only the columns the
+    known header needs straight into typed arrays"""
+
+    input_file: Path = field()
+    file_format: Literal["parquet", "feather"] = field()
+    # Name of the star name, x, y, time, magnitude and error columns in the file
+    columns: List[str] = field()
+    _stars: Dict[str, slice] = field(init=False)
+    _time: pd.DatetimeIndex = field(init=False)
+    _magnitude: npt.NDArray[np.float32] = field(init=False)
+    _error: npt.NDArray[np.float32] = field(init=False)
+    _x: npt.NDArray[np.float64] = field(init=False)
+    _y: npt.NDArray[np.float64] = field(init=False)
+    # rows kept by validation and reason every rejected star is rejected
+    _keep: npt.NDArray[np.bool_] = field(init=False)
+    _rejected: Dict[str, str] = field(init=False)
+
+    def _read(self, name: Optional[str] = None) -> Any:
+        """Reads the needed columns of the file, only the rows of the given star if
+        there is one"""
+        dataset = ds.dataset(self.input_file, format=self.file_format)
+        row_filter = None if name is None else ds.field(self.columns[0]) == name
+        return dataset.to_table(columns=self.columns, filter=row_filter)
+
+    def _star_count(self) -> Dict[str, slice]:
+        """Reads the needed columns of the entire file once, groups every row by
+        star and returns the slice of the grouped columns each star occupies"""
+        try:
+            return self._stars
+        except AttributeError:
+            logging.debug(f"Reading columns of {self.input_file.name}")
+            table = self._read()
+            name, x, y, time, magnitude, error = table.columns
+            order, names, bounds = split_by_name(name.to_numpy(zero_copy_only=False))
+            self._time = astime(time)[order]
+            self._magnitude = asfloat(magnitude.to_numpy(zero_copy_only=False)[order])
+            self._error = asfloat(error.to_numpy(zero_copy_only=False)[order])
+            self._x = pd.to_numeric(x.to_numpy(zero_copy_only=False)[order])
+            self._y = pd.to_numeric(y.to_numpy(zero_copy_only=False)[order])
+            # validated all at once instead of star by star
+            validation = validate_batch(bounds, self._magnitude, self._error)
+            self._keep = validation.keep
+            self._rejected = {
+                name: reason
+                for name, reason in zip(names, validation.reasons)
+                if reason is not None
+            }
+            self._stars = {
+                name: slice(start, end)
+                for name, start, end in zip(names, bounds[:-1], bounds[1:])
+            }
+            return self._stars
+
+    def __len__(self):
+        """Number of stars in given file"""
+        return len(self._star_count())
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._star_count().keys())
+
+    def _make_star(self, name: str, rows: slice) -> Union[Star, None]:
+        """Builds a star from the slice of the grouped columns it occupies"""
+        if name in self._rejected:
+            logging.error(
+                f"Unable to create timeseries, received error: {self._rejected[name]}"
+            )
+            return None
+        keep = self._keep[rows]
+        if keep.all():
+            keep = slice(None)
+        return Star.from_arrays(
+            name=name,
+            x=self._x[rows.start],
+            y=self._y[rows.start],
+            time=self._time[rows][keep],
+            magnitude=self._magnitude[rows][keep],
+            error=self._error[rows][keep],
+            validate=False,
+        )
+
+    def get(self, name: str) -> Union[Star, None]:
+        if hasattr(self, "_stars"):
+            if name in self._stars:
+                return self._make_star(name, self._stars[name])
+            return None
+        # only the star's own rows need to be read from the file
+        table = self._read(name)
+        if table.num_rows == 0:
+            return None
+        _, x, y, time, magnitude, error = table.columns
+        return Star.from_arrays(
+            name=name,
+            x=pd.to_numeric(x.to_numpy(zero_copy_only=False))[0],
+            y=pd.to_numeric(y.to_numpy(zero_copy_only=False))[0],
+            time=astime(time),
+            magnitude=asfloat(magnitude.to_numpy(zero_copy_only=False)),
+            error=asfloat(error.to_numpy(zero_copy_only=False)),
+        )
+
+    def __iter__(self) -> Generator[Star, None, None]:
+        for star_name, rows in self._star_count().items():
+            try:
+                star = self._make_star(star_name, rows)
+                if star is not None:
+                    yield star
+            except ValueError as e:
+                logging.warning(f"Unable to load star {star_name} due to error: {e}")
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from shutterbug.data.arrow.loader import ArrowLoader, ds
+from shutterbug.data.compression import is_compressed
+from shutterbug.data.header import match_known_header
+
+FORMATS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+}
+
+READABLE_TYPES = set(FORMATS.keys())
+
+
+def make_loader(file_path: Path, **_kwargs) -> ArrowLoader:
+
+    """Takes a file path and creates an ArrowLoader to consume stars from a Parquet
+    or Feather file
+
+    :param file_path: Path to Parquet or Feather file
+    :returns: FileLoader that loads each star from the file's columns
+
+    """
+    if ds is None:
+        raise ValueError(
+            f"Cannot read {file_path.name}, Parquet and Feather files require the pyarrow package"
+        )
+    if is_compressed(file_path):
+        raise ValueError(
+            f"Cannot load {file_path.name}, compress the file's columns instead"
+        )
+    file_format = FORMATS[file_path.suffix.lower()]
+    try:
+        raw_headers = ds.dataset(file_path, format=file_format).schema.names
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read {file_path.name}: {e}")
+    headers = match_known_header(raw_headers)
+    # known header names are cleaned, the file's own names are needed to read them
+    indices = [*headers.star_indices, *headers.timeseries_indices]
+    return ArrowLoader(
+        input_file=file_path,
+        file_format=file_format,  # type: ignore
+        columns=[raw_headers[x] for x in indices],
+    )
@@ -0,0 +1,77 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from attr import define, field
+
+
+@define(slots=True, frozen=True, eq=False)
+class TimeAxis:
+    """Exposure times shared by every star of a dataset observed at the same
+    epochs. Stars on the same axis can be aligned by position instead of by time"""
+
+    time: pd.DatetimeIndex = field()
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def expand(
+        self, values: npt.ArrayLike, mask: Optional[npt.NDArray[np.bool_]] = None
+    ) -> npt.NDArray[np.float64]:
+        """Places the values of a star on this axis at their epochs' positions,
+        leaving NaN at any epoch the star is missing"""
+        if mask is None:
+            return np.asarray(values, dtype=np.float64)
+        expanded = np.full(len(self.time), np.nan)
+        expanded[mask] = values
+        return expanded
+
+
+@define(slots=True)
+class TimeAxisRegistry:
+    """Interns the time axes of the stars of one dataset, so that stars with the
+    same epochs share one index and stars missing epochs refer to the full axis"""
+
+    _axes: Dict[bytes, TimeAxis] = field(init=False, factory=dict)
+    _widest: Optional[TimeAxis] = field(init=False, default=None)
+
+    def intern(
+        self, time: pd.DatetimeIndex
+    ) -> Tuple[pd.DatetimeIndex, TimeAxis, Optional[npt.NDArray[np.bool_]]]:
+        """Finds the shared axis for a star's times
+
+        Parameters
+        ----------
+        time : pd.DatetimeIndex
+            Times of the star, in order
+
+        Returns
+        -------
+        Tuple[pd.DatetimeIndex, TimeAxis, Optional[npt.NDArray[np.bool_]]]
+            Index to use for the star, shared with every star with the same times,
+            the axis the star is on and, if the star is missing some of that
+            axis' epochs, which epochs it has
+
+        """
+        key = time.asi8.tobytes()
+        axis = self._axes.get(key)
+        if axis is not None:
+            return axis.time, axis, None
+        widest = self._widest
+        if widest is not None and len(time) < len(widest):
+            positions = widest.time.get_indexer(time)
+            if np.all(positions >= 0) and np.all(np.diff(positions) > 0):
+                mask = np.zeros(len(widest), dtype=np.bool_)
+                mask[positions] = True
+                return time, widest, mask
+        axis = TimeAxis(time=time)
+        self._axes[key] = axis
+        # only an axis without repeated times can hold the epochs of others
+        if time.is_unique and (widest is None or len(time) > len(widest)):
+            self._widest = axis
+        return axis.time, axis, None
+
+    def __len__(self) -> int:
+        """Number of distinct axes"""
+        return len(self._axes)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import numpy.typing as npt
+from attr import define, field
+
+
+@define(slots=True)
+class StarCatalog:
+    """Assigns every star of a dataset a dense integer ID, its position in the
+    catalog, so that sets of stars can be held and combined as integer arrays.
+    Names are only needed to show or export a star"""
+
+    names: List[str] = field()
+    # Primary key of each star in its source, if the source has one
+    keys: npt.NDArray[np.int64] = field()
+    _ids: Dict[str, int] = field(init=False)
+    _by_key: Dict[int, int] = field(init=False)
+
+    def __attrs_post_init__(self):
+        self._ids = {name: idx for idx, name in enumerate(self.names)}
+        self._by_key = {key: idx for idx, key in enumerate(self.keys.tolist())}
+
+    @classmethod
+    def from_names(
+        cls, names: Iterable[str], keys: Optional[Iterable[int]] = None
+    ) -> StarCatalog:
+        """Builds a catalog of the given stars, in the order given
+
+        Parameters
+        ----------
+        names : Iterable[str]
+            Names of every star of the dataset
+        keys : Optional[Iterable[int]]
+            Primary key of each star in its source, defaults to the star's ID
+
+        Returns
+        -------
+        StarCatalog
+            Catalog of the stars
+
+        """
+        names = list(names)
+        if keys is None:
+            key_array = np.arange(len(names), dtype=np.int64)
+        else:
+            key_array = np.fromiter(keys, dtype=np.int64, count=len(names))
+        return cls(names=names, keys=key_array)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def id_of(self, name: str) -> int:
+        return self._ids[name]
+
+    def ids_of(self, names: Iterable[str]) -> npt.NDArray[np.int64]:
+        return np.fromiter((self._ids[x] for x in names), dtype=np.int64)
+
+    def ids_of_keys(self, keys: Iterable[int]) -> npt.NDArray[np.int64]:
+        """IDs of the stars with the given primary keys, sorted"""
+        ids = np.fromiter((self._by_key[x] for x in keys), dtype=np.int64)
+        ids.sort()
+        return ids
+
+    def name_of(self, star_id: int) -> str:
+        return self.names[star_id]
+
+    def names_of(self, ids: npt.ArrayLike) -> List[str]:
+        names = self.names
+        return [names[x] for x in np.asarray(ids, dtype=np.int64).tolist()]
+
+    def keys_of(self, ids: npt.ArrayLike) -> List[int]:
+        """Primary keys of the stars with the given IDs, for lookups in the
+        source"""
+        return self.keys[np.asarray(ids, dtype=np.int64)].tolist()
@@ -0,0 +1,94 @@
+"""Transparent streaming decompression of input files, chosen by file suffix"""
+
+import bz2
+import gzip
+import io
+import lzma
+from pathlib import Path
+from typing import IO, Any, Callable, Dict
+
+
+class _ZstdFile(io.RawIOBase):
+    """Reads a zstd compressed file. Seeking backwards restarts decompression from
+    the beginning of the file, as gzip does, and seeking forwards decompresses
+    and discards everything before the new position"""
+
+    def __init__(self, file_path: Path, zstandard: Any):
+        self._file_path = file_path
+        self._zstandard = zstandard
+        self._reader = zstandard.open(file_path, mode="rb")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        read = self._reader.readinto(buffer)
+        self._position += read
+        return read
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Cannot seek relative to end of zstd file")
+        if offset < self._position:
+            self._reader.close()
+            self._reader = self._zstandard.open(self._file_path, mode="rb")
+            self._position = 0
+        while self._position < offset:
+            skipped = self._reader.read(min(offset - self._position, 1 << 20))
+            if not skipped:
+                break
+            self._position += len(skipped)
+        return self._position
+
+    def close(self) -> None:
+        if not self.closed:
+            self._reader.close()
+        super().close()
+
+
+def _open_zstd(file_path: Path) -> IO[bytes]:
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError(
+            f"Cannot read {file_path.name}, zstd compressed files require the zstandard package"
+        )
+    return io.BufferedReader(_ZstdFile(file_path, zstandard))
+
+
+COMPRESSED_TYPES: Dict[str, Callable[[Path], IO[bytes]]] = {
+    ".gz": lambda x: gzip.open(x, mode="rb"),
+    ".bz2": lambda x: bz2.open(x, mode="rb"),
+    ".xz": lambda x: lzma.open(x, mode="rb"),
+    ".zst": _open_zstd,
+}
+
+
+def is_compressed(file_path: Path) -> bool:
+    """Whether the file is compressed in a format that can be read"""
+    return file_path.suffix.lower() in COMPRESSED_TYPES
+
+
+def data_suffix(file_path: Path) -> str:
+    """Suffix of the data within a file, ignoring any compression suffix. For
+    example night.csv.gz gives .csv"""
+    if is_compressed(file_path):
+        return Path(file_path.stem).suffix
+    return file_path.suffix
+
+
+def open_file(file_path: Path) -> IO[bytes]:
+    """Opens a file for reading as bytes, decompressing it as it is read if
+    compressed. Offsets in the returned file are of the decompressed data"""
+    if is_compressed(file_path):
+        return COMPRESSED_TYPES[file_path.suffix.lower()](file_path)
+    return open(file_path, mode="rb")
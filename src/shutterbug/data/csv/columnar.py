@@ -0,0 +1,148 @@
+import logging
+from pathlib import Path
+from typing import Dict, Generator, List, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from attr import define, field
+from shutterbug.data.header import KnownHeader
+from shutterbug.data.star import Star, asdatetime, asfloat, detect_time_format
+from shutterbug.data.validate import validate_batch
+
+
+def split_by_name(
+    names: npt.ArrayLike,
+) -> Tuple[npt.NDArray[np.intp], List[str], npt.NDArray[np.intp]]:
+    """Groups rows by star name, keeping stars in the order they first appear in and
+    every star's rows in their original order. Rows without a name are dropped
+
+    Parameters
+    ----------
+    names : npt.ArrayLike
+        Star name of every row
+
+    Returns
+    -------
+    Tuple[npt.NDArray[np.intp], List[str], npt.NDArray[np.intp]]
+        Order that sorts the rows into their groups, name of every group and the
+        boundaries of every group within the sorted rows
+
+    """
+    codes, uniques = pd.factorize(np.asarray(names))
+    # stable so every star's rows stay in file order, rows with no
+    # name have a code of -1 and are sorted out of the way
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    counts = np.bincount(codes[order], minlength=len(uniques))
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    return order, list(uniques), bounds
+
+
+@define(slots=True)
+class ColumnarCSVLoader:
+    """Loads stars from a CSV by reading only the columns the known header needs
+    with pandas' C parser into typed arrays, then splitting those arrays by star"""
+
+    input_file: Path = field()
+    headers: KnownHeader = field()
+    _stars: Dict[str, slice] = field(init=False)
+    _time: pd.DatetimeIndex = field(init=False)
+    _magnitude: npt.NDArray[np.float32] = field(init=False)
+    _error: npt.NDArray[np.float32] = field(init=False)
+    _x: npt.NDArray[np.float64] = field(init=False)
+    _y: npt.NDArray[np.float64] = field(init=False)
+    # rows kept by validation and reason every rejected star is rejected
+    _keep: npt.NDArray[np.bool_] = field(init=False)
+    _rejected: Dict[str, str] = field(init=False)
+
+    def _star_count(self) -> Dict[str, slice]:
+        """Reads the needed columns of the entire CSV file once, groups every row by
+        star and returns the slice of the grouped columns each star occupies"""
+        try:
+            return self._stars
+        except AttributeError:
+            name_index, x_index, y_index = self.headers.star_indices
+            time_index, mag_index, error_index = self.headers.timeseries_indices
+            logging.debug(f"Reading columns of {self.input_file.name}")
+            columns = pd.read_csv(
+                self.input_file,
+                header=None,
+                skiprows=1,
+                usecols=[
+                    name_index,
+                    x_index,
+                    y_index,
+                    time_index,
+                    mag_index,
+                    error_index,
+                ],
+                dtype={name_index: str},
+                skipinitialspace=True,
+                encoding_errors="replace",
+            )
+            order, names, bounds = split_by_name(columns[name_index])
+            time = columns[time_index].to_numpy()
+            # format is decided once for the whole column from its first rows
+            time_format = detect_time_format(time[:100])
+            self._time = asdatetime(time[order], time_format)
+            self._magnitude = asfloat(columns[mag_index].to_numpy()[order])
+            self._error = asfloat(columns[error_index].to_numpy()[order])
+            self._x = pd.to_numeric(columns[x_index], errors="coerce").to_numpy()[order]
+            self._y = pd.to_numeric(columns[y_index], errors="coerce").to_numpy()[order]
+            # validated all at once instead of star by star
+            validation = validate_batch(bounds, self._magnitude, self._error)
+            self._keep = validation.keep
+            self._rejected = {
+                name: reason
+                for name, reason in zip(names, validation.reasons)
+                if reason is not None
+            }
+            self._stars = {
+                name: slice(start, end)
+                for name, start, end in zip(names, bounds[:-1], bounds[1:])
+            }
+            return self._stars
+
+    def __len__(self):
+        """Number of stars in given CSV"""
+        return len(self._star_count())
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._star_count().keys())
+
+    def _make_star(self, name: str, rows: slice) -> Union[Star, None]:
+        """Builds a star from the slice of the grouped columns it occupies"""
+        if name in self._rejected:
+            logging.error(
+                f"Unable to create timeseries, received error: {self._rejected[name]}"
+            )
+            return None
+        keep = self._keep[rows]
+        if keep.all():
+            keep = slice(None)
+        return Star.from_arrays(
+            name=name,
+            x=self._x[rows.start],
+            y=self._y[rows.start],
+            time=self._time[rows][keep],
+            magnitude=self._magnitude[rows][keep],
+            error=self._error[rows][keep],
+            validate=False,
+        )
+
+    def get(self, name: str) -> Union[Star, None]:
+        stars = self._star_count()
+        if name in stars:
+            return self._make_star(name, stars[name])
+        return None
+
+    def __iter__(self) -> Generator[Star, None, None]:
+        for star_name, rows in self._star_count().items():
+            try:
+                star = self._make_star(star_name, rows)
+                if star is not None:
+                    yield star
+            except ValueError as e:
+                logging.warning(f"Unable to load star {star_name} due to error: {e}")
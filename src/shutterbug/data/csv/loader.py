@@ -1,13 +1,38 @@
 import csv
 import logging
+import os
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
 from pathlib import Path
-from typing import Dict, Generator, Iterable, List, Tuple, Union
+from typing import (
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
+import numpy as np
+import numpy.typing as npt
 from attr import define, field
-from more_itertools import consume, map_reduce
 from more_itertools.recipes import pairwise
+from shutterbug.data.csv.columnar import split_by_name
+from shutterbug.data.csv.partial import StarPartial, merge_partials, parse_rows
+from shutterbug.data.csv.spill import SpillStore
+from shutterbug.data.compression import is_compressed, open_file
 from shutterbug.data.header import KnownHeader
-from shutterbug.data.star import Star
+from shutterbug.data.index import IndexCache, IndexEntry
+from shutterbug.data.star import Star, detect_time_format
+
+# Rows whose star names are held at once while indexing a file
+INDEX_CHUNK_ROWS = 1 << 16
 
 
 @define(slots=True)
@@ -15,22 +40,88 @@ class CSVLoader:
 
     input_file: Path = field()
     headers: KnownHeader = field()
-    _stars: Dict[str, List[int]] = field(init=False)
-
-    def _star_count(self) -> Dict[str, List[int]]:
-        """Iterates through entire CSV files and finds each star and every index that
-        star's name corresponds to, for faster iterating"""
-        try:
-            return self._stars
-        except AttributeError:
-            name_index = self.headers.name_index
-            rows = self._file_rows()
-            # Take enumerated iterable, return header name
-            keyfunc = lambda x: x[1][name_index]
-            # Take enumerated iterable, return row that this entry belongs on
-            valuefunc = lambda x: x[0] + 1
-            self._stars = map_reduce(enumerate(rows), keyfunc, valuefunc)
-            return self._stars
+    index_cache: Optional[IndexCache] = field(default=None)
+    workers: int = field(default=1)
+    # Smallest byte range worth handing to its own process
+    min_range_size: int = field(default=1 << 24)
+    # Bytes of unparsed rows to hold before spilling them to disk, if any
+    memory_limit: Optional[int] = field(default=None)
+    # Format of the time column, detected from the first rows if not given
+    time_format: Optional[str] = field(default=None)
+    _stars: Dict[str, Sequence[int]] = field(init=False)
+    # Byte offset the next rows appended to the file start at, when following it
+    _followed: Optional[int] = field(init=False, default=None)
+
+    def _star_count(self) -> Dict[str, Sequence[int]]:
+        """Iterates through entire CSV files and finds each star and the byte offset
+        of every row that star's name corresponds to, for faster iterating"""
+        if self.indexed_names() is None:
+            self._store_index(self._scan_index())
+        return self._stars
+
+    def indexed_names(self) -> Optional[List[str]]:
+        """Names of the stars in the file if its index is already known, from an
+        earlier pass or the index cache, without reading the file"""
+        if not hasattr(self, "_stars") and self.index_cache is not None:
+            cached = self.index_cache.get(self.input_file)
+            if cached is not None:
+                self._stars = cached.stars
+        if hasattr(self, "_stars"):
+            return list(self._stars.keys())
+        return None
+
+    def _scan_index(self) -> Dict[str, npt.NDArray[np.int64]]:
+        """Reads only the star name of every row, a chunk of rows at a time, and
+        keeps the byte offsets of each star's rows as int64 arrays rather than
+        lists of Python ints"""
+        name_index = self.headers.name_index
+        parts: Dict[str, List[npt.NDArray[np.int64]]] = {}
+        # only the name of each row is kept, not the row itself
+        rows = ((offset, row[name_index]) for offset, row in self._indexed_rows())
+        while True:
+            chunk = list(islice(rows, INDEX_CHUNK_ROWS))
+            if len(chunk) == 0:
+                break
+            offsets = np.fromiter((x[0] for x in chunk), np.int64, len(chunk))
+            order, names, bounds = split_by_name([x[1] for x in chunk])
+            offsets = offsets[order]
+            for name, lower, upper in zip(names, bounds[:-1], bounds[1:]):
+                parts.setdefault(name, []).append(offsets[lower:upper])
+        return {name: np.concatenate(x) for name, x in parts.items()}
+
+    def _detect_time_format(self, sample: Optional[Sequence[str]] = None) -> str:
+        """Format of the time column of the file, detected once from the given
+        sample of it or else from its first rows, unless the index cache has it"""
+        if self.time_format is None:
+            cached = None
+            if self.index_cache is not None:
+                cached = self.index_cache.get(self.input_file)
+            if cached is not None and cached.time_format is not None:
+                self.time_format = cached.time_format
+                return self.time_format
+            if sample is None:
+                time_index = self.headers.timeseries_indices[0]
+                rows = self._file_rows()
+                try:
+                    sample = [x[time_index] for x in islice(rows, 100)]
+                finally:
+                    rows.close()
+            self.time_format = detect_time_format(sample)
+            logging.debug(
+                f"Times in {self.input_file.name} are in format {self.time_format}"
+            )
+        return self.time_format
+
+    def _store_index(self, stars: Dict[str, Sequence[int]]) -> None:
+        """Keeps the star index for this loader and in the index cache, if any"""
+        self._stars = stars
+        if self.index_cache is not None:
+            entry = IndexEntry(
+                headers=self.headers.headers,
+                stars=stars,
+                time_format=self._detect_time_format(),
+            )
+            self.index_cache.put(self.input_file, entry)
 
     def __len__(self):
         """Number of stars in given CSV"""
@@ -40,57 +131,245 @@ class CSVLoader:
     def names(self):
         return list(self._star_count().keys())
 
+    def _indexed_rows(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Generator[Tuple[int, List[str]], None, None]:
+        """Skips header and returns an iterable of every row in the input file
+        alongside the byte offset that row starts at. If a byte range is given only
+        the rows starting within that range are returned"""
+        filepath = self.input_file
+        with open_file(filepath) as csv_file:
+            # offsets of every line the reader has pulled for the current row
+            starts: Deque[int] = deque()
+            if start is not None:
+                csv_file.seek(start)
+
+            def lines() -> Generator[str, None, None]:
+                position = 0 if start is None else start
+                for line in csv_file:
+                    if end is not None and position >= end:
+                        return
+                    starts.append(position)
+                    position += len(line)
+                    yield line.decode(errors="replace")
+
+            reader = csv.reader(lines())
+            if start is None:
+                next(reader)  # skip header
+                starts.clear()
+            for row in reader:
+                yield starts[0], row
+                starts.clear()
+
     def _file_rows(self) -> Generator[List[str], None, None]:
         """Skips header and returns an iterable for every row in the input file"""
+        for _, row in self._indexed_rows():
+            yield row
+
+    def _rows_at(self, offsets: Sequence[int]) -> Generator[List[str], None, None]:
+        """Yields the row starting at each of the given byte offsets"""
         filepath = self.input_file
-        with open(filepath, newline="", errors="replace", mode="r") as csv_file:
-            reader = csv.reader(csv_file)
-            next(reader)  # skip header
-            yield from reader
-
-    @staticmethod
-    def _row_delta(indices: List[int]) -> Generator[int, None, None]:
-        """Calculates the delta between two indices in a list of indexes"""
-        if indices[0] == 0:
-            # so we don't lose the first row of the first item
-            yield 0
+        with open_file(filepath) as csv_file:
+            lines = (line.decode(errors="replace") for line in csv_file)
+            for offset in offsets:
+                csv_file.seek(offset)
+                yield next(csv.reader(lines))
+
+    def _file_stars(self) -> Iterable[Tuple[str, List[StarPartial]]]:
+        """Yields the rows of each star in order, reading the file only once and
+        converting every column of the entire file at once before splitting it by
+        star"""
+        partials = self._parse_rows(self._indexed_rows())
+        # Index comes for free from this pass, no need to scan again for it
+        if not hasattr(self, "_stars"):
+            self._store_index({name: x.offsets for name, x in partials.items()})
+        for name in list(partials.keys()):
+            # release each star's rows as soon as it is handed off
+            yield name, [partials.pop(name)]
+
+    def _byte_ranges(self) -> List[Tuple[int, int]]:
+        """Splits the rows of the input file into one byte range per worker, with
+        every range starting at the beginning of a line. Rows spanning more than one
+        line are not supported, nor are compressed files"""
+        if is_compressed(self.input_file):
+            return []
+        size = self.input_file.stat().st_size
+        with open(self.input_file, mode="rb") as csv_file:
+            csv_file.readline()  # skip header
+            data_start = csv_file.tell()
+            count = min(self.workers, (size - data_start) // self.min_range_size)
+            bounds = [data_start]
+            for i in range(1, max(count, 1)):
+                # move to the start of the line after the one the split lands in
+                csv_file.seek(data_start + ((size - data_start) * i) // count - 1)
+                csv_file.readline()
+                if bounds[-1] < csv_file.tell() < size:
+                    bounds.append(csv_file.tell())
+            bounds.append(size)
+        return list(pairwise(bounds))
+
+    def _parse_range(self, start: int, end: int) -> Dict[str, StarPartial]:
+        """Parses every row within a byte range of the input file and splits them
+        into typed arrays per star"""
+        return self._parse_rows(self._indexed_rows(start, end))
+
+    def _parse_rows(
+        self, rows: Iterable[Tuple[int, List[str]]]
+    ) -> Dict[str, StarPartial]:
+        """Parses rows, alongside their byte offsets, and splits them into typed
+        arrays per star"""
+        return parse_rows(rows, self.headers, self._detect_time_format)
+
+    def _range_stars(
+        self, ranges: List[Tuple[int, int]]
+    ) -> Iterable[Tuple[str, List[StarPartial]]]:
+        """Parses each byte range in its own process and yields every star's
+        partial rows in file order"""
+        logging.info(
+            f"Parsing {self.input_file.name} in {len(ranges)} parts"
+            f" with {self.workers} processes"
+        )
+        merged: Dict[str, List[StarPartial]] = {}
+        starts, ends = zip(*ranges)
+        time_format = self._detect_time_format()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            # only the file, headers and time format need to go to each process
+            for partials in executor.map(
+                _parse_range,
+                repeat(self.input_file),
+                repeat(self.headers),
+                repeat(time_format),
+                starts,
+                ends,
+            ):
+                for name, partial in partials.items():
+                    if name in merged:
+                        merged[name].append(partial)
+                    else:
+                        merged[name] = [partial]
+        if not hasattr(self, "_stars"):
+            offsets = {
+                name: np.concatenate([x.offsets for x in partials])
+                for name, partials in merged.items()
+            }
+            self._store_index(offsets)
+        for name in list(merged.keys()):
+            yield name, merged.pop(name)
+
+    def _spilled_stars(self) -> Iterable[Tuple[str, List[StarPartial]]]:
+        """Reads the file once, parsing rows in chunks no larger than the memory
+        limit and spilling each parsed chunk to a temporary file. Every star is then
+        read back from disk one at a time. The offset index of the file is not kept,
+        as it grows with the file rather than the memory limit"""
+        limit = self.memory_limit
+        logging.info(f"Loading {self.input_file.name} within {limit} bytes of rows")
+        with tempfile.TemporaryDirectory(prefix="shutterbug-") as folder:
+            store = SpillStore(folder=Path(folder))
+            try:
+                chunk = []
+                chunk_size = 0
+                for offset, row in self._indexed_rows():
+                    chunk.append((offset, row))
+                    chunk_size += sys.getsizeof(row) + sum(map(sys.getsizeof, row))
+                    if chunk_size >= limit:  # type: ignore
+                        store.spill(self._parse_rows(chunk))
+                        chunk = []
+                        chunk_size = 0
+                # whatever is left over already fits in memory
+                remaining = self._parse_rows(chunk)
+                names = store.names
+                spilled = set(names)
+                names.extend(x for x in remaining.keys() if x not in spilled)
+                for name in names:
+                    partials = store.read(name)
+                    if name in remaining:
+                        partials.append(remaining.pop(name))
+                    yield name, partials
+            finally:
+                store.close()
+
+    def _last_line_end(self, start: int = 0) -> int:
+        """Byte offset just past the last complete line of the input file, looking
+        no further back than the given offset"""
+        with open(self.input_file, mode="rb") as csv_file:
+            end = csv_file.seek(0, os.SEEK_END)
+            while end > start:
+                block = min(end - start, 1 << 16)
+                csv_file.seek(end - block)
+                newline = csv_file.read(block).rfind(b"\n")
+                if newline >= 0:
+                    return end - block + newline + 1
+                end -= block
+        return start
+
+    def new_stars(self) -> Generator[Star, None, None]:
+        """Yields the rows appended to the input file since the previous call, as
+        stars holding only those rows. The first call yields every row. A line
+        still being written is left for the next call"""
+        if is_compressed(self.input_file):
+            raise ValueError(f"Cannot follow compressed file {self.input_file.name}")
+        start = self._followed
+        end = self._last_line_end(0 if start is None else start)
+        if end == 0 or (start is not None and end <= start):
+            return
+        partials = self._parse_rows(self._indexed_rows(start, end))
+        self._followed = end
+        logging.debug(
+            f"Read new rows of {len(partials)} stars from {self.input_file.name}"
+        )
+        # the first call reads every row, so its offsets are the whole index
+        if start is None:
+            stars = {name: x.offsets for name, x in partials.items()}
         else:
-            # So we can consume to just before the item we want
-            yield indices[0] - 1
-        # return all other deltas
-        for first, second in pairwise(indices):
-            yield (second - first) - 1
-
-    def _all_rows_in_index(
-        self, indices: List[int]
-    ) -> Generator[List[str], None, None]:
-        """Yields every row for a list of indices"""
-        rows = self._file_rows()
-        deltas = self._row_delta(indices)
-        for delta in deltas:
-            consume(rows, delta)
-            yield next(rows)
-
-    def _file_stars(self) -> Iterable[Tuple[str, List[List[str]]]]:
-        """Yields all data rows in csv from each star in order"""
-        stars = self._star_count()
-        for name, indices in stars.items():
-            rows = list(self._all_rows_in_index(indices))
-            yield name, rows
+            stars = dict(self._stars)
+            for name, partial in partials.items():
+                known = np.asarray(stars.get(name, []), dtype=np.int64)
+                stars[name] = np.concatenate((known, partial.offsets))
+        # the cached index must cover the whole file as it is now, not a line
+        # still being written
+        if end == self.input_file.stat().st_size:
+            self._store_index(stars)
+        else:
+            self._stars = stars
+        for name, partial in partials.items():
+            try:
+                star = merge_partials(name, [partial])
+                if star is not None:
+                    yield star
+            except ValueError as e:
+                logging.warning(f"Unable to load star {name} due to error: {e}")
 
     def get(self, name: str) -> Union[Star, None]:
         stars = self._star_count()
         if name in self._star_count():
-            rows = list(self._all_rows_in_index(stars[name]))
-            return Star.from_rows(rows=rows, row_headers=self.headers)
+            rows = list(self._rows_at(stars[name]))
+            return Star.from_rows(
+                rows=rows,
+                row_headers=self.headers,
+                time_format=self._detect_time_format(),
+            )
         return None
 
-
     def __iter__(self) -> Generator[Star, None, None]:
-        for star_name, rows in self._file_stars():
+        ranges = self._byte_ranges() if self.workers > 1 else []
+        if len(ranges) > 1:
+            stars = self._range_stars(ranges)
+        elif self.memory_limit is not None:
+            stars = self._spilled_stars()
+        else:
+            stars = self._file_stars()
+        for star_name, partials in stars:
             try:
-                star = Star.from_rows(rows=rows, row_headers=self.headers)
+                star = merge_partials(star_name, partials)
                 if star is not None:
                     yield star
             except ValueError as e:
                 logging.warning(f"Unable to load star {star_name} due to error: {e}")
+
+
+def _parse_range(
+    input_file: Path, headers: KnownHeader, time_format: str, start: int, end: int
+) -> Dict[str, StarPartial]:
+    """Parses a byte range of a CSV, for use in a worker process"""
+    loader = CSVLoader(input_file=input_file, headers=headers, time_format=time_format)
+    return loader._parse_range(start, end)
@@ -1,41 +1,65 @@
 from pathlib import Path
-import logging
+from shutterbug.data.csv.columnar import ColumnarCSVLoader
 from shutterbug.data.csv.loader import CSVLoader
-from shutterbug.data.header import Header, KnownHeader, KNOWN_HEADERS
-from typing import List
+from shutterbug.data.header import KnownHeader, match_known_header
+from shutterbug.data.compression import open_file
+from shutterbug.data.index import IndexCache
+from typing import List, Literal, Optional, Union
 import csv
+import io
 
-READABLE_TYPES = {".xlsx", ".xls", ".xlsm", ".odf", ".ods", ".csv"}
+READABLE_TYPES = {".csv"}
 
 
-def make_loader(file_path: Path) -> CSVLoader:
+def make_loader(
+    file_path: Path,
+    index_cache: Optional[IndexCache] = None,
+    engine: Literal["python", "c"] = "python",
+    parse_workers: int = 1,
+    memory_limit: Optional[int] = None,
+    **_kwargs,
+) -> Union[CSVLoader, ColumnarCSVLoader]:
 
     """Takes a file path and creates a CSVLoader to consume stars from a CSV filetype
 
     :param file_path: Path to CSV file
+    :param index_cache: Optional, cache of star indices to reuse for unchanged files
+    :param engine: Optional, "python" parses rows with the csv module, "c" parses
+    only the needed columns with pandas' C parser
+    :param parse_workers: Optional, number of processes to split a large file
+    between when parsing with the "python" engine
+    :param memory_limit: Optional, bytes of rows to hold in memory before spilling
+    them to temporary files when parsing with the "python" engine
     :returns: FileLoader that loads each star from a CSV
 
     """
-    headers = _headers_from_file(file_path)
-    return CSVLoader(input_file=file_path, headers=headers)
+    headers = _headers_from_file(file_path, index_cache)
+    if engine == "c":
+        return ColumnarCSVLoader(input_file=file_path, headers=headers)
+    return CSVLoader(
+        input_file=file_path,
+        headers=headers,
+        index_cache=index_cache,
+        workers=parse_workers,
+        memory_limit=memory_limit,
+    )
 
 
-def _headers_from_file(file_path: Path) -> KnownHeader:
+def _headers_from_file(
+    file_path: Path, index_cache: Optional[IndexCache] = None
+) -> KnownHeader:
     """Verifies loaded csv file header against known headers and returns known header"""
-    raw_headers = _read_file_header(file_path)
-    headers = Header(raw_headers)
-
-    for known in KNOWN_HEADERS:
-        if headers == known:
-            known.headers = headers.headers
-            logging.debug(f"Input file matches header type {known.header_origin}")
-            return known
-    raise ValueError("Cannot load file, unknown headers")
+    cached = None if index_cache is None else index_cache.get(file_path)
+    if cached is not None:
+        raw_headers = cached.headers
+    else:
+        raw_headers = _read_file_header(file_path)
+    return match_known_header(raw_headers)
 
 
 def _read_file_header(file_path: Path) -> List[str]:
     """Reads the first line in a csv file and returns the raw headers"""
-    with open(file_path, newline="") as f:
+    with io.TextIOWrapper(open_file(file_path), newline="", errors="replace") as f:
         try:
             reader = csv.reader(f)
             raw_headers = next(reader)
@@ -0,0 +1,116 @@
+import logging
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from attr import define, field
+from shutterbug.data.csv.columnar import split_by_name
+from shutterbug.data.header import KnownHeader
+from shutterbug.data.star import Star, asdatetime, asfloat
+from shutterbug.data.validate import validate_batch
+
+
+@define(slots=True)
+class StarPartial:
+    """Rows of a single star from one part of a file, parsed into typed arrays"""
+
+    x: str = field()
+    y: str = field()
+    time: pd.DatetimeIndex = field()
+    magnitude: npt.NDArray[np.float32] = field()
+    error: npt.NDArray[np.float32] = field()
+    offsets: npt.NDArray[np.int64] = field()
+    # rows kept by validate_batch, and the number of magnitudes and errors of
+    # these rows
+    keep: npt.NDArray[np.bool_] = field()
+    counts: npt.NDArray[np.intp] = field()
+
+
+def merge_partials(name: str, partials: List[StarPartial]) -> Union[Star, None]:
+    """Joins the partial rows of a star, in order, into a complete star. The rows
+    were validated when they were parsed, so the star is not validated again"""
+    counts = np.sum([x.counts for x in partials], axis=0)
+    if not (counts > 0).all():
+        logging.error(
+            "Unable to create timeseries, received error:"
+            " Either magnitude or error has no values"
+        )
+        return None
+    first = partials[0]
+    time = first.time.append([x.time for x in partials[1:]])
+    magnitude = np.concatenate([x.magnitude for x in partials])
+    error = np.concatenate([x.error for x in partials])
+    keep = np.concatenate([x.keep for x in partials])
+    if not keep.all():
+        time, magnitude, error = time[keep], magnitude[keep], error[keep]
+    return Star.from_arrays(
+        name=name,
+        x=first.x,
+        y=first.y,
+        time=time,
+        magnitude=magnitude,
+        error=error,
+        validate=False,
+    )
+
+
+def parse_rows(
+    rows: Iterable[Tuple[int, List[str]]],
+    headers: KnownHeader,
+    time_format: Callable[[Sequence[str]], str],
+) -> Dict[str, StarPartial]:
+    """Parses rows of text, alongside the position each row was read from, and
+    splits them into typed arrays per star
+
+    Parameters
+    ----------
+    rows : Iterable[Tuple[int, List[str]]]
+        Position of every row, such as its byte offset, and the row itself
+    headers : KnownHeader
+        Header the rows were written with
+    time_format : Callable[[Sequence[str]], str]
+        Gives the format of the time column from a sample of it
+
+    Returns
+    -------
+    Dict[str, StarPartial]
+        Rows of every star, in the order stars first appear in
+
+    """
+    star_getter = headers.star_getters
+    timeseries_getter = headers.timeseries_getters
+    offsets = []
+    star_data = []
+    timeseries = []
+    for offset, row in rows:
+        offsets.append(offset)
+        star_data.append(star_getter(row))
+        timeseries.append(timeseries_getter(row))
+    if len(offsets) == 0:
+        return {}
+    np_star = np.asarray(star_data)
+    np_timeseries = np.asarray(timeseries)
+    order, names, bounds = split_by_name(np_star[:, 0])
+    # convert entire columns at once rather than star by star
+    fmt = time_format(np_timeseries[:100, 0])
+    time = asdatetime(np_timeseries[order, 0], fmt)
+    magnitude = asfloat(np_timeseries[order, 1])
+    error = asfloat(np_timeseries[order, 2])
+    sorted_star = np_star[order]
+    sorted_offsets = np.asarray(offsets)[order]
+    # validated all at once instead of star by star
+    validation = validate_batch(bounds, magnitude, error)
+    return {
+        name: StarPartial(
+            x=sorted_star[lower, 1],
+            y=sorted_star[lower, 2],
+            time=time[lower:upper],
+            magnitude=magnitude[lower:upper],
+            error=error[lower:upper],
+            offsets=sorted_offsets[lower:upper],
+            keep=validation.keep[lower:upper],
+            counts=validation.counts[:, star],
+        )
+        for star, (name, lower, upper) in enumerate(zip(names, bounds[:-1], bounds[1:]))
+    }
@@ -0,0 +1,82 @@
+import os
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple, cast
+
+import numpy as np
+import numpy.typing as npt
+from attr import define, field
+from shutterbug.data.csv.partial import StarPartial
+from shutterbug.data.star import STORAGE_DTYPE, from_time_ns
+
+
+@define(slots=True)
+class SpillStore:
+    """Keeps the partial rows of stars in a temporary columnar file on disk, every
+    spill appended to the same file, so that only a bounded amount of parsed rows
+    stay in memory"""
+
+    folder: Path = field()
+    # position in the run file, number of rows and number of magnitudes and
+    # errors of every segment
+    _segments: Dict[str, List[Tuple[int, int, npt.NDArray[np.intp]]]] = field(
+        init=False, factory=dict
+    )
+    _star_data: Dict[str, Tuple[str, str]] = field(init=False, factory=dict)
+    _run: Optional[BinaryIO] = field(init=False, default=None)
+
+    @property
+    def names(self) -> List[str]:
+        """Every spilled star, in the order they were first spilled"""
+        return list(self._segments.keys())
+
+    def spill(self, partials: Dict[str, StarPartial]) -> None:
+        """Appends the partial rows of every star to the run file, each column of
+        each star stored contiguously"""
+        if self._run is None:
+            self._run = open(self.folder / "run.bin", mode="w+b")
+        run_file = self._run
+        run_file.seek(0, os.SEEK_END)
+        for name, partial in partials.items():
+            position = run_file.tell()
+            run_file.write(np.asarray(partial.time.asi8, dtype=np.int64).tobytes())
+            run_file.write(np.asarray(partial.magnitude, dtype=STORAGE_DTYPE).tobytes())
+            run_file.write(np.asarray(partial.error, dtype=STORAGE_DTYPE).tobytes())
+            run_file.write(np.asarray(partial.offsets, dtype=np.int64).tobytes())
+            run_file.write(np.asarray(partial.keep, dtype=np.bool_).tobytes())
+            segment = (position, len(partial.offsets), partial.counts)
+            if name in self._segments:
+                self._segments[name].append(segment)
+            else:
+                self._segments[name] = [segment]
+                self._star_data[name] = (partial.x, partial.y)
+        run_file.flush()
+
+    def read(self, name: str) -> List[StarPartial]:
+        """Reads back every spilled segment of a star, in the order they were
+        spilled. A star that was never spilled has no segments"""
+        if name not in self._segments:
+            return []
+        x, y = self._star_data[name]
+        partials = []
+        run_file = cast(BinaryIO, self._run)
+        for position, rows, counts in self._segments[name]:
+            run_file.seek(position)
+            time = np.fromfile(run_file, dtype=np.int64, count=rows)
+            partials.append(
+                StarPartial(
+                    x=x,
+                    y=y,
+                    time=from_time_ns(time),
+                    magnitude=np.fromfile(run_file, dtype=STORAGE_DTYPE, count=rows),
+                    error=np.fromfile(run_file, dtype=STORAGE_DTYPE, count=rows),
+                    offsets=np.fromfile(run_file, dtype=np.int64, count=rows),
+                    keep=np.fromfile(run_file, dtype=np.bool_, count=rows),
+                    counts=counts,
+                )
+            )
+        return partials
+
+    def close(self) -> None:
+        if self._run is not None:
+            self._run.close()
+        self._run = None
@@ -1,10 +1,13 @@
 import logging
 from functools import singledispatch
-from itertools import repeat
-from typing import Dict, Generator, List, Union
+from typing import Generator, List, Union
 
+import numpy as np
+import numpy.typing as npt
 from attr import define, field
+from scipy import sparse
 from shutterbug.data.interfaces.internal import Reader, Writer
+from shutterbug.data.matrix import LeaveOneOut, StarMatrix
 from shutterbug.data.star import Star
 
 
@@ -14,21 +17,32 @@ class Dataset:
     reader: Reader = field()
     writer: Writer = field()
     store_in_memory: bool = field()
-    _star_cache: Dict[str, Union[Star, None]] = field(init=False, default={})
+    # stars held in memory, by catalog ID
+    _star_cache: List[Union[Star, None]] = field(init=False, factory=list)
     _write_cache: List[Star] = field(init=False, default=[])
 
     def __attrs_post_init__(self):
         if self.store_in_memory is True:
-            self._star_cache = dict(zip(self.reader.names, repeat(None)))
+            self._star_cache = [None] * len(self.reader.catalog)
 
-    def __iter__(self) -> Generator[Star, None, None]:
+    def _cache(self) -> List[Union[Star, None]]:
+        """Stars held in memory, grown to cover stars written since the dataset
+        was opened"""
         cache = self._star_cache
+        missing = len(self.reader.catalog) - len(cache)
+        if missing > 0:
+            cache.extend([None] * missing)
+        return cache
+
+    def __iter__(self) -> Generator[Star, None, None]:
         if self.store_in_memory is True:
-            for name, star in cache.items():
+            cache = self._cache()
+            for star_id, name in enumerate(self.reader.catalog.names):
+                star = cache[star_id]
                 if star is None:
                     star = self.reader.get(name)
                     logging.debug(f"Caching star {star.name}")
-                    cache[name] = self.reader.get(name)
+                    cache[star_id] = star
                 yield star
         else:
             yield from self.reader
@@ -36,6 +50,11 @@ class Dataset:
     def __len__(self) -> int:
         return len(self.reader.names)
 
+    def refresh_medians(self):
+        """Brings the median magnitudes reference stars are chosen by up to date
+        with rows appended since they were calculated"""
+        self.writer.refresh_medians()
+
     def flush_write(self):
         logging.debug(f"Flushing all write cached stars")
         self.writer.update(self._write_cache)
@@ -55,23 +74,32 @@ class Dataset:
         logging.debug(f"Updating stars {[x.name for x in star]} in reader")
         self.writer.update(star)
 
-    def similar_to(self, star: Star) -> List[Star]:
-        if self.store_in_memory is True:
-            to_get = []
-            stars = []
-            for name in self.reader.similar_to(star):
-                if self._star_cache[name] is None:
-                    to_get.append(name)
-                else:
-                    stars.append(self._star_cache[name])
-            if len(to_get) > 0:
-                logging.debug(f"Stars {to_get} are not in cache, fetching from reader")
-
-            from_reader = self.reader.get_many(to_get)
+    def similar_ids(self, star: Star) -> npt.NDArray[np.int64]:
+        """Catalog IDs of the stars similar to a star, sorted, so that stars with
+        the same similar stars can be told apart without fetching them"""
+        return self.reader.similar_ids(star)
+
+    def get_ids(self, ids: npt.NDArray[np.int64]) -> List[Star]:
+        """Stars with the given catalog IDs, from memory where they are held"""
+        if self.store_in_memory is not True:
+            return self.reader.get_ids(ids)
+        catalog = self.reader.catalog
+        cache = self._cache()
+        to_get = [x for x in ids.tolist() if cache[x] is None]
+        stars = [cache[x] for x in ids.tolist() if cache[x] is not None]
+        if len(to_get) > 0:
+            logging.debug(
+                f"Stars {catalog.names_of(to_get)} are not in cache, fetching from reader"
+            )
+            from_reader = self.reader.get_ids(to_get)
             for star in from_reader:
-                self._star_cache[star.name] = star
+                cache[catalog.id_of(star.name)] = star
             stars.extend(from_reader)
-            return stars
+        return stars
+
+    def similar_to(self, star: Star) -> List[Star]:
+        if self.store_in_memory is True:
+            return self.get_ids(self.similar_ids(star))
         else:
             names = self.reader.similar_to(star)
             logging.debug(
@@ -79,6 +107,58 @@ class Dataset:
             )
             return self.reader.get_many(names)
 
+    def to_matrix(self) -> StarMatrix:
+        """Holds every star of the dataset in one StarMatrix, for operations over
+        the entire dataset"""
+        logging.info(f"Building star matrix of dataset {self.name}")
+        return StarMatrix.from_stars(self)
+
+    def reference_selection(self, matrix: StarMatrix) -> sparse.csr_matrix:
+        """Which stars of a matrix of the dataset are the reference stars of each
+        of its stars, as a (target, reference) matrix of ones in the matrix' column
+        order"""
+        catalog = self.reader.catalog
+        targets = []
+        references = []
+        for star in self:
+            if star.name not in matrix:
+                continue
+            names = catalog.names_of(self.reader.similar_ids(star))
+            columns = [matrix.column(x) for x in names if x in matrix]
+            targets.extend([matrix.column(star.name)] * len(columns))
+            references.extend(columns)
+        return sparse.csr_matrix(
+            (np.ones(len(targets)), (targets, references)),
+            shape=(len(matrix), len(matrix)),
+        )
+
+    def reference_ensemble(self, matrix: StarMatrix) -> LeaveOneOut:
+        """Reference stars of every star of a matrix of the dataset as one shared
+        ensemble, less each star's exclusions, in the matrix' column order"""
+        catalog = self.reader.catalog
+        # fetched once for every star rather than once per star
+        ensemble = self.reader.ensemble_ids()
+        members = np.zeros(len(matrix), dtype=np.bool_)
+        for name in catalog.names_of(ensemble):
+            if name in matrix:
+                members[matrix.column(name)] = True
+        targets = []
+        excluded = []
+        for star in self:
+            if star.name not in matrix:
+                continue
+            names = catalog.names_of(self.reader.excluded_ids(star, ensemble))
+            columns = [matrix.column(x) for x in names if x in matrix]
+            targets.extend([matrix.column(star.name)] * len(columns))
+            excluded.extend(columns)
+        return LeaveOneOut(
+            members=members,
+            excluded=sparse.csr_matrix(
+                (np.ones(len(targets)), (targets, excluded)),
+                shape=(len(matrix), len(matrix)),
+            ),
+        )
+
     @property
     def variable(self) -> Generator[Star, None, None]:
         logging.info(
@@ -1,5 +1,5 @@
-from sqlalchemy import (Boolean, Column, Date, DateTime, Float, ForeignKey,
-                        Integer, Text)
+from sqlalchemy import (BigInteger, Boolean, Column, Date, DateTime, Float,
+                        ForeignKey, Integer, Text)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.schema import MetaData
@@ -76,7 +76,8 @@ class StarDBTimeseries(Base):
     __tablename__ = "timeseries"
     tsid = Column("tsid", Integer, primary_key=True, autoincrement=True)
     star_id = Column("star_id", Integer, ForeignKey("stars.id"))
-    time = Column("time", DateTime(timezone=True))
+    # UTC nanoseconds since the epoch, as held by a timeseries' DatetimeIndex
+    time = Column("time_ns", BigInteger)
     mag = Column("magnitude", Float)
     error = Column("error", Float)
     adm = Column("adm", Float)  # differential magnitude and error
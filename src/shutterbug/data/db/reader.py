@@ -1,11 +1,23 @@
-from typing import Dict, Generator, List, Optional
+from functools import partial
+from typing import Dict, Generator, List, Optional, Union
 
 import attr
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 from attr import define, field
+from shutterbug.data.axis import TimeAxisRegistry
+from shutterbug.data.catalog import StarCatalog
 from shutterbug.data.db.model import StarDB, StarDBDataset
 from shutterbug.data.interfaces.internal import Reader
-from shutterbug.data.star import Star, StarTimeseries
+from shutterbug.data.star import (
+    STORAGE_DTYPE,
+    ArrayTimeseries,
+    LazyStar,
+    Star,
+    StarTimeseries,
+    from_time_ns,
+)
 from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
@@ -20,13 +32,37 @@ class DBReader(Reader):
     distance_limit: Optional[float] = field(
         converter=attr.converters.optional(float), default=0
     )
-    _star_cache: Dict[str, List[str]] = field(init=False, default={})
+    # hold each star's timeseries in plain single precision arrays rather than a
+    # DataFrame of the database's doubles
+    compact: bool = field(default=False)
+    # fetch each star's timeseries only when it is first accessed
+    lazy: bool = field(default=False)
+    # IDs of the stars within the magnitude and distance limits of each star
+    _star_cache: Dict[int, npt.NDArray[np.int64]] = field(init=False, factory=dict)
+    _axes: TimeAxisRegistry = field(init=False, factory=TimeAxisRegistry)
+    _catalog: Optional[StarCatalog] = field(init=False, default=None)
 
-    def __attrs_post_init__(self):
-        if len(self._star_cache) > 0:
-            # hard reset cache to deal with
-            # persistence bug
-            self._star_cache = {}
+    @property
+    def catalog(self) -> StarCatalog:
+        """Dense IDs of every star in the dataset"""
+        if self._catalog is None:
+            stmt = (
+                select(StarDB.id, StarDB.name)
+                .join(StarDBDataset)
+                .where(StarDBDataset.name == self.dataset)
+                .order_by(StarDB.id)
+            )
+            rows = self.session.execute(stmt).all()
+            self._catalog = StarCatalog.from_names(
+                names=[x.name for x in rows], keys=[x.id for x in rows]
+            )
+        return self._catalog
+
+    def _refresh_catalog(self) -> StarCatalog:
+        """Rebuilds the catalog to pick up stars written since it was built"""
+        self._catalog = None
+        self._star_cache = {}
+        return self.catalog
 
     @property
     def names(self) -> List[str]:
@@ -34,6 +70,7 @@ class DBReader(Reader):
             select(StarDB.name)
             .join(StarDBDataset)
             .where(StarDBDataset.name == self.dataset)
+            .order_by(StarDB.id)
         )
         star_names = self.session.scalars(stmt).all()
         return star_names
@@ -57,13 +94,54 @@ class DBReader(Reader):
         return self._model_to_star(self.session.scalar(statement))
 
     def get_many(self, names: List[str]) -> List[Star]:
-        statement = self._select_star().where(StarDB.name.in_(names))
+        catalog = self.catalog
+        if not all(x in catalog for x in names):
+            catalog = self._refresh_catalog()
+        return self.get_ids(catalog.ids_of(x for x in names if x in catalog))
+
+    def get_ids(self, ids: npt.ArrayLike) -> List[Star]:
+        """Gets the stars with the given catalog IDs, looked up by primary key"""
+        keys = self.catalog.keys_of(ids)
+        if len(keys) == 0:
+            return []
+        statement = self._select_star().where(StarDB.id.in_(keys))
         return list(map(self._model_to_star, self.session.scalars(statement)))
 
     def similar_to(self, star: Star) -> List[str]:
         """Returns all names that are similar to target star"""
-        similar_star_names = self._filter_on_constraints(star)
-        return similar_star_names
+        return self.catalog.names_of(self.similar_ids(star))
+
+    def similar_ids(self, star: Star) -> npt.NDArray[np.int64]:
+        """Returns the catalog IDs of all stars similar to target star, sorted"""
+        return self._filter_on_constraints(star)
+
+    def ensemble_ids(self) -> npt.NDArray[np.int64]:
+        """Returns the catalog IDs of every star that can be a reference star, the
+        stars that are not variable, sorted"""
+        statement = (
+            select(StarDB.id)
+            .join(StarDBDataset)
+            .where(StarDBDataset.name == self.dataset)
+            .where(StarDB.variable == False)
+        )
+        return self._ids_of_keys(self.session.scalars(statement).all())
+
+    def excluded_ids(
+        self, star: Star, ensemble: Optional[npt.NDArray[np.int64]] = None
+    ) -> npt.NDArray[np.int64]:
+        """Returns the catalog IDs of the stars of the ensemble that are not similar
+        to target star, besides the target itself, sorted. With wide limits these
+        are far fewer than the similar stars. Taken from the same nearby stars as
+        similar_ids, so that a star without a median or position is never both or
+        neither. The ensemble, from ensemble_ids, can be given to fetch it once for
+        many stars"""
+        if ensemble is None:
+            ensemble = self.ensemble_ids()
+        excluded = np.setdiff1d(ensemble, self._nearby_ids(star), assume_unique=True)
+        catalog = self.catalog
+        if star.name in catalog:
+            excluded = excluded[excluded != catalog.id_of(star.name)]
+        return excluded
 
     def _select_star(self):
         """Creates selection statement to find all data for a star in the reader's dataset"""
@@ -71,10 +149,10 @@ class DBReader(Reader):
             select(StarDB).join(StarDBDataset).where(StarDBDataset.name == self.dataset)
         )
 
-    def _within_distance(self, star: Star) -> List[str]:
+    def _within_distance(self, star: Star) -> List[int]:
         session = self.session
         statement = (
-            select(StarDB.name)
+            select(StarDB.id)
             .join(StarDBDataset)
             .where(
                 (
@@ -92,16 +170,14 @@ class DBReader(Reader):
         )
         return session.scalars(statement).all()
 
-    def _within_mag(self, star: Star) -> List[str]:
+    def _within_mag(self, star: Star) -> List[int]:
         session = self.session
         statement = (
-            select(StarDB.name)
+            select(StarDB.id)
             .join(StarDBDataset)
             .where(
                 (
-                    func.ABS(
-                        StarDB.magnitude_median - star.timeseries.magnitude.median()
-                    )
+                    func.ABS(StarDB.magnitude_median - self._median(star))
                     <= self.mag_limit
                 )
             )
@@ -110,10 +186,25 @@ class DBReader(Reader):
         )
         return session.scalars(statement).all()
 
-    def _non_variable(self, star: Star) -> List[str]:
+    def _median(self, star: Star) -> float:
+        """Median magnitude of a star, from its record if its timeseries has not
+        been fetched"""
+        if isinstance(star, LazyStar) and not star.loaded:
+            statement = (
+                select(StarDB.magnitude_median)
+                .join(StarDBDataset)
+                .where(StarDBDataset.name == self.dataset)
+                .where(StarDB.name == star.name)
+            )
+            median = self.session.scalar(statement)
+            if median is not None:
+                return median
+        return star.timeseries.magnitude.median()
+
+    def _non_variable(self, star: Star) -> List[int]:
         session = self.session
         statement = (
-            select(StarDB.name)
+            select(StarDB.id)
             .join(StarDBDataset)
             .where(StarDBDataset.name == self.dataset)
             .where(StarDB.variable == False)
@@ -121,15 +212,32 @@ class DBReader(Reader):
         )
         return session.scalars(statement).all()
 
-    def _filter_on_constraints(self, star: Star) -> List[str]:
+    def _ids_of_keys(self, keys: List[int]) -> npt.NDArray[np.int64]:
+        try:
+            return self.catalog.ids_of_keys(keys)
+        except KeyError:
+            return self._refresh_catalog().ids_of_keys(keys)
 
-        if star.name not in self._star_cache.keys():
-            similar_mag = set(self._within_mag(star))
-            similar_dist = set(self._within_distance(star))
-            self._star_cache[star.name] = list(similar_mag.intersection(similar_dist))
-        return list(
-            set(self._non_variable(star)).intersection(self._star_cache[star.name])
-        )
+    def _nearby_ids(self, star: Star) -> npt.NDArray[np.int64]:
+        """Catalog IDs of the stars within the magnitude and distance limits of a
+        star, variable or not, sorted"""
+        catalog = self.catalog
+        if star.name not in catalog:
+            catalog = self._refresh_catalog()
+        star_id = catalog.id_of(star.name) if star.name in catalog else -1
+        nearby = self._star_cache.get(star_id)
+        if nearby is None:
+            similar_mag = self._ids_of_keys(self._within_mag(star))
+            similar_dist = self._ids_of_keys(self._within_distance(star))
+            nearby = np.intersect1d(similar_mag, similar_dist, assume_unique=True)
+            if star_id >= 0:
+                self._star_cache[star_id] = nearby
+        return nearby
+
+    def _filter_on_constraints(self, star: Star) -> npt.NDArray[np.int64]:
+        nearby = self._nearby_ids(star)
+        non_variable = self._ids_of_keys(self._non_variable(star))
+        return np.intersect1d(non_variable, nearby, assume_unique=True)
 
     def _model_to_star(self, stardb: StarDB) -> Star:
 
@@ -138,6 +246,32 @@ class DBReader(Reader):
         :param star: StarDB from the database model
         :returns: Star
 
+        """
+        if self.lazy:
+            return LazyStar(
+                name=stardb.name,
+                x=stardb.x,
+                y=stardb.y,
+                load=partial(self._model_to_timeseries, stardb),
+                variable=stardb.variable,
+            )
+        return Star(
+            name=stardb.name,
+            x=stardb.x,
+            y=stardb.y,
+            timeseries=self._model_to_timeseries(stardb),
+            variable=stardb.variable,
+        )
+
+    def _model_to_timeseries(
+        self, stardb: StarDB
+    ) -> Union[StarTimeseries, ArrayTimeseries]:
+
+        """Reads the timeseries rows and features of a db model of a star
+
+        :param star: StarDB from the database model
+        :returns: Timeseries of the star
+
         """
         # this assignment is highly wasteful
         db_time = []
@@ -151,22 +285,36 @@ class DBReader(Reader):
             db_error.append(row.error)
             db_adm.append(row.adm)
             db_ade.append(row.ade)
-        data = pd.DataFrame(
-            {"magnitude": db_mag, "error": db_error, "adm": db_adm, "ade": db_ade},
-            index=pd.to_datetime(db_time, utc=True),
-        )
-        data.index.name = "time"
-        rec_timeseries = StarTimeseries(data=data)
+        # stars observed at the same epochs share one index
+        time, axis, mask = self._axes.intern(from_time_ns(db_time))
+        rec_timeseries: Union[StarTimeseries, ArrayTimeseries]
+        if self.compact:
+            rec_timeseries = ArrayTimeseries(
+                time=time,
+                magnitude=np.asarray(db_mag, dtype=STORAGE_DTYPE),
+                error=np.asarray(db_error, dtype=STORAGE_DTYPE),
+                adm=_optional_floats(db_adm),
+                ade=_optional_floats(db_ade),
+                axis=axis,
+                mask=mask,
+            )
+        else:
+            data = pd.DataFrame(
+                {"magnitude": db_mag, "error": db_error, "adm": db_adm, "ade": db_ade},
+                index=time,
+            )
+            rec_timeseries = StarTimeseries(data=data, axis=axis, mask=mask)
         for row in stardb.features:
             rec_timeseries.add_feature(
                 dt=row.date, name="Inverse Von Neumann", value=row.ivn
             )
             rec_timeseries.add_feature(dt=row.date, name="IQR", value=row.iqr)
-        rec_star = Star(
-            name=stardb.name,
-            x=stardb.x,
-            y=stardb.y,
-            timeseries=rec_timeseries,
-            variable=stardb.variable,
-        )
-        return rec_star
+        return rec_timeseries
+
+
+def _optional_floats(values: List[Optional[float]]) -> Optional[np.ndarray]:
+    """Converts a column that may not have been calculated yet, None when no row
+    holds a value"""
+    if all(x is None for x in values):
+        return None
+    return np.asarray(values, dtype=STORAGE_DTYPE)
@@ -1,9 +1,11 @@
 import logging
 from functools import singledispatchmethod
 from itertools import repeat
-from typing import Dict, Generator, Optional
-import datetime
+from typing import Optional
+
 import numpy as np
+import numpy.typing as npt
+import pandas as pd
 from attr import define, field
 from shutterbug.data.db.model import (
     StarDB,
@@ -13,7 +15,7 @@ from shutterbug.data.db.model import (
 )
 from shutterbug.data.interfaces.internal import Writer
 from shutterbug.data.star import Star
-from sqlalchemy import Date, DateTime, Float, bindparam, select, update
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 
@@ -69,6 +71,29 @@ class DBWriter(Writer):
             self._write_star(star=star, overwrite=overwrite)
         self.session.commit()
 
+    @singledispatchmethod
+    def append(self, data: Star, newer_only: bool = False):
+        """Adds the rows of a star to the timeseries already stored for it, or
+        stores the star if it is new
+
+        Parameter
+        ----------
+        data : Star
+            Star holding only rows not yet in the database
+        newer_only : bool
+            Only add the rows after the latest time already stored for the star,
+            for stars that may hold rows stored before
+
+        """
+        self._append_star(data, newer_only=newer_only)
+        self.session.commit()
+
+    @append.register
+    def _(self, data: list, newer_only: bool = False):
+        for star in data:
+            self._append_star(star, newer_only=newer_only)
+        self.session.commit()
+
     @singledispatchmethod
     def update(self, star: Star):
         self._update_star(star)
@@ -80,6 +105,28 @@ class DBWriter(Writer):
             self._update_star(star)
         self.session.commit()
 
+    def refresh_medians(self):
+        """Calculates the median magnitude of every star that rows were appended to
+        since its median was last calculated, reading the rows of only those stars"""
+        session = self.session
+        statement = (
+            select(StarDB)
+            .join(StarDBDataset)
+            .where(StarDBDataset.name == self.dataset)
+            .where(StarDB.magnitude_median.is_(None))
+        )
+        stale = session.scalars(statement).all()
+        for db_star in stale:
+            magnitudes = session.scalars(
+                select(StarDBTimeseries.mag).where(
+                    StarDBTimeseries.star_id == db_star.id
+                )
+            ).all()
+            db_star.magnitude_median = pd.Series(magnitudes, dtype=float).median()
+        if len(stale) > 0:
+            logging.debug(f"Refreshed median magnitude of {len(stale)} stars")
+        session.commit()
+
     def _write_star(self, star: Star, overwrite: bool = False):
         """Writes star with given session
 
@@ -111,6 +158,50 @@ class DBWriter(Writer):
 
                 session.add(model_star)
 
+    def _append_star(self, star: Star, newer_only: bool = False):
+        """Adds rows to a stored star without reading the rows it already has. Its
+        median magnitude is left to refresh_medians, as it cannot be updated from
+        the new rows alone"""
+        session = self.session
+        db_star = self._get_star(star.name)
+        if not db_star:
+            self._write_star(star)
+            return
+        mag = star.timeseries.magnitude
+        error = star.timeseries.error
+        if newer_only:
+            latest = session.scalar(
+                select(func.max(StarDBTimeseries.time)).where(
+                    StarDBTimeseries.star_id == db_star.id
+                )
+            )
+            if latest is not None:
+                newer = mag.index.asi8 > latest
+                mag = mag[newer]
+                error = error[newer]
+        if len(mag) == 0:
+            logging.debug(f"No new rows to append to star {star.name}")
+            return
+        logging.debug(f"Appending {len(mag)} rows to star {star.name}")
+        # reference stars are chosen by median magnitude, which the new rows move
+        db_star.magnitude_median = None
+        session.add_all(
+            StarDBTimeseries(star_id=db_star.id, time=time, mag=mag, error=error)
+            for time, mag, error in zip(
+                mag.index.asi8.tolist(), mag.tolist(), error.tolist()
+            )
+        )
+        known_dates = set(
+            session.scalars(
+                select(StarDBFeatures.date).where(StarDBFeatures.star_id == db_star.id)
+            )
+        )
+        session.add_all(
+            StarDBFeatures(star_id=db_star.id, date=date, ivn=None, iqr=None)
+            for date in _dates(mag.index)
+            if date not in known_dates
+        )
+
     def _convert_to_model(self, star: Star, median: Optional[float] = None) -> StarDB:
         """Converts a Star datatype into a type writable to the provided database
 
@@ -142,9 +233,12 @@ class DBWriter(Writer):
             sadm = repeat(None)
             sade = repeat(None)
         else:
-            sadm = star.timeseries.differential_magnitude
-            sade = star.timeseries.differential_error
-        timeseries_data = zip(mag.index, mag, error, sadm, sade)
+            sadm = star.timeseries.differential_magnitude.tolist()
+            sade = star.timeseries.differential_error.tolist()
+        # times are stored as the integer nanoseconds the index already holds
+        timeseries_data = zip(
+            mag.index.asi8.tolist(), mag.tolist(), error.tolist(), sadm, sade
+        )
         db_timeseries = []
         for time, mag, error, adm, ade in timeseries_data:
             db_timeseries.append(
@@ -154,7 +248,7 @@ class DBWriter(Writer):
         db_star.dataset = self._db_dataset
         db_features = []
         if star.timeseries.features == {}:
-            for date in np.unique(star.timeseries.time.date):
+            for date in _dates(star.timeseries.time):
                 db_features.append(StarDBFeatures(date=date, ivn=None, iqr=None))
         else:
             for date, features in star.timeseries.features.items():
@@ -175,16 +269,36 @@ class DBWriter(Writer):
         db_star.variable = star.variable
         adm = star.timeseries.differential_magnitude
         ade = star.timeseries.differential_error
+        # stored times are nanoseconds, so rows match up without any datetimes
+        times = adm.index.asi8.tolist()
+        adm_at = dict(zip(times, adm.tolist()))
+        ade_at = dict(zip(times, ade.tolist()))
+        # stored rows without a result, such as rows appended since the star was
+        # read, keep the results they have
+        missing = 0
         for ts_row in db_star.timeseries:
-            # future proofing vs Pandas
-            time = ts_row.time.replace(tzinfo=datetime.timezone.utc)
-            ts_row.adm = adm.loc[time]
-            ts_row.ade = ade.loc[time]
+            if ts_row.time not in adm_at:
+                missing += 1
+                continue
+            ts_row.adm = adm_at[ts_row.time]
+            ts_row.ade = ade_at[ts_row.time]
+        if missing > 0:
+            logging.debug(
+                f"No differential results for {missing} stored rows of star {star.name}"
+            )
         for ts_row in db_star.features:
             date = ts_row.date
-            features = star.timeseries.features[date]
+            features = star.timeseries.features.get(date)
+            if features is None:
+                continue
             # Don't like this, shouldn't need to hand over the
             # full name
             ts_row.ivn = features["Inverse Von Neumann"]
             ts_row.iqr = features["IQR"]
         return True
+
+
+def _dates(time: pd.DatetimeIndex) -> npt.NDArray:
+    """Every distinct date of a timeseries, only converting one time per date to
+    a Python date"""
+    return np.unique(time.normalize().unique().date)
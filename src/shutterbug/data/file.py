@@ -1,19 +1,79 @@
 import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import Generator, Iterable, List, Union
+from typing import Any, Deque, Dict, Generator, Iterable, List, Union
 
+import shutterbug.data.arrow.loader_factory as ArrowFactory
 import shutterbug.data.csv.loader_factory as CSVFactory
+import shutterbug.data.spreadsheet.loader_factory as SpreadsheetFactory
 from attr import define, field
+from shutterbug.data.compression import data_suffix
 from shutterbug.data.interfaces.external import (FileLoaderFactory, Input,
                                                  Loader)
+from shutterbug.data.memory import MemoryLoader
 from shutterbug.data.star import Star
 
-_TYPES: List[FileLoaderFactory] = [CSVFactory]
+_TYPES: List[FileLoaderFactory] = [CSVFactory, ArrowFactory, SpreadsheetFactory]
+
+
+def _file_to_loader(path: Path, options: Dict[str, Any]) -> Union[None, Loader]:
+    """Takes a given file and if it's readable by one of the loaders, return a
+    readied loader of that type
+
+    Parameters
+    ----------
+    path : Path
+        File to load
+    options : Dict[str, Any]
+        Keyword options handed to the loader factory
+
+    Returns
+    -------
+    FileLoaderInterface | None
+        Either a FileLoader if a loader can load the file, or None if
+        nothing can load the file.
+
+    """
+    for factory_type in _TYPES:
+        if data_suffix(path) in factory_type.READABLE_TYPES:
+            try:
+                return factory_type.make_loader(path, **options)  # type: ignore
+            except ValueError as e:
+                logging.debug(
+                    f"Loader {factory_type.__class__} unable to load file {path.name}, received error: {e}"
+                )
+    return None
+
+
+def _load_file(path: Path, options: Dict[str, Any]) -> Union[None, MemoryLoader]:
+    """Parses and validates every star in a file, for use in a worker process
+
+    Parameters
+    ----------
+    path : Path
+        File to load
+    options : Dict[str, Any]
+        Keyword options handed to the loader factory
+
+    Returns
+    -------
+    MemoryLoader | None
+        All stars that could be loaded from the file, or None if nothing can
+        load the file
+
+    """
+    loader = _file_to_loader(path, options)
+    if loader is None:
+        return None
+    return MemoryLoader(source=path.name, stars=list(loader))
 
 
 @define(slots=True)
 class FileInput(Input):
     path: Path = field()
+    loader_options: Dict[str, Any] = field(factory=dict)
+    workers: int = field(default=1)
     _input_files: List[Path] = field(init=False)
 
     def __attrs_post_init__(self):
@@ -42,40 +102,36 @@ class FileInput(Input):
             result.append(path)
         return result
 
-    def _file_to_loader(self, path: Path) -> Union[None, Loader]:
-        """Takes a given file and if it's readable by one of the loaders, return a
-        readied loader of that type
-
-        Parameters
-        ----------
-        path : Path
-            File to load
-
-        Returns
-        -------
-        FileLoaderInterface | None
-            Either a FileLoader if a loader can load the file, or None if
-            nothing can load the file.
-
-        """
-        for factory_type in _TYPES:
-            if path.suffix in factory_type.READABLE_TYPES:
-                try:
-                    return factory_type.make_loader(path)  # type: ignore
-                except ValueError as e:
-                    logging.debug(
-                        f"Loader {factory_type.__class__} unable to load file {path.name}, received error: {e}"
-                    )
-        return None
-
     def __len__(self) -> int:
         """Number of files able to be loaded"""
         return len(self._input_files)
 
     def __iter__(self) -> Generator[Loader, None, None]:
-        for i_file in self._input_files:
-            loader = self._file_to_loader(i_file)
+        if self.workers > 1 and len(self._input_files) > 1:
+            loaders = self._parallel_loaders()
+        else:
+            options = self.loader_options
+            loaders = (_file_to_loader(x, options) for x in self._input_files)
+        for i_file, loader in zip(self._input_files, loaders):
             if loader is not None:
                 yield loader
             else:
                 logging.warning(f"Unable to load file {i_file.name}")
+
+    def _parallel_loaders(self) -> Generator[Union[None, Loader], None, None]:
+        """Parses every file in a pool of worker processes and yields the loaded
+        stars of each file in the same order as loading them one at a time would"""
+        workers = self.workers
+        # files are already spread across processes, don't split them further
+        options = {**self.loader_options, "parse_workers": 1}
+        logging.info(f"Loading {len(self)} files with {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending: Deque[Future] = deque()
+            for i_file in self._input_files:
+                pending.append(executor.submit(_load_file, i_file, options))
+                # keep only a few files ahead of the consumer so parsed stars
+                # don't pile up in memory while they are written
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
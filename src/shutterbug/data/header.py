@@ -1,3 +1,4 @@
+import logging
 from typing import List
 from operator import itemgetter
 from attr import define, field
@@ -65,6 +66,18 @@ class KnownHeader(Header):
         indices = self._get_used_indices(names)
         return itemgetter(*indices)
 
+    @property
+    def timeseries_indices(self) -> List[int]:
+        """Indices of all timeseries information columns in the header"""
+
+        return self._get_used_indices(self.timeseries_names)
+
+    @property
+    def star_indices(self) -> List[int]:
+        """Indices of all star data information columns in the header"""
+
+        return self._get_used_indices(self.star_data)
+
     @property
     def timeseries_getters(self) -> itemgetter:
         """Itemgetter for all timeseries information columns in the header"""
@@ -120,3 +133,15 @@ KNOWN_HEADERS = [
         star_name="Name",
     )
 ]
+
+
+def match_known_header(raw_headers: List[str]) -> KnownHeader:
+    """Finds the known header matching the raw headers of a file, raising a
+    ValueError if the file's headers are unknown"""
+    headers = Header(raw_headers)
+    for known in KNOWN_HEADERS:
+        if headers == known:
+            known.headers = headers.headers
+            logging.debug(f"Input file matches header type {known.header_origin}")
+            return known
+    raise ValueError("Cannot load file, unknown headers")
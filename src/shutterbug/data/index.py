@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from attr import define, field
+
+
+@define(slots=True)
+class IndexEntry:
+    """Star index of a single input file, as stored in the index cache"""
+
+    headers: List[str] = field()
+    stars: Dict[str, Sequence[int]] = field()
+    # format of the file's time column, see star.detect_time_format
+    time_format: Optional[str] = field(default=None)
+
+
+@define(slots=True)
+class IndexCache:
+    """Stores the star index of input files in a folder, keyed by path, size and
+    modification time, so that unchanged files do not need to be rescanned"""
+
+    folder: Path = field()
+    checksum: bool = field(default=False)
+    _entries: Dict[Path, IndexEntry] = field(init=False, factory=dict)
+
+    def _cache_file(self, file_path: Path) -> Path:
+        """Location of the cached index for a given input file"""
+        path_key = str(file_path.resolve()).encode()
+        return self.folder / f"{hashlib.sha1(path_key).hexdigest()}.json"
+
+    def _file_key(self, file_path: Path) -> Dict[str, object]:
+        """Everything about an input file that must not change for its cached index
+        to remain valid"""
+        stat = file_path.stat()
+        key: Dict[str, object] = {
+            "path": str(file_path.resolve()),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+        }
+        if self.checksum:
+            key["checksum"] = _file_checksum(file_path)
+        return key
+
+    def get(self, file_path: Path) -> Optional[IndexEntry]:
+        """Retrieves the cached index for a file if present and still up to date
+
+        Parameters
+        ----------
+        file_path : Path
+            Input file to find the index of
+
+        Returns
+        -------
+        Optional[IndexEntry]
+            Cached index, or None if there is no valid index for the file
+
+        """
+        if file_path in self._entries:
+            return self._entries[file_path]
+        cache_file = self._cache_file(file_path)
+        if not cache_file.exists():
+            return None
+        try:
+            with open(cache_file, mode="r") as f:
+                cached = json.load(f)
+            if cached["key"] != self._file_key(file_path):
+                logging.debug(f"Index for {file_path.name} is out of date, ignoring")
+                return None
+            entry = IndexEntry(
+                headers=cached["headers"],
+                stars=cached["stars"],
+                time_format=cached.get("time_format"),
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(
+                f"Unable to read index for {file_path.name}, received error: {e}"
+            )
+            return None
+        logging.debug(f"Using cached index for {file_path.name}")
+        self._entries[file_path] = entry
+        return entry
+
+    def put(self, file_path: Path, entry: IndexEntry) -> None:
+        """Stores the index of a file, replacing any index previously stored for it
+
+        Parameters
+        ----------
+        file_path : Path
+            Input file the index belongs to
+        entry : IndexEntry
+            Raw headers and star index of the file
+
+        """
+        self._entries[file_path] = entry
+        cache_file = self._cache_file(file_path)
+        cached = {
+            "key": self._file_key(file_path),
+            "headers": entry.headers,
+            "stars": {x: np.asarray(y).tolist() for x, y in entry.stars.items()},
+            "time_format": entry.time_format,
+        }
+        try:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            # write then move so a reader never sees a half written index
+            partial = cache_file.with_suffix(".tmp")
+            with open(partial, mode="w") as f:
+                json.dump(cached, f)
+            os.replace(partial, cache_file)
+            logging.debug(f"Stored index for {file_path.name} in {cache_file}")
+        except OSError as e:
+            logging.warning(
+                f"Unable to store index for {file_path.name}, received error: {e}"
+            )
+
+
+def _file_checksum(file_path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hashes the entire contents of a file"""
+    digest = hashlib.sha256()
+    with open(file_path, mode="rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
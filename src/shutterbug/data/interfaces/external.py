@@ -1,6 +1,14 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Generator, Iterable, List, Protocol, Union
+from typing import (
+    Any,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Union,
+)
 
 from shutterbug.data.star import Star
 
@@ -23,6 +31,22 @@ class Loader(Protocol):
         ...
 
 
+class IndexedLoader(Loader, Protocol):
+    """Loader able to tell which stars a source holds without reading it, such as
+    from an index kept from an earlier run"""
+
+    def indexed_names(self) -> Optional[List[str]]:
+        ...
+
+
+class FollowLoader(Loader, Protocol):
+    """Loader of a file that is still being appended to, able to load only the
+    rows added since it last looked"""
+
+    def new_stars(self) -> Generator[Star, None, None]:
+        ...
+
+
 class Input(ABC):
     @abstractmethod
     def __len__(self) -> int:
@@ -36,5 +60,5 @@ class Input(ABC):
 class FileLoaderFactory(Protocol):
     READABLE_TYPES: Iterable[str]
 
-    def make_loader(self, file_path: Path) -> Loader:
+    def make_loader(self, file_path: Path, **options: Any) -> Loader:
         ...
@@ -3,8 +3,11 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from functools import singledispatchmethod
 from pathlib import Path
-from typing import Generator, List
+from typing import Generator, List, Optional
 
+import numpy as np
+import numpy.typing as npt
+from shutterbug.data.catalog import StarCatalog
 from shutterbug.data.star import Star
 
 
@@ -15,6 +18,25 @@ class Reader(ABC):
     def similar_to(self, star: Star) -> List[str]:
         raise NotImplementedError
 
+    @abstractmethod
+    def similar_ids(self, star: Star) -> npt.NDArray[np.int64]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def ensemble_ids(self) -> npt.NDArray[np.int64]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def excluded_ids(
+        self, star: Star, ensemble: Optional[npt.NDArray[np.int64]] = None
+    ) -> npt.NDArray[np.int64]:
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def catalog(self) -> StarCatalog:
+        raise NotImplementedError
+
     @abstractmethod
     def __iter__(self) -> Generator[Star, None, None]:
         raise NotImplementedError
@@ -32,6 +54,10 @@ class Reader(ABC):
     def get_many(self, names: List[str]) -> List[Star]:
         raise NotImplemented
 
+    @abstractmethod
+    def get_ids(self, ids: npt.ArrayLike) -> List[Star]:
+        raise NotImplementedError
+
     @property
     @abstractmethod
     def variable(self) -> Generator[Star, None, None]:
@@ -53,6 +79,20 @@ class Writer(ABC):
         # have to use list as type due to bug with singledispatch
         raise NotImplementedError
 
+    @singledispatchmethod
+    @abstractmethod
+    def append(self, data: Star, newer_only: bool):
+        raise NotImplementedError
+
+    @append.register
+    @abstractmethod
+    def _(self, data: list, newer_only: bool):
+        raise NotImplementedError
+
+    @abstractmethod
+    def refresh_medians(self):
+        raise NotImplementedError
+
     @singledispatchmethod
     @abstractmethod
     def update(self, data: Star):
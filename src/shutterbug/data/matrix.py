@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict, Generator, Iterable, List, Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from attr import define, field
+from scipy import sparse
+from shutterbug.data.axis import TimeAxis
+from shutterbug.data.star import ArrayTimeseries, Star
+
+Features = Dict[date, Dict[str, float]]
+
+
+@define(slots=True)
+class StarMatrix:
+    """Every star of a dataset held as contiguous arrays, with one row per epoch
+    and one column per star, so that operations over the whole dataset work on
+    entire arrays at once. Epochs a star was not observed at hold NaN"""
+
+    axis: TimeAxis = field()
+    names: List[str] = field()
+    x: npt.NDArray[np.int64] = field()
+    y: npt.NDArray[np.int64] = field()
+    variable: npt.NDArray[np.bool_] = field()
+    # (epoch, star) arrays
+    observed: npt.NDArray[np.bool_] = field()
+    magnitude: npt.NDArray[np.floating] = field()
+    error: npt.NDArray[np.floating] = field()
+    adm: npt.NDArray[np.floating] = field()
+    ade: npt.NDArray[np.floating] = field()
+    # whether each star has differential results at all
+    differential: npt.NDArray[np.bool_] = field()
+    features: List[Features] = field()
+    _columns: Dict[str, int] = field(init=False)
+
+    def __attrs_post_init__(self):
+        self._columns = {name: idx for idx, name in enumerate(self.names)}
+
+    @classmethod
+    def from_stars(cls, stars: Iterable[Star]) -> StarMatrix:
+        """Builds the matrix of a group of stars, over every epoch any of them was
+        observed at. Each star's times must not repeat
+
+        Parameters
+        ----------
+        stars : Iterable[Star]
+            Stars to hold
+
+        Returns
+        -------
+        StarMatrix
+            Matrix of all given stars, in the order given
+
+        """
+        stars = list(stars)
+        axes = {id(x.timeseries.axis): x.timeseries.axis for x in stars}
+        axis = next(iter(axes.values()), None)
+        if len(axes) != 1 or axis is None or not axis.time.is_unique:
+            times = [x.timeseries.time for x in stars]
+            union = times[0].union_many(times[1:]) if times else pd.DatetimeIndex([])
+            axis = TimeAxis(time=pd.DatetimeIndex(union, name="time"))
+            if not axis.time.is_unique:
+                raise ValueError("Stars have repeated times")
+        shape = (len(axis), len(stars))
+        dtype = np.result_type(
+            np.float32, *[x.timeseries.magnitude.dtype for x in stars]
+        )
+        observed = np.zeros(shape, dtype=np.bool_)
+        arrays = {
+            x: np.full(shape, np.nan, dtype=dtype)
+            for x in ("magnitude", "error", "adm", "ade")
+        }
+        differential = np.zeros(len(stars), dtype=np.bool_)
+        for column, star in enumerate(stars):
+            timeseries = star.timeseries
+            if timeseries.axis is axis and timeseries.mask is not None:
+                rows = np.flatnonzero(timeseries.mask)
+            elif timeseries.axis is axis:
+                rows = np.arange(len(axis))
+            else:
+                rows = axis.time.get_indexer(timeseries.time)
+                if np.any(rows < 0):
+                    raise ValueError(f"Star {star.name} has repeated times")
+            observed[rows, column] = True
+            arrays["magnitude"][rows, column] = timeseries.magnitude
+            arrays["error"][rows, column] = timeseries.error
+            if len(timeseries.differential_magnitude) == len(rows):
+                differential[column] = True
+                arrays["adm"][rows, column] = pd.to_numeric(
+                    timeseries.differential_magnitude
+                )
+                arrays["ade"][rows, column] = pd.to_numeric(
+                    timeseries.differential_error
+                )
+        return cls(
+            axis=axis,
+            names=[x.name for x in stars],
+            x=np.asarray([x.x for x in stars], dtype=np.int64),
+            y=np.asarray([x.y for x in stars], dtype=np.int64),
+            variable=np.asarray([x.variable for x in stars], dtype=np.bool_),
+            observed=observed,
+            differential=differential,
+            features=[x.timeseries.features for x in stars],
+            **arrays,
+        )
+
+    @property
+    def time(self) -> pd.DatetimeIndex:
+        return self.axis.time
+
+    @property
+    def median(self) -> npt.NDArray[np.float64]:
+        """Median magnitude of every star"""
+        if self.magnitude.size == 0:
+            return np.full(len(self.names), np.nan)
+        return np.nanmedian(self.magnitude, axis=0)
+
+    def __len__(self) -> int:
+        """Number of stars"""
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def column(self, name: str) -> int:
+        """Column of the arrays a star is in"""
+        return self._columns[name]
+
+    def get(self, name: str) -> Union[Star, None]:
+        """Builds a Star from its column of the matrix"""
+        if name not in self._columns:
+            return None
+        column = self._columns[name]
+        rows = self.observed[:, column]
+        mask = None if rows.all() else rows.copy()
+        time = self.time if mask is None else self.time[mask]
+        differential = self.differential[column]
+        timeseries = ArrayTimeseries(
+            time=time,
+            magnitude=self.magnitude[rows, column],
+            error=self.error[rows, column],
+            adm=self.adm[rows, column] if differential else None,
+            ade=self.ade[rows, column] if differential else None,
+            axis=self.axis,
+            mask=mask,
+        )
+        for dt, features in self.features[column].items():
+            for feature, value in features.items():
+                timeseries.add_feature(dt=dt, name=feature, value=value)
+        return Star(
+            name=name,
+            x=self.x[column],
+            y=self.y[column],
+            timeseries=timeseries,
+            variable=bool(self.variable[column]),
+        )
+
+    def __iter__(self) -> Generator[Star, None, None]:
+        for name in self.names:
+            yield self.get(name)  # type: ignore
+
+    def update(self, star: Star) -> None:
+        """Stores the differential results, features and variability of a star
+        back into its column"""
+        column = self._columns[star.name]
+        rows = self.observed[:, column]
+        timeseries = star.timeseries
+        if len(timeseries.differential_magnitude) == np.count_nonzero(rows):
+            self.adm[rows, column] = pd.to_numeric(timeseries.differential_magnitude)
+            self.ade[rows, column] = pd.to_numeric(timeseries.differential_error)
+            self.differential[column] = True
+        self.variable[column] = star.variable
+        self.features[column] = timeseries.features
+
+
+@define(slots=True)
+class LeaveOneOut:
+    """Reference stars of every star of a matrix given as one ensemble shared by
+    all of them, less each star itself and the few ensemble stars excluded for it.
+    Sums over the ensemble can then be taken once and each star's own
+    contribution and exclusions taken away"""
+
+    # whether each column of the matrix is in the ensemble
+    members: npt.NDArray[np.bool_] = field()
+    # (target, column) matrix, nonzero where an ensemble star is excluded for a
+    # star besides the star itself
+    excluded: sparse.csr_matrix = field()
+
+    def selection(self) -> sparse.csr_matrix:
+        """The equivalent (target, reference) matrix, with a row per star"""
+        count = len(self.members)
+        ensemble = sparse.csr_matrix(
+            np.broadcast_to(self.members, (count, count)).astype(np.float64)
+        )
+        selection = ensemble - ensemble.multiply(self.excluded != 0)
+        selection = selection - sparse.diags(selection.diagonal())
+        selection.eliminate_zeros()
+        return sparse.csr_matrix(selection)
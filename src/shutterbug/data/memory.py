@@ -0,0 +1,35 @@
+from typing import Dict, Generator, List, Optional, Union
+
+from attr import define, field
+from shutterbug.data.star import Star
+
+
+@define(slots=True)
+class MemoryLoader:
+    """Loader for stars that have already been parsed into memory, such as those
+    handed back by a worker process"""
+
+    source: str = field()
+    stars: List[Star] = field()
+    _by_name: Dict[str, Star] = field(init=False)
+
+    def __attrs_post_init__(self):
+        self._by_name = {star.name: star for star in self.stars}
+
+    def __len__(self) -> int:
+        """Number of stars held in memory"""
+        return len(self.stars)
+
+    @property
+    def names(self) -> List[str]:
+        return [star.name for star in self.stars]
+
+    def indexed_names(self) -> Optional[List[str]]:
+        """Names of the stars held, which are always known"""
+        return self.names
+
+    def get(self, name: str) -> Union[Star, None]:
+        return self._by_name.get(name, None)
+
+    def __iter__(self) -> Generator[Star, None, None]:
+        yield from self.stars
@@ -0,0 +1,155 @@
+import logging
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple, Union
+
+from attr import define, field
+from more_itertools import chunked, map_reduce
+from openpyxl import load_workbook
+from shutterbug.data.csv.partial import merge_partials, parse_rows
+from shutterbug.data.csv.spill import SpillStore
+from shutterbug.data.header import KnownHeader
+from shutterbug.data.index import IndexCache, IndexEntry
+from shutterbug.data.star import Star, detect_time_format
+
+# Rows of a sheet parsed at once, before they are written to disk
+SHEET_CHUNK_ROWS = 1 << 14
+
+
+def cell_text(value: Any) -> str:
+    """Text of a cell value, as it would have been written to a CSV"""
+    if value is None:
+        return ""
+    return str(value)
+
+
+def sheet_rows(
+    file_path: Path, min_row: int = 1
+) -> Generator[Tuple[int, List[str]], None, None]:
+    """Streams the rows of the first sheet of a workbook as text, alongside their
+    row number, without loading the entire sheet into memory. Empty rows are
+    skipped"""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(min_row=min_row, values_only=True)
+        for row_number, values in enumerate(rows, start=min_row):
+            if all(x is None for x in values):
+                continue
+            yield row_number, [cell_text(x) for x in values]
+    finally:
+        workbook.close()
+
+
+@define(slots=True)
+class SpreadsheetLoader:
+    """Loads stars from the first sheet of an Excel workbook, streaming its rows
+    rather than loading the whole workbook. As rows of a sheet cannot be read on
+    their own, the sheet is parsed once into a temporary file that every star is
+    read back from"""
+
+    input_file: Path = field()
+    headers: KnownHeader = field()
+    index_cache: Optional[IndexCache] = field(default=None)
+    # Format of the time column, detected from the first rows if not given
+    time_format: Optional[str] = field(default=None)
+    _stars: Dict[str, Sequence[int]] = field(init=False)
+    # Parsed rows of the sheet on disk, once it has been read through
+    _spilled: Optional[SpillStore] = field(init=False, default=None)
+    _spill_folder: Optional[tempfile.TemporaryDirectory] = field(
+        init=False, default=None
+    )
+
+    def _star_count(self) -> Dict[str, Sequence[int]]:
+        """Streams through the entire sheet and finds each star and the row number
+        of every row that star's name corresponds to"""
+        if self.indexed_names() is None:
+            name_index = self.headers.name_index
+            # Take row number and row, return header name
+            keyfunc = lambda x: x[1][name_index]
+            # Take row number and row, return row number
+            valuefunc = lambda x: x[0]
+            self._store_index(map_reduce(self._numbered_rows(), keyfunc, valuefunc))
+        return self._stars
+
+    def indexed_names(self) -> Optional[List[str]]:
+        """Names of the stars in the sheet if they are already known, from an
+        earlier pass or the index cache, without reading the sheet"""
+        if not hasattr(self, "_stars") and self.index_cache is not None:
+            cached = self.index_cache.get(self.input_file)
+            if cached is not None:
+                self._stars = cached.stars
+        if hasattr(self, "_stars"):
+            return list(self._stars.keys())
+        if self._spilled is not None:
+            return self._spilled.names
+        return None
+
+    def _store_index(self, stars: Dict[str, Sequence[int]]) -> None:
+        """Keeps the row numbers of each star, storing them in the index cache if
+        there is one"""
+        self._stars = stars
+        if self.index_cache is not None:
+            entry = IndexEntry(headers=self.headers.headers, stars=stars)
+            self.index_cache.put(self.input_file, entry)
+
+    def __len__(self):
+        """Number of stars in given sheet"""
+        return len(self.names)
+
+    @property
+    def names(self) -> List[str]:
+        names = self.indexed_names()
+        if names is None:
+            names = list(self._star_count().keys())
+        return names
+
+    def _numbered_rows(self) -> Generator[Tuple[int, List[str]], None, None]:
+        """Skips header and returns every data row alongside its row number. The
+        header is the first row that is not empty, as when it was matched"""
+        rows = sheet_rows(self.input_file)
+        try:
+            next(rows, None)
+            yield from rows
+        finally:
+            rows.close()
+
+    def _detect_time_format(self, sample: Sequence[str]) -> str:
+        """Format of the time column of the sheet, detected once from the first
+        rows parsed"""
+        if self.time_format is None:
+            self.time_format = detect_time_format(sample)
+        return self.time_format
+
+    def _spill_store(self) -> SpillStore:
+        """Parses the whole sheet once, a chunk of rows at a time, into a temporary
+        file on disk. The rows of any star can then be read back from it without
+        streaming the sheet again, and no more than a chunk of rows is held in
+        memory"""
+        if self._spilled is None:
+            folder = tempfile.TemporaryDirectory(prefix="shutterbug-")
+            store = SpillStore(folder=Path(folder.name))
+            for chunk in chunked(self._numbered_rows(), SHEET_CHUNK_ROWS):
+                store.spill(parse_rows(chunk, self.headers, self._detect_time_format))
+            self._spill_folder = folder
+            self._spilled = store
+        return self._spilled
+
+    def _make_star(self, name: str) -> Union[Star, None]:
+        """Builds a star from its rows read back from the parsed sheet"""
+        partials = self._spill_store().read(name)
+        if len(partials) == 0:
+            return None
+        return merge_partials(name, partials)
+
+    def get(self, name: str) -> Union[Star, None]:
+        return self._make_star(name)
+
+    def __iter__(self) -> Generator[Star, None, None]:
+        for star_name in self._spill_store().names:
+            try:
+                star = self._make_star(star_name)
+                if star is not None:
+                    yield star
+            except ValueError as e:
+                logging.warning(f"Unable to load star {star_name} due to error: {e}")
@@ -0,0 +1,62 @@
+from pathlib import Path
+from typing import List, Optional
+from zipfile import BadZipFile
+
+from openpyxl.utils.exceptions import InvalidFileException
+
+from shutterbug.data.compression import is_compressed
+from shutterbug.data.header import KnownHeader, match_known_header
+from shutterbug.data.index import IndexCache
+from shutterbug.data.spreadsheet.loader import SpreadsheetLoader, sheet_rows
+
+# openpyxl only reads the Office Open XML formats, not .xls or .ods
+READABLE_TYPES = {".xlsx", ".xlsm", ".xltx", ".xltm"}
+
+
+def make_loader(
+    file_path: Path, index_cache: Optional[IndexCache] = None, **_kwargs
+) -> SpreadsheetLoader:
+
+    """Takes a file path and creates a SpreadsheetLoader to consume stars from the
+    first sheet of an Excel workbook
+
+    :param file_path: Path to workbook
+    :param index_cache: Optional, cache of star indices to reuse for unchanged files
+    :returns: FileLoader that loads each star from a workbook
+
+    """
+    if is_compressed(file_path):
+        raise ValueError(
+            f"Cannot load {file_path.name}, workbooks are already compressed"
+        )
+    headers = _headers_from_file(file_path, index_cache)
+    return SpreadsheetLoader(
+        input_file=file_path, headers=headers, index_cache=index_cache
+    )
+
+
+def _headers_from_file(
+    file_path: Path, index_cache: Optional[IndexCache] = None
+) -> KnownHeader:
+    """Verifies the workbook header row against known headers and returns known
+    header"""
+    cached = None if index_cache is None else index_cache.get(file_path)
+    if cached is not None:
+        return match_known_header(cached.headers)
+    return match_known_header(_read_file_header(file_path))
+
+
+def _read_file_header(file_path: Path) -> List[str]:
+    """Reads the first row of a workbook and returns the raw headers"""
+    rows = sheet_rows(file_path)
+    try:
+        _, raw_headers = next(rows)
+    except StopIteration:
+        raise ValueError(
+            f"File {file_path.name} does not contain headers, cannot continue"
+        )
+    except (OSError, KeyError, BadZipFile, InvalidFileException) as e:
+        raise ValueError(f"Cannot read workbook {file_path.name}: {e}")
+    finally:
+        rows.close()
+    return raw_headers
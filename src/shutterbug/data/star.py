@@ -3,32 +3,93 @@ from __future__ import annotations
 import logging
 import sys
 from datetime import date
-from typing import Dict, List, Union
+from typing import Callable, Dict, List, Optional, Union
 
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
 from attr import define, field
+from shutterbug.data.axis import TimeAxis
 from shutterbug.data.header import KnownHeader
 from shutterbug.data.validate import _empty_rows, _has_data, _is_same_length
 
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+
+# Photometric columns are stored in single precision, which holds more digits
+# than any measurement has, while sums and means over them are taken in double
+# precision so rounding does not build up
+STORAGE_DTYPE = np.float32
+ACCUMULATOR_DTYPE = np.float64
+
 
 def asfloat(value: List[str]) -> npt.NDArray[np.float32]:
-    return pd.to_numeric(value, errors="coerce", downcast="float")  # type: ignore
+    return np.asarray(pd.to_numeric(value, errors="coerce"), dtype=STORAGE_DTYPE)
 
 
-def asdatetime(value) -> pd.DatetimeIndex:
-    try:
-        # Try julian date
-        fl = pd.to_numeric(value, errors="coerce")
-        datetimes = pd.to_datetime(
-            fl, errors="coerce", origin="julian", unit="D", utc=True
-        )
-        if all(pd.isna(datetimes)):
-            raise ValueError
-    except (ValueError, NameError):
-        # Try guessing
+# Time formats, besides an explicit strftime format
+JULIAN_DATE = "julian"
+GUESSED = "guess"
+
+
+def _from_julian(value) -> pd.DatetimeIndex:
+    fl = pd.to_numeric(value, errors="coerce")
+    return pd.to_datetime(fl, errors="coerce", origin="julian", unit="D", utc=True)
+
+
+def detect_time_format(sample) -> str:
+    """Works out how a column of times is written from a sample of it
+
+    Parameters
+    ----------
+    sample : ArrayLike
+        Some of the raw values of the time column
+
+    Returns
+    -------
+    str
+        JULIAN_DATE for Julian dates, a strftime format if every value has the same
+        one, or GUESSED when the format has to be guessed value by value
+
+    """
+    values = np.asarray(sample)
+    if not _from_julian(values).isna().all():
+        return JULIAN_DATE
+    guessed = pd.to_datetime(values, errors="coerce", utc=True)
+    first = next((str(x) for x in values if isinstance(x, str) and x.strip()), None)
+    fmt = None if first is None else guess_datetime_format(first.strip())
+    if fmt is not None:
+        try:
+            fixed = pd.to_datetime(values, format=fmt, errors="coerce", utc=True)
+            if fixed.equals(guessed):
+                return fmt
+        except ValueError:
+            pass
+    return GUESSED
+
+
+def from_time_ns(value: npt.ArrayLike) -> pd.DatetimeIndex:
+    """Converts UTC times stored as integer nanoseconds since the epoch, the form
+    times are kept in outside of a timeseries, back to datetimes"""
+    times = pd.to_datetime(np.asarray(value, dtype=np.int64), utc=True)
+    return pd.DatetimeIndex(times, name="time")
+
+
+def asdatetime(value, fmt: Optional[str] = None) -> pd.DatetimeIndex:
+    """Converts raw times to datetimes in one call, in the given format from
+    detect_time_format. Without a format Julian dates are tried first and the
+    format is guessed if no value is one"""
+    if fmt is None or fmt == JULIAN_DATE:
+        datetimes = _from_julian(value)
+        if fmt is None and datetimes.isna().all():
+            fmt = GUESSED
+    if fmt == GUESSED:
         datetimes = pd.to_datetime(value, errors="coerce", utc=True)
+    elif fmt is not None and fmt != JULIAN_DATE:
+        datetimes = pd.to_datetime(value, format=fmt, errors="coerce", utc=True)
     datetimes = datetimes.round("1us")
     return pd.DatetimeIndex(datetimes, name="time", yearfirst=True)
 
@@ -38,6 +99,10 @@ class StarTimeseries:
     """Timeseries information for a star"""
 
     data: pd.DataFrame = field()
+    # Time axis shared with other stars of the dataset and, if the star is
+    # missing some of the axis' epochs, which epochs it has
+    axis: Optional[TimeAxis] = field(default=None)
+    mask: Optional[npt.NDArray[np.bool_]] = field(default=None)
     _features: Dict[date, Dict[str, float]] = field(init=False, default={})
 
     def __attrs_post_init__(self):
@@ -53,7 +118,7 @@ class StarTimeseries:
 
     @magnitude.setter
     def magnitude(self, data: pd.Series) -> None:
-        self.data["magnitude"] = data
+        self.data["magnitude"] = data.astype(STORAGE_DTYPE)
 
     @property
     def error(self) -> pd.Series:
@@ -61,36 +126,43 @@ class StarTimeseries:
 
     @error.setter
     def error(self, data: pd.Series) -> None:
-        self.data["error"] = data
+        self.data["error"] = data.astype(STORAGE_DTYPE)
 
     @property
     def differential_magnitude(self) -> pd.Series:
         if "adm" in self.data.columns:
             return self.data["adm"]
         else:
-            return pd.Series(dtype="float32")
+            return pd.Series(dtype=STORAGE_DTYPE)
 
     @differential_magnitude.setter
     def differential_magnitude(self, data: pd.Series) -> None:
-        self.data["adm"] = data
+        self.data["adm"] = data.astype(STORAGE_DTYPE)
 
     @property
     def differential_error(self) -> pd.Series:
         if "ade" in self.data.columns:
             return self.data["ade"]
         else:
-            return pd.Series(dtype="float32")
+            return pd.Series(dtype=STORAGE_DTYPE)
 
     @differential_error.setter
     def differential_error(self, data: pd.Series) -> None:
-        self.data["ade"] = data
+        self.data["ade"] = data.astype(STORAGE_DTYPE)
 
     def drop_rows(self, rows: List[int]) -> None:
-        row_indices = self.data.index.to_numpy()[rows]
-        self.data = self.data.drop(index=row_indices)  # type: ignore
-
-    def __eq__(self, other: StarTimeseries):
-        if other.__class__ is not self.__class__:
+        if len(rows) == 0:
+            return
+        # by position, as times may repeat or be missing
+        keep = np.ones(len(self.data), dtype=np.bool_)
+        keep[rows] = False
+        self.data = self.data.iloc[keep]
+        # no longer lines up with the axis
+        self.axis = None
+        self.mask = None
+
+    def __eq__(self, other: Union[StarTimeseries, ArrayTimeseries]):
+        if not isinstance(other, (StarTimeseries, ArrayTimeseries)):
             return NotImplemented
 
         return (
@@ -116,28 +188,169 @@ class StarTimeseries:
     @property
     def nbytes(self) -> int:
         """Number of bytes the timeseries consumes in memory"""
-        return self.data.nbytes
+        return int(self.data.memory_usage(index=True, deep=True).sum())
 
     @classmethod
     def from_rows(
-        cls, rows: List[List[str]], row_headers: KnownHeader
+        cls,
+        rows: List[List[str]],
+        row_headers: KnownHeader,
+        time_format: Optional[str] = None,
     ) -> StarTimeseries:
         logging.debug(f"Building timeseries, number of rows: {len(rows)}")
         getter = row_headers.timeseries_getters
         timeseries = list(map(getter, rows))
         # so we can get each specific column without fuss
         np_data = np.asarray(timeseries)
+        return cls.from_arrays(
+            time=np_data[:, 0],
+            magnitude=np_data[:, 1],
+            error=np_data[:, 2],
+            time_format=time_format,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        time: Union[pd.DatetimeIndex, npt.ArrayLike],
+        magnitude: npt.ArrayLike,
+        error: npt.ArrayLike,
+        time_format: Optional[str] = None,
+        validate: bool = True,
+    ) -> StarTimeseries:
+        """Builds a timeseries from column arrays, which may either be raw values or
+        already converted to times and floats. Arrays already checked with
+        validate_batch need not be validated again"""
+        if not isinstance(time, pd.DatetimeIndex):
+            time = asdatetime(time, time_format)
         df = pd.DataFrame(
-            data={"magnitude": asfloat(np_data[:, 1]), "error": asfloat(np_data[:, 2])},
-            index=asdatetime(np_data[:, 0]),
+            data={"magnitude": asfloat(magnitude), "error": asfloat(error)},
+            index=time,
         )
 
         ts = cls(data=df)  # type: ignore
-        ts = validate_timeseries(ts)
+        if validate:
+            ts = validate_timeseries(ts)
         logging.debug("Finished building timeseries")
         return ts
 
 
+@define(slots=True)
+class ArrayTimeseries:
+    """Timeseries information for a star held in plain numpy arrays, exposing the
+    same properties as StarTimeseries without the overhead of a DataFrame per
+    star. Series and DataFrames are only built when asked for"""
+
+    time: pd.DatetimeIndex = field()
+    _magnitude: npt.NDArray[np.floating] = field()
+    _error: npt.NDArray[np.floating] = field()
+    _adm: Optional[npt.NDArray[np.floating]] = field(default=None)
+    _ade: Optional[npt.NDArray[np.floating]] = field(default=None)
+    axis: Optional[TimeAxis] = field(default=None)
+    mask: Optional[npt.NDArray[np.bool_]] = field(default=None)
+    _features: Dict[date, Dict[str, float]] = field(init=False, factory=dict)
+
+    def _values(self, data: pd.Series) -> npt.NDArray[np.float32]:
+        """Values of a series lined up with this timeseries' times"""
+        if not (data.index is self.time or data.index.equals(self.time)):
+            data = data.reindex(self.time)
+        return data.to_numpy(dtype=STORAGE_DTYPE)
+
+    def _series(self, values: npt.NDArray, name: str) -> pd.Series:
+        return pd.Series(values, index=self.time, name=name, copy=False)
+
+    @property
+    def magnitude(self) -> pd.Series:
+        return self._series(self._magnitude, "magnitude")
+
+    @magnitude.setter
+    def magnitude(self, data: pd.Series) -> None:
+        self._magnitude = self._values(data)
+
+    @property
+    def error(self) -> pd.Series:
+        return self._series(self._error, "error")
+
+    @error.setter
+    def error(self, data: pd.Series) -> None:
+        self._error = self._values(data)
+
+    @property
+    def differential_magnitude(self) -> pd.Series:
+        if self._adm is None:
+            return pd.Series(dtype=STORAGE_DTYPE)
+        return self._series(self._adm, "adm")
+
+    @differential_magnitude.setter
+    def differential_magnitude(self, data: pd.Series) -> None:
+        self._adm = self._values(data)
+
+    @property
+    def differential_error(self) -> pd.Series:
+        if self._ade is None:
+            return pd.Series(dtype=STORAGE_DTYPE)
+        return self._series(self._ade, "ade")
+
+    @differential_error.setter
+    def differential_error(self, data: pd.Series) -> None:
+        self._ade = self._values(data)
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """All columns of the timeseries, built anew on every call"""
+        columns = {"magnitude": self._magnitude, "error": self._error}
+        if self._adm is not None:
+            columns["adm"] = self._adm
+        if self._ade is not None:
+            columns["ade"] = self._ade
+        return pd.DataFrame(columns, index=self.time)
+
+    def drop_rows(self, rows: List[int]) -> None:
+        if len(rows) == 0:
+            return
+        keep = np.ones(len(self.time), dtype=np.bool_)
+        keep[rows] = False
+        self.time = self.time[keep]
+        self._magnitude = self._magnitude[keep]
+        self._error = self._error[keep]
+        if self._adm is not None:
+            self._adm = self._adm[keep]
+        if self._ade is not None:
+            self._ade = self._ade[keep]
+        # no longer lines up with the axis
+        self.axis = None
+        self.mask = None
+
+    def __eq__(self, other: Union[StarTimeseries, ArrayTimeseries]):
+        if not isinstance(other, (StarTimeseries, ArrayTimeseries)):
+            return NotImplemented
+
+        return (
+            other.magnitude.equals(self.magnitude)
+            and other.error.equals(self.error)
+            and other.differential_error.equals(self.differential_error)
+            and other.differential_magnitude.equals(self.differential_magnitude)
+            and other.features == self.features
+        )
+
+    @property
+    def features(self) -> Dict[date, Dict[str, float]]:
+        return self._features.copy()
+
+    def add_feature(self, dt: date, name: str, value: float) -> None:
+        features = self._features
+        if dt in features:
+            features[dt][name] = value
+        else:
+            features[dt] = {name: value}
+
+    @property
+    def nbytes(self) -> int:
+        """Number of bytes the timeseries consumes in memory"""
+        arrays = [self._magnitude, self._error, self._adm, self._ade, self.mask]
+        return sum(x.nbytes for x in arrays if x is not None) + self.time.nbytes
+
+
 @define(slots=True)
 class Star:
     """Dataclass describing a star's information"""
@@ -146,7 +359,7 @@ class Star:
     # First to float and then to int to prevent odd reading errors
     x: int = field(converter=[float, int])
     y: int = field(converter=[float, int])
-    timeseries: StarTimeseries = field()
+    timeseries: Union[StarTimeseries, ArrayTimeseries] = field()
     variable: bool = field(default=False)
 
     @property
@@ -161,19 +374,43 @@ class Star:
 
     @classmethod
     def from_rows(
-        cls, rows: List[List[str]], row_headers: KnownHeader
+        cls,
+        rows: List[List[str]],
+        row_headers: KnownHeader,
+        time_format: Optional[str] = None,
     ) -> Union[Star, None]:
         name, x, y = row_headers.star_getters(rows[0])
         logging.info(f"Building star object {name}, x: {x}, y: {y}")
         try:
-            timeseries = StarTimeseries.from_rows(rows, row_headers)
+            timeseries = StarTimeseries.from_rows(rows, row_headers, time_format)
+        except ValueError as e:
+            logging.error(f"Unable to create timeseries, received error: {e}")
+            return None
+        return cls(name=name, x=x, y=y, timeseries=timeseries)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        name: str,
+        x: float,
+        y: float,
+        time: Union[pd.DatetimeIndex, npt.ArrayLike],
+        magnitude: npt.ArrayLike,
+        error: npt.ArrayLike,
+        validate: bool = True,
+    ) -> Union[Star, None]:
+        logging.info(f"Building star object {name}, x: {x}, y: {y}")
+        try:
+            timeseries = StarTimeseries.from_arrays(
+                time, magnitude, error, validate=validate
+            )
         except ValueError as e:
             logging.error(f"Unable to create timeseries, received error: {e}")
             return None
         return cls(name=name, x=x, y=y, timeseries=timeseries)
 
     def __eq__(self, other: Star):
-        if other.__class__ is not self.__class__:
+        if not isinstance(other, Star):
             return NotImplemented
 
         return (
@@ -192,7 +429,9 @@ class Star:
         return df
 
 
-def validate_timeseries(ts: StarTimeseries) -> StarTimeseries:
+def validate_timeseries(
+    ts: Union[StarTimeseries, ArrayTimeseries]
+) -> Union[StarTimeseries, ArrayTimeseries]:
     mag = ts.magnitude.to_numpy()
     error = ts.error.to_numpy()
     ts.drop_rows(_empty_rows(mag, error))
@@ -206,3 +445,44 @@ def validate_timeseries(ts: StarTimeseries) -> StarTimeseries:
     except AssertionError:
         raise ValueError("Either magnitude or error has no values")
     return ts
+
+
+# slot holding the timeseries of every star, underneath LazyStar's property
+_timeseries_slot = Star.__dict__["timeseries"]
+
+
+class LazyStar(Star):
+    """Star whose timeseries is only fetched, and then kept, the first time it is
+    accessed, so that reading a star's name, position or variability costs no
+    more than the star's own record"""
+
+    __slots__ = ("_load",)
+
+    def __init__(
+        self,
+        name: str,
+        x: float,
+        y: float,
+        load: Callable[[], Union[StarTimeseries, ArrayTimeseries]],
+        variable: bool = False,
+    ):
+        self._load = load
+        super().__init__(name=name, x=x, y=y, timeseries=None, variable=variable)  # type: ignore
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the timeseries has been fetched yet"""
+        return _timeseries_slot.__get__(self) is not None
+
+    @property  # type: ignore
+    def timeseries(self) -> Union[StarTimeseries, ArrayTimeseries]:
+        timeseries = _timeseries_slot.__get__(self)
+        if timeseries is None:
+            logging.debug(f"Fetching timeseries of star {self.name}")
+            timeseries = self._load()
+            _timeseries_slot.__set__(self, timeseries)
+        return timeseries
+
+    @timeseries.setter
+    def timeseries(self, timeseries: Union[StarTimeseries, ArrayTimeseries]) -> None:
+        _timeseries_slot.__set__(self, timeseries)
@@ -1,8 +1,9 @@
 import logging
-from typing import List, Sequence
+from typing import List, Optional, Sequence
 
 import numpy as np
 import numpy.typing as npt
+from attr import define, field
 
 
 def _has_data(values: npt.NDArray[np.float_]) -> bool:
@@ -30,6 +31,73 @@ def _empty_rows(*values: Sequence[float]) -> List[int]:
     that are empty"""
     if not _is_same_length(*values):
         raise ValueError("Input rows not the same length")
-    stack = np.asarray(list(zip(*values)))
-    empties = np.isnan(stack).all(axis=1)
+    if len(values) == 0:
+        return np.empty(0, dtype=np.intp)
+    empties = np.isnan(np.vstack(values)).all(axis=0)
     return empties.nonzero()[0]
+
+
+@define(slots=True)
+class BatchValidation:
+    """Outcome of validating the rows of many stars at once"""
+
+    # whether each row is kept, over the rows of every star
+    keep: npt.NDArray[np.bool_] = field()
+    # boundaries of every star's rows
+    bounds: npt.NDArray[np.intp] = field()
+    # (column, star) number of magnitudes and errors each star has
+    counts: npt.NDArray[np.intp] = field()
+    # why each star is rejected, None for stars that are valid
+    reasons: List[Optional[str]] = field()
+
+    def mask(self, star: int) -> npt.NDArray[np.bool_]:
+        """Which rows of a star are kept"""
+        return self.keep[self.bounds[star] : self.bounds[star + 1]]
+
+    @property
+    def valid(self) -> npt.NDArray[np.bool_]:
+        """Whether each star is valid"""
+        return np.asarray([x is None for x in self.reasons], dtype=np.bool_)
+
+
+def validate_batch(
+    bounds: npt.ArrayLike,
+    magnitude: npt.NDArray[np.floating],
+    error: npt.NDArray[np.floating],
+) -> BatchValidation:
+    """Validates the rows of many stars at once, as validating each of their
+    timeseries would. Rows with neither a magnitude nor an error are dropped and
+    stars without any magnitude or any error left are rejected
+
+    Parameters
+    ----------
+    bounds : npt.ArrayLike
+        Boundaries of every star's rows within the columns, as given by
+        split_by_name
+    magnitude : npt.NDArray[np.floating]
+        Magnitude of every row, grouped by star
+    error : npt.NDArray[np.floating]
+        Error of every row, grouped by star
+
+    Returns
+    -------
+    BatchValidation
+        Rows kept and reason each rejected star is rejected
+
+    """
+    if not _is_same_length(magnitude, error):
+        raise ValueError("Magnitude and error are not the same length")
+    bounds = np.asarray(bounds, dtype=np.intp)
+    present = ~np.isnan(np.vstack((magnitude, error)))
+    keep = present.any(axis=0)
+    # number of values of each column for each star, from running totals so
+    # stars without rows need no special handling
+    totals = np.zeros((2, len(keep) + 1), dtype=np.intp)
+    np.cumsum(present, axis=1, out=totals[:, 1:])
+    counts = totals[:, bounds[1:]] - totals[:, bounds[:-1]]
+    has_data = (counts > 0).all(axis=0)
+    reasons: List[Optional[str]] = [
+        None if x else "Either magnitude or error has no values"
+        for x in has_data.tolist()
+    ]
+    return BatchValidation(keep=keep, bounds=bounds, counts=counts, reasons=reasons)
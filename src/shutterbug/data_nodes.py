@@ -1,15 +1,16 @@
 from __future__ import annotations
 
 import logging
+import time
 from abc import abstractmethod
 from pathlib import Path
-from typing import Generator, List, Union, Optional
+from typing import Generator, Iterable, List, Optional, Set, Union, cast
 
 from attr import define, field
 
 from shutterbug.application import make_output_folder
-from shutterbug.data import BuilderBase, Dataset
-from shutterbug.data.interfaces.external import Loader
+from shutterbug.data import BuilderBase, Dataset, Star
+from shutterbug.data.interfaces.external import FollowLoader, IndexedLoader, Loader
 from shutterbug.data.interfaces.internal import Writer
 from shutterbug.interfaces.external import ControlNode
 
@@ -36,26 +37,74 @@ class DatasetLeaf(DatasetNode):
 class StoreNode(ControlNode):
     source: Loader = field()
     writer: Writer = field()
-    names: List[str]= field()
+    # Names of stars already stored, which are not stored again
+    stored: Set[str] = field(factory=set)
 
     def execute(self) -> None:
         logging.info("Storing dataset")
-        names = self.names
+        stored = self.stored
         source = self.source
-        stars = []
-        if len(names) == len(source.names):
-            for star in self.source:
-                if star is not None:
-                    stars.append(star)
-                if len(stars) >= 50:
-                    self.writer.write(stars)
-                    stars = []
+        names = None
+        # checked by name, as checking against the protocol would ask for names
+        if hasattr(source, "indexed_names"):
+            names = cast(IndexedLoader, source).indexed_names()
+        if names is None:
+            # a single pass over the source, asking it for its names first would
+            # read it twice
+            stars: Iterable[Optional[Star]] = (
+                x for x in source if x is None or x.name not in stored
+            )
         else:
-            for name in names:
-                star = source.get(name)
-                if star is not None:
-                    stars.append(star)
-        self.writer.write(stars)
+            missing = [x for x in names if x not in stored]
+            if len(missing) == 0:
+                logging.info("Every star is already stored, skipping")
+                return
+            elif len(missing) < len(names):
+                # the index lets only the missing stars be read
+                stars = (source.get(x) for x in missing)
+            else:
+                stars = iter(source)
+        batch = []
+        for star in stars:
+            if star is None:
+                continue
+            batch.append(star)
+            if len(batch) >= 50:
+                self.writer.write(batch)
+                batch = []
+        self.writer.write(batch)
+
+
+@define
+class FollowNode(ControlNode):
+    """Polls files that are still being written, storing the rows added to them
+    since the previous poll until interrupted"""
+
+    sources: List[FollowLoader] = field()
+    writer: Writer = field()
+    interval: float = field()
+    # Number of polls before stopping, if not following until interrupted
+    polls: Optional[int] = field(default=None)
+
+    def execute(self) -> None:
+        logging.info(f"Following {len(self.sources)} files, stop with Ctrl+C")
+        poll = 0
+        try:
+            while self.polls is None or poll < self.polls:
+                for source in self.sources:
+                    stars = list(source.new_stars())
+                    if poll == 0:
+                        # the file may have been loaded part way before, only the
+                        # rows written since are added to the stars it stored
+                        self.writer.append(stars, newer_only=True)
+                    elif len(stars) > 0:
+                        logging.info(f"Storing new rows of {len(stars)} stars")
+                        self.writer.append(stars)
+                poll += 1
+                if self.polls is None or poll < self.polls:
+                    time.sleep(self.interval)
+        except KeyboardInterrupt:
+            logging.info("Stopped following files")
 
 
 @define
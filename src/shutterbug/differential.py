@@ -1,14 +1,25 @@
-from typing import List
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple, Union
 
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
+from attr import define, field
+from scipy import sparse
 
-from shutterbug.data import Star
+from shutterbug.data import LeaveOneOut, Star, StarMatrix
+from shutterbug.data.star import ACCUMULATOR_DTYPE
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 
 def average_differential(
     target: Star,
     reference: List[Star],
+    weighted: bool = False,
 ) -> Star:
 
     """Given a target star and a list of reference stars, calculates the average
@@ -16,6 +27,8 @@ def average_differential(
 
     :param target: Target star to calculate on
     :param reference: Reference stars to use for calculate
+    :param weighted: Weigh each reference star by the inverse of its variance at
+        each epoch instead of averaging them equally
     :returns: Star updated with average differential magnitude and error
 
     """
@@ -23,14 +36,25 @@ def average_differential(
         raise ValueError(
             "Need at least one reference star for differential photometry, exiting"
         )
-    target_mag = target.timeseries.magnitude
-    target_error = target.timeseries.error
-    reference_mag = reference[0].timeseries.magnitude
-    reference_error = reference[0].timeseries.error
-    # Unpack reference list
-    for ref in reference[1:]:
-        reference_mag = pd.concat([ref.timeseries.magnitude, reference_mag])
-        reference_error = pd.concat([ref.timeseries.error, reference_error])
+    if weighted:
+        adm, ade = _weighted_differential(target=target, reference=reference)
+        target.timeseries.differential_magnitude = adm
+        target.timeseries.differential_error = ade
+        return target
+    if _shares_axis(target, reference):
+        adm, ade = _aligned_differential(target=target, reference=reference)
+        target.timeseries.differential_magnitude = adm
+        target.timeseries.differential_error = ade
+        return target
+    # stored in single precision, averaged in double precision
+    target_mag = target.timeseries.magnitude.astype(ACCUMULATOR_DTYPE)
+    target_error = target.timeseries.error.astype(ACCUMULATOR_DTYPE)
+    reference_mag = pd.concat(
+        [x.timeseries.magnitude for x in reversed(reference)]
+    ).astype(ACCUMULATOR_DTYPE)
+    reference_error = pd.concat(
+        [x.timeseries.error for x in reversed(reference)]
+    ).astype(ACCUMULATOR_DTYPE)
     ade = _average_error(target=target_error, reference=reference_error)
     adm = _average_difference(target=target_mag, reference=reference_mag)
     target.timeseries.differential_magnitude = adm
@@ -38,6 +62,163 @@ def average_differential(
     return target
 
 
+def _shares_axis(target: Star, reference: List[Star]) -> bool:
+    """Whether every star is on the same time axis, without repeated times, so
+    they can be aligned by position"""
+    axis = target.timeseries.axis
+    if axis is None or not axis.time.is_unique:
+        return False
+    return all(x.timeseries.axis is axis for x in reference)
+
+
+def _aligned_differential(
+    target: Star, reference: List[Star]
+) -> Tuple[pd.Series, pd.Series]:
+
+    """Calculates the average differential magnitude and error of a target star
+    whose reference stars are all on its time axis, lining epochs up by position.
+    Gives the same results as joining the timeseries by time
+
+    :param target: Target star to calculate on
+    :param reference: Reference stars on the target's time axis
+    :returns: Average differential magnitude and error of the target
+
+    """
+    axis = target.timeseries.axis
+    target_mask = target.timeseries.mask
+    target_mag = axis.expand(target.timeseries.magnitude, target_mask)
+    target_error = axis.expand(target.timeseries.error, target_mask)
+    reference_mag = np.vstack(
+        [axis.expand(x.timeseries.magnitude, x.timeseries.mask) for x in reference]
+    )
+    reference_error = np.vstack(
+        [axis.expand(x.timeseries.error, x.timeseries.mask) for x in reference]
+    )
+    # epochs at least one reference star was observed at
+    observed = np.ones(len(axis), dtype=np.bool_)
+    if all(x.timeseries.mask is not None for x in reference):
+        observed = np.logical_or.reduce([x.timeseries.mask for x in reference])
+    N = np.count_nonzero(observed) + 1
+    has_magnitude = ~np.isnan(reference_mag)
+    has_error = ~np.isnan(reference_error)
+    # the target is a field of one star, sums taken over its reference stars
+    adm, ade = _combine_kernel()(
+        target_mag[:, np.newaxis],
+        target_error[:, np.newaxis],
+        has_magnitude.sum(axis=0, dtype=ACCUMULATOR_DTYPE)[:, np.newaxis],
+        np.where(has_magnitude, reference_mag, 0).sum(axis=0)[:, np.newaxis],
+        has_error.sum(axis=0, dtype=ACCUMULATOR_DTYPE)[:, np.newaxis],
+        (np.where(has_error, reference_error, 0) ** 2).sum(axis=0)[:, np.newaxis],
+        np.asarray([N], dtype=np.int64),
+    )
+    adm = adm[:, 0]
+    ade = ade[:, 0]
+    if target_mask is not None:
+        adm = adm[target_mask]
+        ade = ade[target_mask]
+    time = target.timeseries.time
+    return pd.Series(adm, index=time), pd.Series(ade, index=time)
+
+
+def _combine_arrays(
+    magnitude: npt.NDArray[np.float64],
+    error: npt.NDArray[np.float64],
+    count: npt.NDArray[np.float64],
+    total: npt.NDArray[np.float64],
+    error_count: npt.NDArray[np.float64],
+    error_total: npt.NDArray[np.float64],
+    N: npt.NDArray[np.int64],
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+
+    """Calculates the average differential magnitude and error of targets from
+    sums over their reference stars, ignoring missing values
+
+    :param magnitude: (epoch, target) magnitudes of the targets
+    :param error: (epoch, target) errors of the targets
+    :param count: (epoch, target) number of reference magnitudes
+    :param total: (epoch, target) sum of reference magnitudes
+    :param error_count: (epoch, target) number of reference errors
+    :param error_total: (epoch, target) sum of squared reference errors
+    :param N: Number of reference epochs of every target, plus one
+    :returns: (epoch, target) average differential magnitude and error, NaN
+        magnitude where there is nothing to average
+
+    """
+    valid = (count > 0) & ~np.isnan(magnitude)
+    adm = np.full(magnitude.shape, np.nan)
+    np.divide(total, count, out=adm, where=valid)
+    np.subtract(magnitude, adm, out=adm, where=valid)
+    # a missing target error leaves nothing to sum, as with nansum
+    squared = np.where(~np.isnan(error), error_total + error_count * error ** 2, 0)
+    # sums with a star's own values taken away can round to just below zero
+    ade = np.sqrt(np.maximum(squared, 0)) / N
+    return adm, ade
+
+
+def _combine_loops(
+    magnitude: npt.NDArray[np.float64],
+    error: npt.NDArray[np.float64],
+    count: npt.NDArray[np.float64],
+    total: npt.NDArray[np.float64],
+    error_count: npt.NDArray[np.float64],
+    error_total: npt.NDArray[np.float64],
+    N: npt.NDArray[np.int64],
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """_combine_arrays as plain loops, for numba to compile into a single pass
+    without temporary arrays"""
+    epochs, targets = magnitude.shape
+    adm = np.empty((epochs, targets))
+    ade = np.empty((epochs, targets))
+    for epoch in range(epochs):
+        for target in range(targets):
+            mag = magnitude[epoch, target]
+            references = count[epoch, target]
+            if references > 0 and not np.isnan(mag):
+                adm[epoch, target] = mag - total[epoch, target] / references
+            else:
+                adm[epoch, target] = np.nan
+            err = error[epoch, target]
+            squared = 0.0
+            if not np.isnan(err):
+                squared = error_total[epoch, target]
+                squared += error_count[epoch, target] * err ** 2
+            ade[epoch, target] = np.sqrt(max(squared, 0.0)) / N[target]
+    return adm, ade
+
+
+CombineSums = Callable[..., Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]]
+
+
+@lru_cache(maxsize=None)
+def _combine_kernel() -> CombineSums:
+    """_combine_loops compiled by numba the first time photometry is calculated,
+    so that runs which never calculate it do not compile it or load it from the
+    on-disk cache. Without numba, _combine_arrays"""
+    if njit is None:
+        return _combine_arrays
+    return njit(
+        "Tuple((float64[:, :], float64[:, :]))(float64[:, :], float64[:, :],"
+        " float64[:, :], float64[:, :], float64[:, :], float64[:, :], int64[:])",
+        cache=True,
+        nogil=True,
+    )(_combine_loops)
+
+
+def _weighted_differential(
+    target: Star, reference: List[Star]
+) -> Tuple[pd.Series, pd.Series]:
+
+    """Calculates the differential magnitude and error of a target star against
+    the inverse variance weighted mean of its reference stars at each time
+
+    :param target: Target star to calculate on
+    :param reference: Reference stars to use for calculate
+    :returns: Differential magnitude and error of the target
+
+    """
+    return _aggregate_sums(target, aggregate_reference(reference), weighted=True)
+
+
 def _average_error(
     target: pd.Series,
     reference: pd.Series,
@@ -70,3 +251,263 @@ def _average_difference(
     """
     new = reference.rsub(target).groupby("time").mean()
     return new
+
+
+@define(slots=True)
+class ReferenceAggregate:
+    """Sums over a set of reference stars at each time, which every target star
+    with the same reference stars can be calculated against"""
+
+    # (time, sum) frame, see aggregate_reference
+    sums: pd.DataFrame = field()
+    # Number of reference epochs, plus one
+    N: int = field()
+
+
+def aggregate_reference(reference: List[Star]) -> ReferenceAggregate:
+
+    """Sums the values of a set of reference stars at each time, so that target
+    stars sharing the set need not join every reference star again
+
+    :param reference: Reference stars to sum
+    :returns: Sums over the reference stars at every time any of them has
+
+    """
+    if len(reference) < 1:
+        raise ValueError(
+            "Need at least one reference star for differential photometry, exiting"
+        )
+    reference_mag = pd.concat([x.timeseries.magnitude for x in reference])
+    reference_error = pd.concat([x.timeseries.error for x in reference])
+    magnitude = reference_mag.to_numpy(dtype=ACCUMULATOR_DTYPE)
+    error = reference_error.to_numpy(dtype=ACCUMULATOR_DTYPE)
+    has_magnitude = ~np.isnan(magnitude)
+    has_error = ~np.isnan(error)
+    usable = has_magnitude & has_error
+    floored = np.maximum(np.where(usable, error, 1), WEIGHT_ERROR_FLOOR)
+    weight = np.where(usable, 1 / floored ** 2, 0)
+    columns = pd.DataFrame(
+        {
+            "count": has_magnitude.astype(ACCUMULATOR_DTYPE),
+            "total": np.where(has_magnitude, magnitude, 0),
+            "error_count": has_error.astype(ACCUMULATOR_DTYPE),
+            "error_total": np.where(has_error, error, 0) ** 2,
+            "usable": usable.astype(ACCUMULATOR_DTYPE),
+            "weights": weight,
+            "weighted_total": weight * np.where(usable, magnitude, 0),
+        },
+        index=reference_mag.index,
+    )
+    sums = columns.groupby("time").sum()
+    return ReferenceAggregate(sums=sums, N=len(sums) + 1)
+
+
+def aggregate_differential(
+    target: Star, aggregate: ReferenceAggregate, weighted: bool = False
+) -> Star:
+
+    """Calculates the average differential magnitude and error of a target star
+    from sums over its reference stars, giving the same results as
+    average_differential would with the reference stars themselves
+
+    :param target: Target star to calculate on, without repeated times
+    :param aggregate: Sums over the target's reference stars
+    :param weighted: Weigh each reference star by the inverse of its variance at
+        each epoch instead of averaging them equally
+    :returns: Star updated with average differential magnitude and error
+
+    """
+    if not target.timeseries.time.is_unique:
+        raise ValueError(
+            f"Star {target.name} has repeated times, calculate it against its reference stars"
+        )
+    adm, ade = _aggregate_sums(target, aggregate, weighted=weighted)
+    target.timeseries.differential_magnitude = adm
+    target.timeseries.differential_error = ade
+    return target
+
+
+def _aggregate_sums(
+    target: Star, aggregate: ReferenceAggregate, weighted: bool
+) -> Tuple[pd.Series, pd.Series]:
+    """Average differential magnitude and error of a target star against sums over
+    its reference stars, times no reference star has hold nothing to average"""
+    time = target.timeseries.time
+    sums = aggregate.sums.reindex(time, fill_value=0)
+    magnitude = target.timeseries.magnitude.to_numpy(dtype=ACCUMULATOR_DTYPE)
+    error = target.timeseries.error.to_numpy(dtype=ACCUMULATOR_DTYPE)
+    has_magnitude = ~np.isnan(magnitude)
+    adm = np.full(len(time), np.nan)
+    if weighted:
+        weights = sums["weights"].to_numpy()
+        referenced = sums["usable"].to_numpy() > 0
+        valid = referenced & has_magnitude
+        np.divide(sums["weighted_total"].to_numpy(), weights, out=adm, where=valid)
+        np.subtract(magnitude, adm, out=adm, where=valid)
+        # variance of the weighted mean is the inverse of the total weight, with
+        # no error where there is no differential magnitude, as in _weighted_sums
+        variance = np.full(len(time), np.nan)
+        np.divide(1, weights, out=variance, where=valid)
+        ade = np.sqrt(variance + error ** 2)
+    else:
+        count = sums["count"].to_numpy()
+        valid = (count > 0) & has_magnitude
+        np.divide(sums["total"].to_numpy(), count, out=adm, where=valid)
+        np.subtract(magnitude, adm, out=adm, where=valid)
+        # a missing target error leaves nothing to sum, as with nansum
+        squared = np.where(
+            np.isnan(error),
+            0,
+            sums["error_total"].to_numpy() + sums["error_count"].to_numpy() * error ** 2,
+        )
+        ade = np.sqrt(squared) / aggregate.N
+    return pd.Series(adm, index=time), pd.Series(ade, index=time)
+
+
+ReferenceSum = Callable[[npt.NDArray], npt.NDArray[np.float64]]
+
+# Smallest error a reference star is weighed by, in magnitudes. No photometry is
+# better than this and it stops a star with no error from taking all the weight
+WEIGHT_ERROR_FLOOR = 1e-3
+
+
+def field_differential(
+    matrix: StarMatrix,
+    reference: Union[LeaveOneOut, sparse.spmatrix, npt.NDArray[np.bool_]],
+    weighted: bool = False,
+) -> StarMatrix:
+
+    """Calculates the average differential magnitude and error of every star of a
+    field at once, giving the same results as average_differential would for each
+    star. Stars without reference stars are left as they are
+
+    :param matrix: Every star of the field
+    :param reference: (target, reference) matrix, nonzero where a star of the
+        matrix is a reference star of another, in the matrix' column order, or a
+        shared ensemble whose sums are taken once for every star
+    :param weighted: Weigh each reference star by the inverse of its variance at
+        each epoch instead of averaging them equally
+    :returns: Matrix updated with the average differential magnitude and error
+        of every star with reference stars
+
+    """
+    if isinstance(reference, LeaveOneOut):
+        by_reference, targets = _leave_one_out(reference)
+    else:
+        by_reference, targets = _selected(reference)
+    magnitude = matrix.magnitude.astype(ACCUMULATOR_DTYPE)
+    error = matrix.error.astype(ACCUMULATOR_DTYPE)
+    if weighted:
+        adm, ade = _weighted_sums(by_reference, magnitude, error)
+    else:
+        adm, ade = _average_sums(by_reference, magnitude, error, matrix.observed)
+
+    cells = matrix.observed & targets
+    matrix.adm[cells] = adm[cells]
+    matrix.ade[cells] = ade[cells]
+    matrix.differential |= targets
+    return matrix
+
+
+def _average_sums(
+    by_reference: ReferenceSum,
+    magnitude: npt.NDArray[np.float64],
+    error: npt.NDArray[np.float64],
+    observed: npt.NDArray[np.bool_],
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """(epoch, star) average differential magnitude and error against the mean of
+    each star's reference stars"""
+    has_magnitude = ~np.isnan(magnitude)
+    has_error = ~np.isnan(error)
+    # (epoch, target) sums over every target's reference stars
+    count = by_reference(has_magnitude.astype(ACCUMULATOR_DTYPE))
+    total = by_reference(np.where(has_magnitude, magnitude, 0))
+    error_count = by_reference(has_error.astype(ACCUMULATOR_DTYPE))
+    error_total = by_reference(np.where(has_error, error, 0) ** 2)
+    # epochs at least one reference star was observed at
+    reference_observed = by_reference(observed.astype(ACCUMULATOR_DTYPE)) > 0
+    N = np.count_nonzero(reference_observed, axis=0) + 1
+    return _combine_kernel()(
+        magnitude, error, count, total, error_count, error_total, N.astype(np.int64)
+    )
+
+
+def _weighted_sums(
+    by_reference: ReferenceSum,
+    magnitude: npt.NDArray[np.float64],
+    error: npt.NDArray[np.float64],
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """(epoch, star) differential magnitude and error against the inverse variance
+    weighted mean of each star's reference stars. Reference values without an
+    error carry no weight"""
+    usable = ~np.isnan(magnitude) & ~np.isnan(error)
+    floored = np.maximum(np.where(usable, error, 1), WEIGHT_ERROR_FLOOR)
+    weight = np.where(usable, 1 / floored ** 2, 0)
+    # (epoch, target) sums over every target's reference stars
+    count = by_reference(usable.astype(ACCUMULATOR_DTYPE))
+    weights = by_reference(weight)
+    total = by_reference(weight * np.where(usable, magnitude, 0))
+
+    # counted rather than compared to zero, as sums with a star's own values
+    # taken away need not come to exactly zero
+    valid = (count > 0.5) & (weights > 0) & ~np.isnan(magnitude)
+    adm = np.full(magnitude.shape, np.nan)
+    np.divide(total, weights, out=adm, where=valid)
+    np.subtract(magnitude, adm, out=adm, where=valid)
+    # variance of the weighted mean is the inverse of the total weight
+    variance = np.full(magnitude.shape, np.nan)
+    np.divide(1, weights, out=variance, where=valid)
+    ade = np.sqrt(variance + error ** 2)
+    return adm, ade
+
+
+def _selected(
+    reference: Union[sparse.spmatrix, npt.NDArray[np.bool_]]
+) -> Tuple[ReferenceSum, npt.NDArray[np.bool_]]:
+    """Sums over each star's reference stars through the (target, reference)
+    matrix, alongside which stars have any reference stars"""
+    selection = sparse.csr_matrix(reference, dtype=ACCUMULATOR_DTYPE)
+    selection.data[:] = 1
+    selection.sort_indices()
+    # targets with the same reference stars share one sum over them
+    rows: Dict[bytes, int] = {}
+    shared = np.fromiter(
+        (
+            rows.setdefault(selection.indices[start:end].tobytes(), len(rows))
+            for start, end in zip(selection.indptr[:-1], selection.indptr[1:])
+        ),
+        dtype=np.intp,
+        count=selection.shape[0],
+    )
+    unique = selection[np.unique(shared, return_index=True)[1]]
+
+    def by_reference(values: npt.NDArray) -> npt.NDArray[np.float64]:
+        """Sums (epoch, star) values over each star's reference stars, giving an
+        (epoch, target) array"""
+        return np.asarray((unique @ values.T).T)[:, shared]
+
+    return by_reference, np.diff(selection.indptr) > 0
+
+
+def _leave_one_out(
+    reference: LeaveOneOut,
+) -> Tuple[ReferenceSum, npt.NDArray[np.bool_]]:
+    """Sums over each star's reference stars by summing over the whole ensemble
+    once and taking away each star's own values and its exclusions, alongside
+    which stars have any reference stars"""
+    members = reference.members.astype(ACCUMULATOR_DTYPE)
+    # only ensemble stars other than the star itself can be excluded
+    excluded = sparse.csr_matrix(reference.excluded, dtype=ACCUMULATOR_DTYPE)
+    excluded.data[:] = 1
+    excluded = sparse.csr_matrix(excluded.multiply(members))
+    excluded = excluded - sparse.diags(excluded.diagonal())
+    excluded.eliminate_zeros()
+
+    def by_reference(values: npt.NDArray) -> npt.NDArray[np.float64]:
+        """Sums (epoch, star) values over each star's reference stars, giving an
+        (epoch, target) array"""
+        ensemble = values @ members
+        return ensemble[:, np.newaxis] - values * members - (excluded @ values.T).T
+
+    count = members.sum() - members - np.diff(excluded.indptr)
+    return by_reference, count > 0
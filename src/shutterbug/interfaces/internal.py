@@ -1,8 +1,46 @@
-from typing import List, Protocol
+from typing import Any, List, Protocol, Union, runtime_checkable
 
-from shutterbug.data import Star
+import numpy as np
+import numpy.typing as npt
+from scipy import sparse
+
+from shutterbug.data import LeaveOneOut, Star, StarMatrix
 
 
 class Photometer(Protocol):
-    def average_differential(self, target: Star, reference: List[Star]):
+    def average_differential(
+        self, target: Star, reference: List[Star], weighted: bool = False
+    ):
+        ...
+
+
+@runtime_checkable
+class FieldPhotometer(Protocol):
+    """Photometer that calculates every star of a field at once"""
+
+    def field_differential(
+        self,
+        matrix: StarMatrix,
+        reference: Union[LeaveOneOut, sparse.spmatrix, npt.NDArray[np.bool_]],
+        weighted: bool = False,
+    ) -> StarMatrix:
+        ...
+
+
+@runtime_checkable
+class EnsemblePhotometer(Protocol):
+    """Photometer that sums a set of reference stars once for every target star
+    that shares them"""
+
+    def average_differential(
+        self, target: Star, reference: List[Star], weighted: bool = False
+    ):
+        ...
+
+    def aggregate_reference(self, reference: List[Star]) -> Any:
+        ...
+
+    def aggregate_differential(
+        self, target: Star, aggregate: Any, weighted: bool = False
+    ) -> Star:
         ...
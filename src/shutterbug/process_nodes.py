@@ -1,5 +1,6 @@
 import logging
-from typing import Generator, List
+from collections import OrderedDict
+from typing import Any, Generator, List
 
 from attr import define, field
 
@@ -7,7 +8,11 @@ from shutterbug.analysis.feature import FeatureBase
 from shutterbug.analysis.variable import run_test, test_variability
 from shutterbug.data import Dataset
 from shutterbug.data_nodes import DatasetNode
-from shutterbug.interfaces.internal import Photometer
+from shutterbug.interfaces.internal import (
+    EnsemblePhotometer,
+    FieldPhotometer,
+    Photometer,
+)
 
 
 @define
@@ -34,15 +39,104 @@ class VariabilityNode(DatasetNode):
 @define
 class DifferentialNode(DatasetNode):
     photometer: Photometer = field()
+    # take reference stars as one ensemble shared by every star, less each star's
+    # own exclusions, when the photometer calculates whole fields
+    leave_one_out: bool = field(default=False)
+    # weigh reference stars by the inverse of their variance
+    weighted: bool = field(default=False)
+    # sets of reference sums held at once when calculating star by star, the
+    # least recently used set is dropped first
+    cached_aggregates: int = field(default=16)
 
     def execute(self) -> Generator[Dataset, None, None]:
         for dataset in self.datasets.execute():
             logging.info(f"Executing Differential calculation on current dataset")
-            for star in dataset:
-                logging.info(f"Calculating differential magnitudes on {star.name}")
-                star = self.photometer.average_differential(
-                    target=star, reference=dataset.similar_to(star)
-                )
-                dataset.update(star)
+            dataset.refresh_medians()
+            if isinstance(self.photometer, FieldPhotometer):
+                self._field_differential(dataset, self.photometer)
+            else:
+                self._star_differential(dataset)
             dataset.flush_write()
             yield dataset
+
+    def _star_differential(self, dataset: Dataset) -> None:
+        """Calculates the dataset star by star, for photometers that cannot take a
+        whole field or datasets that cannot be held as one matrix, such as those
+        with repeated times. The field path shares sums between stars with the
+        same reference stars on its own"""
+        if isinstance(self.photometer, EnsemblePhotometer):
+            self._ensemble_differential(dataset, self.photometer)
+            return
+        for star in dataset:
+            logging.info(f"Calculating differential magnitudes on {star.name}")
+            star = self.photometer.average_differential(
+                target=star, reference=dataset.similar_to(star), weighted=self.weighted
+            )
+            dataset.update(star)
+
+    def _ensemble_differential(
+        self, dataset: Dataset, photometer: EnsemblePhotometer
+    ) -> None:
+        """Calculates the dataset star by star, summing each distinct set of
+        reference stars once for every star that shares it"""
+        # sums over recent sets of reference stars, by their sorted catalog IDs
+        aggregates: OrderedDict[bytes, Any] = OrderedDict()
+        for star in dataset:
+            logging.info(f"Calculating differential magnitudes on {star.name}")
+            ids = dataset.similar_ids(star)
+            if len(ids) == 0:
+                logging.error(
+                    f"Need at least one reference star for differential photometry, skipping {star.name}"
+                )
+                continue
+            if not star.timeseries.time.is_unique:
+                # means over repeated times cannot be taken from the sums
+                star = photometer.average_differential(
+                    target=star, reference=dataset.get_ids(ids), weighted=self.weighted
+                )
+                dataset.update(star)
+                continue
+            key = ids.tobytes()
+            aggregate = aggregates.get(key)
+            if aggregate is None:
+                aggregate = photometer.aggregate_reference(dataset.get_ids(ids))
+                aggregates[key] = aggregate
+                if len(aggregates) > self.cached_aggregates:
+                    aggregates.popitem(last=False)
+            else:
+                logging.debug(f"Reusing reference sums of {len(ids)} stars")
+                aggregates.move_to_end(key)
+            star = photometer.aggregate_differential(
+                target=star, aggregate=aggregate, weighted=self.weighted
+            )
+            dataset.update(star)
+
+    def _field_differential(self, dataset: Dataset, photometer: FieldPhotometer):
+        """Calculates every star of the dataset at once from its matrix"""
+        try:
+            matrix = dataset.to_matrix()
+        except ValueError as e:
+            logging.warning(
+                f"Cannot calculate {dataset.name} as a whole, calculating star by star: {e}"
+            )
+            self._star_differential(dataset)
+            return
+        logging.info(f"Calculating differential magnitudes on {len(matrix)} stars")
+        if self.leave_one_out:
+            reference = dataset.reference_ensemble(matrix)
+        else:
+            reference = dataset.reference_selection(matrix)
+        matrix = photometer.field_differential(
+            matrix=matrix, reference=reference, weighted=self.weighted
+        )
+        for star in dataset:
+            column = matrix.column(star.name)
+            if not matrix.differential[column]:
+                logging.error(
+                    f"Need at least one reference star for differential photometry, skipping {star.name}"
+                )
+                continue
+            view = matrix.get(star.name).timeseries  # type: ignore
+            star.timeseries.differential_magnitude = view.differential_magnitude
+            star.timeseries.differential_error = view.differential_error
+            dataset.update(star)
@@ -1,7 +1,7 @@
 import logging
 from functools import update_wrapper
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 import click
 from click.core import Context
@@ -18,6 +18,7 @@ from shutterbug.data_nodes import (
     CSVSaveNode,
     DatasetLeaf,
     DatasetNode,
+    FollowNode,
     GraphSaveNode,
     StoreNode,
 )
@@ -80,16 +81,59 @@ def process_commands(processors, *args, **kwargs):
     ),
     help="Datasets to load",
 )
+@click.option(
+    "-w",
+    "--workers",
+    "workers",
+    type=click.IntRange(min=1),
+    help="Number of processes to parse files with, defaults to configuration",
+)
+@click.option(
+    "--follow",
+    "follow",
+    is_flag=True,
+    default=False,
+    help="Keep loading rows appended to CSV files until interrupted",
+)
+@click.option(
+    "--interval",
+    "interval",
+    type=click.FloatRange(min=0),
+    default=10.0,
+    show_default=True,
+    help="Seconds between checks for new rows when following",
+)
 @click.pass_context
 @generator
-def load(context: Context, files: List[Path]):
+def load(
+    context: Context,
+    files: List[Path],
+    workers: Optional[int],
+    follow: bool,
+    interval: float,
+):
     config = context.obj["config"]
     engine = context.obj["database"]
+    if workers is None:
+        workers = config.data.workers
+    csv_engine = config.data.csv_engine
+    if follow:
+        # following needs a row by row CSV loader per file
+        workers = 1
+        csv_engine = "python"
     mag_limit = config.photometry.magnitude_limit
     distance_limit = config.photometry.distance_limit
     for f in files:
         logging.debug(f"Loading file: {f.name}")
-        f_input = make_file_loader(f)
+        f_input = make_file_loader(
+            f,
+            index_folder=config.data.index_folder,
+            index_checksum=config.data.index_checksum,
+            csv_engine=csv_engine,
+            workers=workers,
+            parse_workers=config.data.parse_workers,
+            memory_limit=config.data.memory_limit,
+        )
         db_reader, db_writer = next(
             make_reader_writer(
                 engine=engine,
@@ -98,9 +142,16 @@ def load(context: Context, files: List[Path]):
                 distance_limit=distance_limit,
             )
         )
+        followed = []
         for loader in f_input:
-            name_delta = list(set(loader.names) - set(db_reader.names))
-            StoreNode(loader, db_writer, name_delta).execute()
+            if follow and hasattr(loader, "new_stars"):
+                followed.append(loader)
+                continue
+            elif follow:
+                logging.warning("Only CSV files can be followed, loading it once")
+            StoreNode(loader, db_writer, set(db_reader.names)).execute()
+        if followed:
+            FollowNode(followed, db_writer, interval).execute()
 
         dataset = make_dataset(dataset_name=f.name, reader=db_reader, writer=db_writer)
         yield DatasetLeaf(dataset)
@@ -114,15 +165,37 @@ def load(context: Context, files: List[Path]):
     help="Number of differential/detection iterations",
     type=click.IntRange(min=1, max=3, clamp=True),
 )
+@click.option(
+    "--leave-one-out",
+    "leave_one_out",
+    help="Sum reference stars from one shared ensemble, faster with wide limits",
+    type=click.BOOL,
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--weighted",
+    "weighted",
+    help="Weigh reference stars by the inverse of their variance",
+    type=click.BOOL,
+    is_flag=True,
+    default=False,
+)
 @click.pass_context
 @processor
-def process(nodes: List[DatasetNode], context: Context, iterations: int):
+def process(
+    nodes: List[DatasetNode],
+    context: Context,
+    iterations: int,
+    leave_one_out: bool,
+    weighted: bool,
+):
     feature_calculators = get_feature_calculators(config=context.obj["config"])
     photometer = get_photometer()
     logging.info(f"Adding process nodes for {iterations} iterations to node tree")
     for node in nodes:
         for _ in range(iterations):
-            node = DifferentialNode(node, photometer)
+            node = DifferentialNode(node, photometer, leave_one_out, weighted)
             node = VariabilityNode(node, feature_calculators)
         yield node
 
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+import shutterbug.data.arrow.loader_factory as arrow_factory
+from shutterbug.data.csv.loader import CSVLoader
+from shutterbug.data.file import FileInput
+from shutterbug.data.header import KNOWN_HEADERS
+from shutterbug.data.star import asdatetime
+from tests.unit.data.csv_test_tools import write_mira_csv
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather"])
+def test_arrow_matches_csv(tmp_path, suffix):
+    names = ["Star-1", "Star-2", "Star-3"]
+    csv_path = write_mira_csv(tmp_path / "night.csv", names, epochs=4)
+    frame = pd.read_csv(csv_path, dtype={"name": str, "date": str, "time": str})
+    path = tmp_path / f"night{suffix}"
+    if suffix == ".parquet":
+        frame.to_parquet(path)
+    else:
+        frame.to_feather(path)
+    loader = arrow_factory.make_loader(path)
+    from_csv = CSVLoader(csv_path, KNOWN_HEADERS[0])
+    # read straight from the file before the columns are loaded
+    assert loader.get("Star-2") == from_csv.get("Star-2")
+    assert loader.get("Star-9") is None
+    assert loader.names == names
+    for from_columns, from_rows in zip(loader, from_csv):
+        assert from_columns.name == from_rows.name
+        assert from_columns == from_rows
+        assert from_columns.timeseries.time.equals(from_rows.timeseries.time)
+    assert loader.get("Star-3") == from_csv.get("Star-3")
+
+
+def test_arrow_native_timestamps(tmp_path):
+    csv_path = write_mira_csv(tmp_path / "night.csv", ["Star-1"], epochs=3)
+    frame = pd.read_csv(csv_path, dtype={"name": str})
+    frame["jd"] = asdatetime(frame["jd"].to_numpy())
+    frame.to_parquet(tmp_path / "night.parquet")
+    loaded = [x for x in FileInput(tmp_path / "night.parquet")]
+    assert len(loaded) == 1
+    star = loaded[0].get("Star-1")
+    assert star is not None
+    assert star.timeseries.time.equals(
+        CSVLoader(csv_path, KNOWN_HEADERS[0]).get("Star-1").timeseries.time
+    )
@@ -0,0 +1,19 @@
+from shutterbug.data.csv.columnar import ColumnarCSVLoader
+from shutterbug.data.csv.loader import CSVLoader
+from shutterbug.data.header import KNOWN_HEADERS
+from tests.unit.data.csv_test_tools import write_mira_csv
+
+
+def test_columnar_matches_row_loader(tmp_path):
+    names = ["Star-1", "Star-2", "Star-3"]
+    path = write_mira_csv(tmp_path / "night.csv", names, epochs=5)
+    columnar = ColumnarCSVLoader(path, KNOWN_HEADERS[0])
+    rows = CSVLoader(path, KNOWN_HEADERS[0])
+    assert columnar.names == rows.names
+    assert len(columnar) == len(rows)
+    for from_columns, from_rows in zip(columnar, rows):
+        assert from_columns.name == from_rows.name
+        assert from_columns == from_rows
+        assert from_columns.timeseries.time.equals(from_rows.timeseries.time)
+    assert columnar.get("Star-2") == rows.get("Star-2")
+    assert columnar.get("Star-9") is None
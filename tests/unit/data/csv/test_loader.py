@@ -1,8 +1,12 @@
 from pathlib import Path
 from typing import Any, Dict
 from shutterbug.data.csv.loader import CSVLoader
-from shutterbug.data.header import KnownHeader
-from shutterbug.data.star import Star
+from shutterbug.data.csv.partial import merge_partials
+from shutterbug.data.csv.spill import SpillStore
+from shutterbug.data.header import KNOWN_HEADERS, KnownHeader
+from shutterbug.data.index import IndexCache
+from shutterbug.data.star import JULIAN_DATE, Star, asdatetime
+from tests.unit.data.csv_test_tools import write_mira_csv
 from tests.unit.data.hypothesis_stars import stars
 import string
 from hypothesis import given
@@ -68,3 +72,200 @@ def test_csv_loader(data_list):
     assert len(loader) == length
     # All names must be present
     assert all([True if x in stars else False for x in loader])
+
+
+def test_csv_loader_single_pass(tmp_path, monkeypatch):
+    names = ["Star-1", "Star-2", "Star-3"]
+    path = write_mira_csv(tmp_path / "night.csv", names)
+    loader = CSVLoader(path, KNOWN_HEADERS[0])
+    calls = []
+    indexed_rows = CSVLoader._indexed_rows
+
+    def counted_rows(self):
+        calls.append(1)
+        yield from indexed_rows(self)
+
+    monkeypatch.setattr(CSVLoader, "_indexed_rows", counted_rows)
+    loaded = [star for star in loader]
+    # one read for every star would be one call per star
+    assert len(calls) == 1
+    assert [star.name for star in loaded] == names
+    assert loader.names == names
+    monkeypatch.undo()
+    for star in loaded:
+        assert star == loader.get(star.name)
+
+
+def test_csv_loader_offsets(tmp_path):
+    names = ["Star-1", "Star-2", "Star-3"]
+    path = write_mira_csv(tmp_path / "night.csv", names, epochs=4)
+    loader = CSVLoader(path, KNOWN_HEADERS[0])
+    name_index = KNOWN_HEADERS[0].name_index
+    raw = path.read_bytes()
+    for name, offsets in loader._star_count().items():
+        assert len(offsets) == 4
+        for offset in offsets:
+            # every offset must point at the start of a line
+            assert raw[offset - 1 : offset] == b"\n"
+        rows = list(loader._rows_at(offsets))
+        assert all(row[name_index] == name for row in rows)
+        assert rows == [row for row in loader._file_rows() if row[name_index] == name]
+
+
+def test_csv_loader_byte_ranges(tmp_path):
+    names = [f"Star-{idx}" for idx in range(7)]
+    path = write_mira_csv(tmp_path / "night.csv", names, epochs=9)
+    serial = CSVLoader(path, KNOWN_HEADERS[0])
+    split = CSVLoader(path, KNOWN_HEADERS[0], workers=3, min_range_size=64)
+    ranges = split._byte_ranges()
+    assert len(ranges) == 3
+    raw = path.read_bytes()
+    for start, end in ranges:
+        assert raw[start - 1 : start] == b"\n"
+    assert ranges[-1][1] == len(raw)
+    split_stars = [star for star in split]
+    serial_stars = [star for star in serial]
+    assert [x.name for x in split_stars] == [x.name for x in serial_stars]
+    for split_star, serial_star in zip(split_stars, serial_stars):
+        assert split_star == serial_star
+        assert split_star.timeseries.time.equals(serial_star.timeseries.time)
+    # index is built from the same pass
+    for name, offsets in serial._star_count().items():
+        assert list(split._star_count()[name]) == list(offsets)
+
+
+def test_csv_loader_memory_limit(tmp_path):
+    names = [f"Star-{idx}" for idx in range(5)]
+    path = write_mira_csv(tmp_path / "night.csv", names, epochs=12)
+    serial = CSVLoader(path, KNOWN_HEADERS[0])
+    spilled = CSVLoader(path, KNOWN_HEADERS[0], memory_limit=4096)
+    spilled_stars = [star for star in spilled]
+    serial_stars = [star for star in serial]
+    assert [x.name for x in spilled_stars] == [x.name for x in serial_stars]
+    for spilled_star, serial_star in zip(spilled_stars, serial_stars):
+        assert spilled_star == serial_star
+        assert spilled_star.timeseries.time.equals(serial_star.timeseries.time)
+    for name, offsets in serial._star_count().items():
+        assert list(spilled._star_count()[name]) == list(offsets)
+
+
+def test_csv_loader_new_stars(tmp_path):
+    path = write_mira_csv(tmp_path / "night.csv", ["Star-1", "Star-2"], epochs=2)
+    complete = path.read_bytes()
+    lines = complete.splitlines(keepends=True)
+    # the writer is part way through the last line
+    path.write_bytes(b"".join(lines[:-1]) + lines[-1][:10])
+    loader = CSVLoader(path, KNOWN_HEADERS[0])
+    first = {x.name: len(x.timeseries.time) for x in loader.new_stars()}
+    assert first == {"Star-1": 2, "Star-2": 1}
+    assert list(loader.new_stars()) == []
+    path.write_bytes(complete)
+    second = list(loader.new_stars())
+    assert [x.name for x in second] == ["Star-2"]
+    assert len(second[0].timeseries.time) == 1
+    assert loader.get("Star-2") == CSVLoader(path, KNOWN_HEADERS[0]).get("Star-2")
+
+
+def test_csv_loader_time_format(tmp_path):
+    names = ["Star-1", "Star-2"]
+    path = write_mira_csv(tmp_path / "night.csv", names, epochs=3)
+    loader = CSVLoader(path, KNOWN_HEADERS[0])
+    stars = [star for star in loader]
+    assert loader.time_format == JULIAN_DATE
+    # written times in place of Julian dates
+    text = path.read_text().splitlines()
+    rows = [row.split(",") for row in text[1:]]
+    for row in rows:
+        row[8] = f"{row[6]} {row[7]}"
+    path.write_text("\n".join([text[0], *[",".join(x) for x in rows]]) + "\n")
+    loader = CSVLoader(path, KNOWN_HEADERS[0])
+    written = [star for star in loader]
+    assert loader.time_format not in (None, JULIAN_DATE)
+    for star in written:
+        expected = asdatetime([f"{x} 00:00:00.000" for x in ["2021-05-19"] * 3])
+        assert star.timeseries.time.equals(expected)
+    assert [x.name for x in written] == [x.name for x in stars]
+
+
+def test_csv_loader_index_chunks(tmp_path, monkeypatch):
+    names = [f"Star-{idx}" for idx in range(3)]
+    path = write_mira_csv(tmp_path / "night.csv", names, epochs=5)
+    parsed = CSVLoader(path, KNOWN_HEADERS[0])
+    [star for star in parsed]
+    monkeypatch.setattr("shutterbug.data.csv.loader.INDEX_CHUNK_ROWS", 2)
+    scanned = CSVLoader(path, KNOWN_HEADERS[0])
+    assert scanned.names == names
+    for name, offsets in scanned._star_count().items():
+        assert offsets.dtype == np.int64
+        assert list(offsets) == list(parsed._star_count()[name])
+
+
+def test_csv_loader_memory_limit_without_index(tmp_path, monkeypatch):
+    names = [f"Star-{idx}" for idx in range(3)]
+    path = write_mira_csv(tmp_path / "night.csv", names, epochs=5)
+
+    def no_scan(self):
+        raise AssertionError("file scanned for its index before loading")
+
+    monkeypatch.setattr(CSVLoader, "_scan_index", no_scan)
+    cache = IndexCache(tmp_path / "index")
+    spilled = CSVLoader(path, KNOWN_HEADERS[0], index_cache=cache, memory_limit=512)
+    assert [x.name for x in spilled] == names
+    # the offset of every row is neither kept nor cached when spilling
+    assert spilled.indexed_names() is None
+    assert cache.get(path) is None
+
+
+def test_spill_store_single_run(tmp_path):
+    names = ["Star-1", "Star-2", "Star-3"]
+    path = write_mira_csv(tmp_path / "night.csv", names, epochs=6)
+    loader = CSVLoader(path, KNOWN_HEADERS[0])
+    rows = list(loader._indexed_rows())
+    # a star that only appears in the rows that were never spilled
+    last_offset, last_row = rows[-1]
+    rows.append((last_offset + 1, [last_row[0], "Star-4", *last_row[2:]]))
+    folder = tmp_path / "spill"
+    folder.mkdir()
+    store = SpillStore(folder=folder)
+    try:
+        for lower in range(0, 18, 6):
+            store.spill(loader._parse_rows(rows[lower : lower + 6]))
+        assert len(list(folder.iterdir())) == 1
+        remaining = loader._parse_rows(rows[18:])
+        assert store.read("Star-4") == []
+        for name in names:
+            partials = store.read(name)
+            assert len(partials) == 3
+            star = merge_partials(name, partials)
+            assert star == loader.get(name)
+            assert star.timeseries.time.equals(loader.get(name).timeseries.time)
+        assert merge_partials("Star-4", list(remaining.values())) is not None
+    finally:
+        store.close()
+
+
+def test_csv_loader_validates_batch(tmp_path, monkeypatch):
+    names = ["Star-1", "Star-2", "Star-3"]
+    path = write_mira_csv(tmp_path / "night.csv", names, epochs=4)
+    text = path.read_text().splitlines()
+    rows = [row.split(",") for row in text[1:]]
+    for row in rows:
+        # one row of Star-1 is empty, Star-3 has no errors at all
+        if row[1] == "Star-1" and row[8].endswith("0000"):
+            row[2], row[3] = "", ""
+        if row[1] == "Star-3":
+            row[3] = ""
+    path.write_text("\n".join([text[0], *[",".join(x) for x in rows]]) + "\n")
+
+    def no_validation(ts):
+        raise AssertionError("star validated on its own")
+
+    monkeypatch.setattr("shutterbug.data.star.validate_timeseries", no_validation)
+    for loader in (
+        CSVLoader(path, KNOWN_HEADERS[0]),
+        CSVLoader(path, KNOWN_HEADERS[0], memory_limit=512),
+    ):
+        loaded = {star.name: star for star in loader}
+        assert list(loaded.keys()) == ["Star-1", "Star-2"]
+        assert len(loaded["Star-1"].timeseries.time) == 3
+        assert len(loaded["Star-2"].timeseries.time) == 4
@@ -0,0 +1,30 @@
+import csv
+from pathlib import Path
+from typing import List
+
+from shutterbug.data.header import KNOWN_HEADERS
+
+
+def write_mira_csv(path: Path, names: List[str], epochs: int = 3) -> Path:
+    """Writes a small Mira-style CSV, frame by frame, for every given star name"""
+    with path.open(mode="w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(KNOWN_HEADERS[0].headers)
+        for epoch in range(epochs):
+            jd = 2459353.5 + (epoch / 1440)
+            for idx, name in enumerate(names):
+                writer.writerow(
+                    [
+                        f"image-{epoch}.fit",
+                        name,
+                        f"{12 + idx + (epoch / 100):.4f}",
+                        "0.0100",
+                        f"{idx * 10}",
+                        f"{idx * 20}",
+                        "2021-05-19",
+                        "00:00:00.000",
+                        f"{jd:.7f}",
+                        "60.000",
+                    ]
+                )
+    return path
@@ -6,7 +6,7 @@ from hypothesis import given
 from hypothesis.strategies._internal.numbers import integers
 from shutterbug.data.db.reader import DBReader
 from shutterbug.data.db.writer import DBWriter
-from shutterbug.data.star import Star
+from shutterbug.data.star import ArrayTimeseries, LazyStar, Star, StarTimeseries
 from tests.unit.data.db.db_test_tools import sqlite_memory
 from tests.unit.data.hypothesis_stars import star, stars
 
@@ -21,6 +21,38 @@ def test_convert_to_star(star: Star):
         assert read_star == star
 
 
+@given(star())
+def test_convert_to_compact_star(star: Star):
+    with sqlite_memory(future=True) as session:
+        DBWriter(session=session, dataset="test").write(star)
+        reader = DBReader(dataset="test", session=session, compact=True)
+        read_star = reader.get(star.name)
+        timeseries = read_star.timeseries
+        assert isinstance(timeseries, ArrayTimeseries)
+        # stored in single precision
+        assert timeseries.magnitude.dtype == np.float32
+        assert np.allclose(timeseries.magnitude, star.timeseries.magnitude)
+        assert np.allclose(timeseries.error, star.timeseries.error)
+        assert timeseries.features == star.timeseries.features
+        # differential results not calculated yet are left out
+        assert len(timeseries.differential_magnitude) == 0
+
+
+@given(star())
+def test_convert_to_lazy_star(star: Star):
+    with sqlite_memory(future=True) as session:
+        DBWriter(session=session, dataset="test").write(star)
+        reader = DBReader(dataset="test", session=session, lazy=True)
+        read_star = reader.get(star.name)
+        assert isinstance(read_star, LazyStar)
+        assert not read_star.loaded
+        assert (read_star.name, read_star.x, read_star.y) == (star.name, star.x, star.y)
+        assert read_star.variable == star.variable
+        assert not read_star.loaded
+        assert read_star == star
+        assert read_star.loaded
+
+
 @given(
     stars(alphabet=string.printable, min_size=1),
     stars(alphabet=string.printable, min_size=1, max_size=1),
@@ -106,13 +138,27 @@ def test_similar_to(stars: List[Star], mag_limit, distance_limit):
             distance_limit=distance_limit,
         )
         db_similar = set(map(lambda x: x, reader.similar_to(target)))
+        catalog = reader.catalog
         assert all(
             [
                 True if x in reader.names else False
-                for x in reader._star_cache[target.name]
+                for x in catalog.names_of(
+                    reader._star_cache[catalog.id_of(target.name)]
+                )
             ]
         )
         assert db_similar == set(similar_stars)
+        assert set(catalog.names_of(reader.similar_ids(target))) == db_similar
+        lazy_reader = DBReader(
+            dataset="test",
+            session=session,
+            mag_limit=mag_limit,
+            distance_limit=distance_limit,
+            lazy=True,
+        )
+        lazy_target = lazy_reader.get(target.name)
+        assert set(lazy_reader.similar_to(lazy_target)) == db_similar
+        assert not lazy_target.loaded
 
 
 @given(star())
@@ -178,3 +224,27 @@ def test_variable_update_read(star: Star):
             read_star.timeseries.differential_magnitude.array
             == star.timeseries.magnitude.array
         )
+
+
+@given(stars(alphabet=string.printable, min_size=2, max_size=5))
+def test_excluded_complement(stars: List[Star]):
+    # the first star has no median magnitude at all
+    target = stars[0]
+    time = target.timeseries.time
+    target.timeseries = StarTimeseries.from_arrays(
+        time, np.full(len(time), np.nan), np.ones(len(time)), validate=False
+    )
+    with sqlite_memory(future=True) as session:
+        DBWriter(session=session, dataset="test").write(stars)
+        reader = DBReader(
+            dataset="test", session=session, mag_limit=1, distance_limit=100
+        )
+        ensemble = set(reader.ensemble_ids().tolist())
+        for star in stars:
+            star_id = reader.catalog.id_of(star.name)
+            similar = set(reader.similar_ids(star).tolist())
+            excluded = set(reader.excluded_ids(star).tolist())
+            given_ensemble = reader.excluded_ids(star, reader.ensemble_ids())
+            assert set(given_ensemble.tolist()) == excluded
+            assert not similar & excluded
+            assert similar | excluded == ensemble - {star_id}
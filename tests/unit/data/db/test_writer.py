@@ -3,11 +3,12 @@ from math import isclose
 from typing import List
 
 import numpy as np
+import pandas as pd
 from hypothesis import given
 from hypothesis.control import assume, note
 from shutterbug.data.db.model import StarDB, StarDBDataset, StarDBFeatures
 from shutterbug.data.db.writer import DBWriter
-from shutterbug.data.star import Star
+from shutterbug.data.star import Star, StarTimeseries
 from sqlalchemy import bindparam, select
 from tests.unit.data.db.db_test_tools import sqlite_memory
 from tests.unit.data.hypothesis_stars import star, stars
@@ -54,10 +55,8 @@ def test_write(stars: List[Star]):
             assert star.name in read_names
             db_ts = session.scalar(ts_stmt, {"name": star.name})
             for db_row in db_ts.timeseries:
-                db_row.time = db_row.time.replace(
-                    tzinfo=star.timeseries.data.index.tzinfo
-                )
-                star_row = star.timeseries.data.loc[db_row.time]
+                time = pd.Timestamp(db_row.time, tz="UTC")
+                star_row = star.timeseries.data.loc[time]
                 # tests produce very close to 0 values that we don't care about
                 assert isclose(db_row.mag, star_row["magnitude"], abs_tol=1e4)
                 assert isclose(db_row.error, star_row["error"], abs_tol=1e4)
@@ -99,10 +98,9 @@ def test_update_timeseries(star: Star):
         )
         assert len(db_star.timeseries) == len(star.timeseries.magnitude)
         for row in db_star.timeseries:
-            row.time = row.time.replace(tzinfo=star.timeseries.data.index.tzinfo)
-
-            assert isclose(mag[row.time], row.adm)
-            assert isclose(error[row.time], row.ade)
+            time = pd.Timestamp(row.time, tz="UTC")
+            assert isclose(mag[time], row.adm)
+            assert isclose(error[time], row.ade)
 
 
 @given(star())
@@ -131,3 +129,74 @@ def test_update_features(star: Star):
             assert row.iqr == 123.0
             all_dates.append(row.date)
         assert len(np.unique(all_dates)) == len(features.keys())
+
+
+@given(star())
+def test_append(star: Star):
+    data = star.timeseries.data
+    assume(len(data) >= 2)
+    half = len(data) // 2
+    first, second = [
+        Star(
+            name=star.name,
+            x=star.x,
+            y=star.y,
+            timeseries=StarTimeseries(data=x.copy()),
+        )
+        for x in (data.iloc[:half], data.iloc[half:])
+    ]
+    with sqlite_memory() as session:
+        writer = DBWriter(dataset="test", session=session)
+        writer.write(first)
+        writer.append([second])
+        db_star = session.scalar(
+            select(StarDB)
+            .join(StarDBDataset)
+            .where(StarDB.name == star.name)
+            .where(StarDBDataset.name == "test")
+        )
+        assert len(db_star.timeseries) == len(data)
+        dates = sorted(x.date for x in db_star.features)
+        assert dates == sorted(np.unique(star.timeseries.time.date))
+        # the median is calculated when it is needed, not on every append
+        assert db_star.magnitude_median is None
+        writer.refresh_medians()
+        median = star.timeseries.magnitude.median()
+        if np.isnan(median):
+            assert db_star.magnitude_median is None
+        else:
+            assert isclose(db_star.magnitude_median, median)
+
+
+@given(star())
+def test_update_missing_times(star: Star):
+    data = star.timeseries.data
+    assume(len(data) >= 2)
+    half = len(data) // 2
+    with sqlite_memory() as session:
+        writer = DBWriter(dataset="test", session=session)
+        writer.write(star)
+        # results for only some of the stored rows
+        partial = Star(
+            name=star.name,
+            x=star.x,
+            y=star.y,
+            timeseries=StarTimeseries(data=data.iloc[:half].copy()),
+        )
+        partial.timeseries.differential_magnitude = partial.timeseries.magnitude
+        partial.timeseries.differential_error = partial.timeseries.error
+        writer.update(partial)
+        db_star = session.scalar(
+            select(StarDB)
+            .join(StarDBDataset)
+            .where(StarDB.name == star.name)
+            .where(StarDBDataset.name == "test")
+        )
+        updated = set(partial.timeseries.time.asi8.tolist())
+        for row in db_star.timeseries:
+            if row.time in updated:
+                assert row.adm is not None or np.isnan(
+                    partial.timeseries.magnitude[pd.Timestamp(row.time, tz="UTC")]
+                )
+            else:
+                assert row.adm is None
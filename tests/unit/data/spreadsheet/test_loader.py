@@ -0,0 +1,114 @@
+import csv
+
+import shutterbug.data.spreadsheet.loader_factory as spreadsheet_factory
+from openpyxl import Workbook
+from shutterbug.data.csv.loader import CSVLoader
+from shutterbug.data.file import FileInput
+from shutterbug.data.header import KNOWN_HEADERS
+from shutterbug.data.index import IndexCache
+from shutterbug.data.spreadsheet.loader import SpreadsheetLoader
+from tests.unit.data.csv_test_tools import write_mira_csv
+
+
+def write_mira_workbook(csv_path, path):
+    """Copies a CSV into the first sheet of a workbook, numbers as numbers"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    with csv_path.open(newline="") as f:
+        for i, row in enumerate(csv.reader(f)):
+            if i == 0:
+                sheet.append(row)
+                continue
+            numbers = [float(x) for x in row[2:6]]
+            sheet.append([*row[:2], *numbers, *row[6:8], float(row[8]), float(row[9])])
+    workbook.save(path)
+    return path
+
+
+def test_spreadsheet_matches_csv(tmp_path):
+    names = ["Star-1", "Star-2", "Star-3"]
+    csv_path = write_mira_csv(tmp_path / "night.csv", names, epochs=4)
+    path = write_mira_workbook(csv_path, tmp_path / "night.xlsx")
+    loader = spreadsheet_factory.make_loader(path)
+    assert isinstance(loader, SpreadsheetLoader)
+    from_csv = CSVLoader(csv_path, KNOWN_HEADERS[0])
+    assert loader.names == names
+    assert len(loader) == len(from_csv)
+    for from_sheet, from_rows in zip(loader, from_csv):
+        assert from_sheet.name == from_rows.name
+        assert from_sheet == from_rows
+    assert loader.get("Star-2") == from_csv.get("Star-2")
+    assert loader.get("Star-9") is None
+
+
+def test_spreadsheet_index_cached(tmp_path):
+    names = ["Star-1", "Star-2"]
+    csv_path = write_mira_csv(tmp_path / "night.csv", names, epochs=3)
+    path = write_mira_workbook(csv_path, tmp_path / "night.xlsx")
+    cache = IndexCache(tmp_path / "index")
+    assert spreadsheet_factory.make_loader(path, index_cache=cache).names == names
+    entry = IndexCache(tmp_path / "index").get(path)
+    assert entry is not None
+    assert list(entry.stars["Star-2"]) == [3, 5, 7]
+    loader = spreadsheet_factory.make_loader(path, index_cache=IndexCache(cache.folder))
+    assert loader.indexed_names() == names
+
+
+def test_spreadsheet_from_file_input(tmp_path):
+    csv_path = write_mira_csv(tmp_path / "night.csv", ["Star-1"], epochs=3)
+    (tmp_path / "sheets").mkdir()
+    write_mira_workbook(csv_path, tmp_path / "sheets" / "night.xlsx")
+    loaders = list(FileInput(tmp_path / "sheets"))
+    assert len(loaders) == 1
+    assert isinstance(loaders[0], SpreadsheetLoader)
+
+
+def test_spreadsheet_leading_blank_rows(tmp_path):
+    names = ["Star-1", "Star-2"]
+    csv_path = write_mira_csv(tmp_path / "night.csv", names, epochs=3)
+    workbook = Workbook()
+    sheet = workbook.active
+    with csv_path.open(newline="") as f:
+        for i, row in enumerate(csv.reader(f)):
+            values = row
+            if i > 0:
+                numbers = [float(x) for x in row[2:6]]
+                values = [*row[:2], *numbers, *row[6:8], float(row[8]), float(row[9])]
+            # header starts on the third row
+            for column, value in enumerate(values, start=1):
+                sheet.cell(row=i + 3, column=column, value=value)
+    path = tmp_path / "night.xlsx"
+    workbook.save(path)
+    loader = spreadsheet_factory.make_loader(path)
+    assert loader.names == names
+    from_csv = CSVLoader(csv_path, KNOWN_HEADERS[0])
+    for from_sheet, from_rows in zip(loader, from_csv):
+        assert from_sheet == from_rows
+    assert loader.get("Star-2") == from_csv.get("Star-2")
+
+
+def test_spreadsheet_read_once(tmp_path, monkeypatch):
+    names = [f"Star-{idx}" for idx in range(4)]
+    csv_path = write_mira_csv(tmp_path / "night.csv", names, epochs=5)
+    path = write_mira_workbook(csv_path, tmp_path / "night.xlsx")
+    loader = spreadsheet_factory.make_loader(path)
+    reads = []
+    numbered_rows = SpreadsheetLoader._numbered_rows
+
+    def counted_rows(self):
+        reads.append(1)
+        yield from numbered_rows(self)
+
+    monkeypatch.setattr(SpreadsheetLoader, "_numbered_rows", counted_rows)
+    # parsed in chunks smaller than a single frame of the sheet
+    monkeypatch.setattr("shutterbug.data.spreadsheet.loader.SHEET_CHUNK_ROWS", 3)
+    from_csv = CSVLoader(csv_path, KNOWN_HEADERS[0])
+    for name in reversed(names):
+        from_sheet = loader.get(name)
+        assert from_sheet == from_csv.get(name)
+        assert from_sheet.timeseries.time.equals(from_csv.get(name).timeseries.time)
+    assert loader.get("Star-9") is None
+    assert [x.name for x in loader] == names
+    assert loader.names == names
+    # every star is read back from the one pass over the sheet
+    assert len(reads) == 1
@@ -0,0 +1,29 @@
+import numpy as np
+from shutterbug.data.axis import TimeAxisRegistry
+from shutterbug.data.star import from_time_ns
+
+
+def test_identical_times_share_index():
+    registry = TimeAxisRegistry()
+    first, first_axis, first_mask = registry.intern(from_time_ns([1, 2, 3]))
+    second, second_axis, second_mask = registry.intern(from_time_ns([1, 2, 3]))
+    assert first is second
+    assert first_axis is second_axis
+    assert first_mask is None and second_mask is None
+    assert len(registry) == 1
+
+
+def test_missing_epochs_masked():
+    registry = TimeAxisRegistry()
+    _, axis, _ = registry.intern(from_time_ns([1, 2, 3, 4]))
+    time, missing_axis, mask = registry.intern(from_time_ns([1, 3]))
+    assert missing_axis is axis
+    assert list(mask) == [True, False, True, False]
+    assert axis.time[mask].equals(time)
+    assert np.array_equal(
+        axis.expand([5.0, 6.0], mask), [5.0, np.nan, 6.0, np.nan], equal_nan=True
+    )
+    # times outside of the axis get their own
+    _, other_axis, other_mask = registry.intern(from_time_ns([1, 5]))
+    assert other_axis is not axis
+    assert other_mask is None
@@ -0,0 +1,19 @@
+import numpy as np
+from shutterbug.data.catalog import StarCatalog
+
+
+def test_catalog_ids():
+    catalog = StarCatalog.from_names(["a", "b", "c"], keys=[10, 4, 7])
+    assert len(catalog) == 3
+    assert "b" in catalog and "d" not in catalog
+    assert catalog.id_of("c") == 2
+    assert list(catalog.ids_of(["c", "a"])) == [2, 0]
+    assert list(catalog.ids_of_keys([7, 10])) == [0, 2]
+    assert catalog.names_of(np.asarray([1, 2])) == ["b", "c"]
+    assert catalog.keys_of([1, 2]) == [4, 7]
+
+
+def test_catalog_default_keys():
+    catalog = StarCatalog.from_names(["a", "b"])
+    assert catalog.keys_of([0, 1]) == [0, 1]
+    assert catalog.ids_of([]).dtype == np.int64
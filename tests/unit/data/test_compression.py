@@ -0,0 +1,47 @@
+import bz2
+import gzip
+import lzma
+
+import pytest
+from shutterbug.data.compression import data_suffix, open_file
+from shutterbug.data.file import FileInput
+from tests.unit.data.csv_test_tools import write_mira_csv
+
+COMPRESSORS = {".gz": gzip.compress, ".bz2": bz2.compress, ".xz": lzma.compress}
+
+
+def test_data_suffix(tmp_path):
+    assert data_suffix(tmp_path / "night.csv.gz") == ".csv"
+    assert data_suffix(tmp_path / "night.csv.xz") == ".csv"
+    assert data_suffix(tmp_path / "night.csv") == ".csv"
+    assert data_suffix(tmp_path / "night.gz") == ""
+
+
+@pytest.mark.parametrize("suffix", COMPRESSORS.keys())
+def test_compressed_loading(tmp_path, suffix):
+    names = ["Star-1", "Star-2", "Star-3"]
+    plain = write_mira_csv(tmp_path / "night.csv", names, epochs=4)
+    folder = tmp_path / "compressed"
+    folder.mkdir()
+    compressed = folder / f"night.csv{suffix}"
+    compressed.write_bytes(COMPRESSORS[suffix](plain.read_bytes()))
+    with open_file(compressed) as f:
+        assert f.read() == plain.read_bytes()
+    plain_loader = next(iter(FileInput(plain)))
+    compressed_loader = next(iter(FileInput(compressed)))
+    assert compressed_loader.names == plain_loader.names
+    for compressed_star, plain_star in zip(compressed_loader, plain_loader):
+        assert compressed_star == plain_star
+    assert compressed_loader.get("Star-2") == plain_loader.get("Star-2")
+    columnar = next(iter(FileInput(compressed, loader_options={"engine": "c"})))
+    assert columnar.get("Star-3") == plain_loader.get("Star-3")
+
+
+def test_zstd_loading(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    plain = write_mira_csv(tmp_path / "night.csv", ["Star-1", "Star-2"])
+    compressed = tmp_path / "night.csv.zst"
+    compressed.write_bytes(zstandard.ZstdCompressor().compress(plain.read_bytes()))
+    plain_loader = next(iter(FileInput(plain)))
+    compressed_loader = next(iter(FileInput(compressed)))
+    assert compressed_loader.get("Star-2") == plain_loader.get("Star-2")
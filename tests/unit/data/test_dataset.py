@@ -1,11 +1,15 @@
+import string
+from typing import List
+from unittest.mock import patch
 
 from hypothesis import given
 from shutterbug.data.dataset import Dataset
 from shutterbug.data.db.reader import DBReader
 from shutterbug.data.db.writer import DBWriter
+from shutterbug.data.matrix import StarMatrix
 from shutterbug.data.star import Star
 from tests.unit.data.db.db_test_tools import sqlite_memory
-from tests.unit.data.hypothesis_stars import star
+from tests.unit.data.hypothesis_stars import star, stars
 
 
 @given(star())
@@ -55,3 +59,32 @@ def test_dataset_variable_update_read(star: Star):
             assert date in read_star.timeseries.features.keys()
             assert read_star.timeseries.features[date]["Inverse Von Neumann"] == 123.0
             assert read_star.timeseries.features[date]["IQR"] == 567.0
+
+
+@given(stars(alphabet=string.ascii_letters, min_size=2, max_size=5))
+def test_reference_ensemble_fetches_ensemble_once(stars: List[Star]):
+    with sqlite_memory(future=True) as session:
+        writer = DBWriter(dataset="test", session=session)
+        reader = DBReader(
+            dataset="test", session=session, mag_limit=1, distance_limit=100
+        )
+        dataset = Dataset(
+            name="test", reader=reader, writer=writer, store_in_memory=False
+        )
+        writer.write(stars)
+        matrix = StarMatrix.from_stars(stars)
+        with patch.object(
+            DBReader, "ensemble_ids", autospec=True, side_effect=DBReader.ensemble_ids
+        ) as ensemble_ids, patch.object(
+            DBReader, "_non_variable", autospec=True, side_effect=DBReader._non_variable
+        ) as non_variable:
+            reference = dataset.reference_ensemble(matrix)
+        assert ensemble_ids.call_count == 1
+        assert non_variable.call_count == 0
+        for star in stars:
+            excluded = reference.excluded[matrix.column(star.name)].indices
+            expected = [
+                matrix.column(x)
+                for x in reader.catalog.names_of(reader.excluded_ids(star))
+            ]
+            assert sorted(excluded.tolist()) == sorted(expected)
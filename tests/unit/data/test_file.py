@@ -0,0 +1,21 @@
+from shutterbug.data.file import FileInput
+from shutterbug.data.memory import MemoryLoader
+from tests.unit.data.csv_test_tools import write_mira_csv
+
+
+def test_parallel_matches_serial(tmp_path):
+    for night in range(3):
+        names = [f"Star-{night}-{idx}" for idx in range(4)]
+        write_mira_csv(tmp_path / f"night-{night}.csv", names, epochs=night + 2)
+    (tmp_path / "notes.txt").write_text("not photometry")
+    serial = list(FileInput(tmp_path))
+    parallel = list(FileInput(tmp_path, workers=2))
+    assert len(serial) == len(parallel) == 3
+    for serial_loader, parallel_loader in zip(serial, parallel):
+        assert isinstance(parallel_loader, MemoryLoader)
+        assert parallel_loader.names == serial_loader.names
+        for serial_star, parallel_star in zip(serial_loader, parallel_loader):
+            assert serial_star.name == parallel_star.name
+            assert serial_star == parallel_star
+        name = serial_loader.names[0]
+        assert parallel_loader.get(name) == serial_loader.get(name)
@@ -0,0 +1,54 @@
+import os
+
+import shutterbug.data.csv.loader_factory as csv_factory
+from shutterbug.data.csv.loader import CSVLoader
+from shutterbug.data.index import IndexCache, IndexEntry
+from tests.unit.data.csv_test_tools import write_mira_csv
+
+
+def test_index_cache_round_trip(tmp_path):
+    path = write_mira_csv(tmp_path / "night.csv", ["Star-1", "Star-2"])
+    entry = IndexEntry(headers=["name", "mag"], stars={"Star-1": [10, 30]})
+    IndexCache(folder=tmp_path / "index").put(path, entry)
+    # fresh cache so nothing is remembered in memory
+    cached = IndexCache(folder=tmp_path / "index").get(path)
+    assert cached == entry
+
+
+def test_index_cache_invalidated(tmp_path):
+    path = write_mira_csv(tmp_path / "night.csv", ["Star-1", "Star-2"])
+    entry = IndexEntry(headers=["name", "mag"], stars={"Star-1": [10, 30]})
+    IndexCache(folder=tmp_path / "index").put(path, entry)
+    write_mira_csv(path, ["Star-1", "Star-2", "Star-3"])
+    assert IndexCache(folder=tmp_path / "index").get(path) is None
+
+
+def test_index_cache_checksum(tmp_path):
+    path = write_mira_csv(tmp_path / "night.csv", ["Star-1", "Star-2"])
+    stat = path.stat()
+    entry = IndexEntry(headers=["name", "mag"], stars={"Star-1": [10, 30]})
+    IndexCache(folder=tmp_path / "index", checksum=True).put(path, entry)
+    # same size and modification time, different contents
+    path.write_bytes(path.read_bytes().replace(b"Star-2", b"Star-9"))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert IndexCache(folder=tmp_path / "index").get(path) is None
+    assert IndexCache(folder=tmp_path / "index", checksum=True).get(path) is None
+
+
+def test_loader_reuses_index(tmp_path, monkeypatch):
+    names = ["Star-1", "Star-2", "Star-3"]
+    path = write_mira_csv(tmp_path / "night.csv", names)
+    first = csv_factory.make_loader(path, index_cache=IndexCache(tmp_path / "index"))
+    assert first.names == names
+
+    def no_scan(self):
+        raise AssertionError("File was rescanned despite a cached index")
+
+    monkeypatch.setattr(CSVLoader, "_indexed_rows", no_scan)
+    monkeypatch.setattr(csv_factory, "_read_file_header", no_scan)
+    second = csv_factory.make_loader(path, index_cache=IndexCache(tmp_path / "index"))
+    assert second.headers == first.headers
+    assert second.names == names
+    monkeypatch.undo()
+    for name in names:
+        assert second.get(name) == first.get(name)
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from shutterbug.data.axis import TimeAxisRegistry
+from shutterbug.data.matrix import StarMatrix
+from shutterbug.data.star import ArrayTimeseries, Star, StarTimeseries, from_time_ns
+
+
+def make_star(name, times, magnitude, registry=None):
+    time = from_time_ns(times)
+    axis, mask = None, None
+    if registry is not None:
+        time, axis, mask = registry.intern(time)
+    data = pd.DataFrame(
+        {
+            "magnitude": np.asarray(magnitude, dtype=np.float32),
+            "error": np.full(len(times), 0.01, dtype=np.float32),
+        },
+        index=time,
+    )
+    timeseries = StarTimeseries(data=data, axis=axis, mask=mask)
+    return Star(name=name, x=len(name), y=2 * len(name), timeseries=timeseries)
+
+
+def test_matrix_round_trip():
+    stars = [
+        make_star("A", [1, 2, 3], [10, 11, 12]),
+        make_star("BB", [2, 3, 4], [13, 14, 15]),
+    ]
+    matrix = StarMatrix.from_stars(stars)
+    assert len(matrix) == 2
+    assert list(matrix.time.asi8) == [1, 2, 3, 4]
+    assert matrix.magnitude.shape == (4, 2)
+    assert matrix.magnitude.dtype == np.float32
+    assert np.isnan(matrix.magnitude[3, 0]) and np.isnan(matrix.magnitude[0, 1])
+    assert list(matrix.median) == [11, 14]
+    for original, view in zip(stars, matrix):
+        assert view == original
+        assert view.timeseries.time.equals(original.timeseries.time)
+    assert matrix.get("C") is None
+
+
+def test_matrix_shares_axis_and_updates():
+    registry = TimeAxisRegistry()
+    stars = [
+        make_star("A", [1, 2, 3], [10, 11, 12], registry),
+        make_star("B", [1, 3], [13, 14], registry),
+    ]
+    matrix = StarMatrix.from_stars(stars)
+    assert matrix.axis is stars[0].timeseries.axis
+    assert list(matrix.observed[:, 1]) == [True, False, True]
+    star = matrix.get("B")
+    assert star.timeseries.axis is matrix.axis
+    star.timeseries.differential_magnitude = star.timeseries.magnitude - 1
+    star.timeseries.differential_error = star.timeseries.error
+    star.variable = True
+    matrix.update(star)
+    assert list(matrix.adm[[0, 2], 1]) == [12, 13]
+    assert matrix.variable[1]
+    assert matrix.get("B") == star
+
+
+def test_matrix_view_drops_rows():
+    registry = TimeAxisRegistry()
+    stars = [
+        make_star("A", [1, 2, 3], [10, 11, 12], registry),
+        make_star("B", [1, 2, 3], [13, 14, 15], registry),
+    ]
+    star = StarMatrix.from_stars(stars).get("A")
+    assert isinstance(star.timeseries, ArrayTimeseries)
+    assert star.timeseries.data.equals(stars[0].timeseries.data)
+    star.timeseries.drop_rows([1])
+    assert list(star.timeseries.time.asi8) == [1, 3]
+    assert list(star.timeseries.magnitude) == [10, 12]
+    assert star.timeseries.axis is None and star.timeseries.mask is None
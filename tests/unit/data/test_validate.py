@@ -1,8 +1,13 @@
 import numpy as np
 import pytest
 from hypothesis import given
-from hypothesis.strategies import floats, lists
-from shutterbug.data.validate import _empty_rows, _has_data, _is_same_length
+from hypothesis.strategies import floats, lists, tuples
+from shutterbug.data.validate import (
+    _empty_rows,
+    _has_data,
+    _is_same_length,
+    validate_batch,
+)
 
 
 @given(lists(lists(floats())))
@@ -47,3 +52,35 @@ def test_has_data(data):
         assert _has_data(data) == False
     else:
         assert _has_data(data) == True
+
+
+@given(
+    lists(
+        lists(
+            tuples(floats(allow_infinity=False), floats(allow_infinity=False)),
+            max_size=5,
+        ),
+        min_size=1,
+    )
+)
+def test_validate_batch(stars):
+    bounds = np.cumsum([0] + [len(x) for x in stars])
+    rows = [row for star in stars for row in star]
+    magnitude = np.asarray([x[0] for x in rows], dtype="float32")
+    error = np.asarray([x[1] for x in rows], dtype="float32")
+    validation = validate_batch(bounds, magnitude, error)
+    assert len(validation.reasons) == len(stars)
+    for idx in range(len(stars)):
+        lower, upper = bounds[idx], bounds[idx + 1]
+        mag, err = magnitude[lower:upper], error[lower:upper]
+        empties = _empty_rows(mag, err)
+        assert list(np.flatnonzero(~validation.mask(idx))) == list(empties)
+        kept = validation.mask(idx)
+        valid = _has_data(mag[kept]) and _has_data(err[kept])
+        assert (validation.reasons[idx] is None) == valid
+        assert validation.valid[idx] == valid
+
+
+def test_validate_batch_lengths():
+    with pytest.raises(ValueError):
+        validate_batch([0, 2], np.zeros(2), np.zeros(1))
@@ -0,0 +1,113 @@
+import numpy as np
+from shutterbug.data.csv.loader import CSVLoader
+from shutterbug.data.db.reader import DBReader
+from shutterbug.data.db.writer import DBWriter
+from shutterbug.data.header import KNOWN_HEADERS
+from shutterbug.data.db.model import StarDB
+from shutterbug.data.index import IndexCache
+from shutterbug.data_nodes import FollowNode, StoreNode
+from sqlalchemy import select
+from tests.unit.data.csv_test_tools import write_mira_csv
+from tests.unit.data.db.db_test_tools import sqlite_memory
+
+
+def test_store_node_single_pass(tmp_path, monkeypatch):
+    names = ["Star-1", "Star-2", "Star-3"]
+    path = write_mira_csv(tmp_path / "night.csv", names)
+    calls = []
+    indexed_rows = CSVLoader._indexed_rows
+
+    def counted_rows(self, *args):
+        calls.append(1)
+        yield from indexed_rows(self, *args)
+
+    monkeypatch.setattr(CSVLoader, "_indexed_rows", counted_rows)
+    with sqlite_memory(future=True) as session:
+        writer = DBWriter(session=session, dataset="test")
+        loader = CSVLoader(path, KNOWN_HEADERS[0])
+        StoreNode(loader, writer, {"Star-2"}).execute()
+        # names are not asked for before the stars are stored
+        assert len(calls) == 1
+        reader = DBReader(dataset="test", session=session)
+        assert sorted(reader.names) == ["Star-1", "Star-3"]
+        StoreNode(CSVLoader(path, KNOWN_HEADERS[0]), writer).execute()
+        assert sorted(reader.names) == names
+        monkeypatch.undo()
+        for name in names:
+            stored = reader.get(name).timeseries
+            expected = loader.get(name).timeseries
+            assert stored.time.equals(expected.time)
+            assert np.allclose(stored.magnitude, expected.magnitude)
+
+
+def test_store_node_uses_cached_index(tmp_path, monkeypatch):
+    names = ["Star-1", "Star-2", "Star-3"]
+    path = write_mira_csv(tmp_path / "night.csv", names)
+    cache = IndexCache(tmp_path / "index")
+    CSVLoader(path, KNOWN_HEADERS[0], index_cache=cache).names
+    read = []
+    got = []
+    indexed_rows = CSVLoader._indexed_rows
+    get = CSVLoader.get
+
+    def counted_rows(self, *args):
+        read.append(1)
+        yield from indexed_rows(self, *args)
+
+    def counted_get(self, name):
+        got.append(name)
+        return get(self, name)
+
+    monkeypatch.setattr(CSVLoader, "_indexed_rows", counted_rows)
+    monkeypatch.setattr(CSVLoader, "get", counted_get)
+    with sqlite_memory(future=True) as session:
+        writer = DBWriter(session=session, dataset="test")
+        reader = DBReader(dataset="test", session=session)
+        loader = CSVLoader(path, KNOWN_HEADERS[0], index_cache=cache)
+        StoreNode(loader, writer, {"Star-2"}).execute()
+        # only the missing stars are read, by seeking to their rows
+        assert read == []
+        assert sorted(got) == ["Star-1", "Star-3"]
+        got.clear()
+        loader = CSVLoader(path, KNOWN_HEADERS[0], index_cache=cache)
+        StoreNode(loader, writer, {"Star-1", "Star-3"}).execute()
+        assert got == ["Star-2"]
+        got.clear()
+        # a file that is fully stored is not read at all
+        loader = CSVLoader(path, KNOWN_HEADERS[0], index_cache=cache)
+        StoreNode(loader, writer, set(reader.names)).execute()
+        assert read == []
+        assert got == []
+        assert sorted(reader.names) == names
+
+
+def test_follow_node_resumes_loaded_file(tmp_path):
+    names = ["Star-1", "Star-2"]
+    path = write_mira_csv(tmp_path / "night.csv", names, epochs=2)
+    with sqlite_memory(future=True) as session:
+        writer = DBWriter(session=session, dataset="test")
+        StoreNode(CSVLoader(path, KNOWN_HEADERS[0]), writer).execute()
+        # rows written after the file was loaded
+        write_mira_csv(path, names, epochs=5)
+        cache = IndexCache(tmp_path / "index")
+        for _ in range(2):
+            loader = CSVLoader(path, KNOWN_HEADERS[0], index_cache=cache)
+            FollowNode([loader], writer, interval=0, polls=1).execute()
+        reader = DBReader(dataset="test", session=session)
+        expected = CSVLoader(path, KNOWN_HEADERS[0])
+        medians = select(StarDB.magnitude_median).where(StarDB.name.in_(names))
+        # appending leaves the medians to be refreshed before processing
+        assert session.scalars(medians).all() == [None, None]
+        writer.refresh_medians()
+        for name in names:
+            stored = reader.get(name).timeseries
+            assert stored.time.equals(expected.get(name).timeseries.time)
+            median = session.scalar(
+                select(StarDB.magnitude_median).where(StarDB.name == name)
+            )
+            assert np.isclose(median, np.median(stored.magnitude))
+        # the index of the followed file is kept for later loads
+        entry = IndexCache(tmp_path / "index").get(path)
+        assert entry is not None
+        for name, offsets in expected._star_count().items():
+            assert list(entry.stars[name]) == list(offsets)
@@ -2,12 +2,27 @@ import string
 from datetime import datetime, timedelta
 from typing import Optional
 
+import numpy as np
 import pandas as pd
+import pytest
 from hypothesis import given
 from hypothesis.strategies import (DrawFn, composite, datetimes, floats,
                                    integers, lists, text)
+from scipy import sparse
+from shutterbug.data.axis import TimeAxisRegistry
+from shutterbug.data.matrix import LeaveOneOut, StarMatrix
 from shutterbug.data.star import Star, StarTimeseries
-from shutterbug.differential import average_differential
+from shutterbug.differential import (_average_difference, _average_error,
+                                     _combine_arrays, _combine_kernel,
+                                     _combine_loops, aggregate_differential,
+                                     aggregate_reference,
+                                     average_differential, field_differential)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def compiled_kernel():
+    # compiled before any example is timed against hypothesis' deadline
+    _combine_kernel()
 
 
 @composite
@@ -93,3 +108,313 @@ def test_photometry(stars):
         target.timeseries.magnitude
     )
     assert len(mod_target.timeseries.differential_error) == len(target.timeseries.error)
+
+
+def _on_axis(stars, registry):
+    on_axis = []
+    for star in stars:
+        data = star.timeseries.data.copy()
+        time, axis, mask = registry.intern(data.index)
+        data.index = time
+        timeseries = StarTimeseries(data=data, axis=axis, mask=mask)
+        on_axis.append(Star(name=star.name, x=star.x, y=star.y, timeseries=timeseries))
+    return on_axis
+
+
+@given(timeseries_stars(min_stars=2, max_stars=4, min_entries=2, max_entries=6))
+def test_photometry_by_position(stars):
+    # one reference star is missing its last epoch
+    data = stars[-1].timeseries.data
+    stars[-1] = Star(
+        name=stars[-1].name,
+        x=0,
+        y=0,
+        timeseries=StarTimeseries(data=data.iloc[:-1].copy()),
+    )
+    registry = TimeAxisRegistry()
+    positional = _on_axis(stars, registry)
+    assert all(x.timeseries.axis is positional[0].timeseries.axis for x in positional)
+    assert positional[0].timeseries.time is positional[0].timeseries.axis.time
+    for idx in range(len(stars)):
+        by_time = average_differential(
+            stars[idx], [x for i, x in enumerate(stars) if i != idx]
+        )
+        by_position = average_differential(
+            positional[idx], [x for i, x in enumerate(positional) if i != idx]
+        )
+        for column in ("differential_magnitude", "differential_error"):
+            expected = getattr(by_time.timeseries, column)
+            result = getattr(by_position.timeseries, column)
+            assert result.index.equals(expected.index)
+            assert np.allclose(result, expected, equal_nan=True)
+
+
+def test_photometry_precision():
+    index = pd.date_range("2020-01-01", periods=4, freq="1min", tz="UTC", name="time")
+    magnitude = np.asarray([[10.1, 10.2, 10.3, 10.4], [12.5, 12.5, 12.6, 12.4]])
+    stars = [
+        Star(
+            name=name,
+            x=0,
+            y=0,
+            timeseries=StarTimeseries.from_arrays(index, mag, np.full(4, 0.01)),
+        )
+        for name, mag in zip("AB", magnitude)
+    ]
+    assert stars[0].timeseries.magnitude.dtype == np.float32
+    target = average_differential(stars[0], stars[1:])
+    adm = target.timeseries.differential_magnitude
+    assert adm.dtype == np.float32
+    assert np.allclose(adm, magnitude[0] - magnitude[1], rtol=0, atol=1e-5)
+
+
+@given(timeseries_stars(min_stars=2, max_stars=4, min_entries=2, max_entries=6))
+def test_field_photometry(stars):
+    # one star is missing its first epoch, one star has no reference stars
+    data = stars[-1].timeseries.data
+    stars[-1] = Star(
+        name=stars[-1].name,
+        x=0,
+        y=0,
+        timeseries=StarTimeseries(data=data.iloc[1:].copy()),
+    )
+    matrix = StarMatrix.from_stars(stars)
+    reference = np.ones((len(stars), len(stars)), dtype=np.bool_)
+    np.fill_diagonal(reference, False)
+    reference[0] = False
+    field_differential(matrix, reference)
+    assert not matrix.differential[0]
+    for idx in range(1, len(stars)):
+        expected = average_differential(
+            stars[idx], [x for i, x in enumerate(stars) if i != idx]
+        ).timeseries
+        result = matrix.get(stars[idx].name).timeseries
+        for column in ("differential_magnitude", "differential_error"):
+            assert getattr(result, column).index.equals(getattr(expected, column).index)
+            assert np.allclose(
+                getattr(result, column),
+                getattr(expected, column),
+                equal_nan=True,
+                rtol=1e-4,
+                atol=1e-3,
+            )
+
+
+@given(timeseries_stars(min_stars=3, max_stars=5, min_entries=2, max_entries=6))
+def test_leave_one_out_photometry(stars):
+    data = stars[-1].timeseries.data
+    stars[-1] = Star(
+        name=stars[-1].name,
+        x=0,
+        y=0,
+        timeseries=StarTimeseries(data=data.iloc[1:].copy()),
+    )
+    count = len(stars)
+    # the last star is variable, the first star excludes the second
+    members = np.ones(count, dtype=np.bool_)
+    members[-1] = False
+    excluded = np.zeros((count, count), dtype=np.bool_)
+    excluded[0, 1] = True
+    ensemble = LeaveOneOut(members=members, excluded=sparse.csr_matrix(excluded))
+    by_ensemble = field_differential(StarMatrix.from_stars(stars), ensemble)
+    by_selection = field_differential(
+        StarMatrix.from_stars(stars), ensemble.selection()
+    )
+    assert list(by_ensemble.differential) == list(by_selection.differential)
+    for array in ("adm", "ade"):
+        assert np.allclose(
+            getattr(by_ensemble, array),
+            getattr(by_selection, array),
+            equal_nan=True,
+            atol=1e-6,
+        )
+
+
+@given(timeseries_stars(min_stars=2, max_stars=4, min_entries=1, max_entries=6))
+def test_kernels(stars):
+    # one reference star is missing its first epoch
+    target = stars[0].timeseries.data.astype(np.float64)
+    reference = [x.timeseries.data.astype(np.float64) for x in stars[1:]]
+    reference[-1].iloc[0] = np.nan
+    reference_mag = np.vstack([x["magnitude"].to_numpy() for x in reference])
+    reference_error = np.vstack([x["error"].to_numpy() for x in reference])
+    reference_series = {
+        column: pd.concat([x[column] for x in reference]).dropna()
+        for column in ("magnitude", "error")
+    }
+    N = reference_series["error"].index.nunique() + 1
+    expected_adm = _average_difference(
+        target["magnitude"], reference_series["magnitude"]
+    )
+    expected_ade = _average_error(target["error"], reference_series["error"])
+    has_magnitude = ~np.isnan(reference_mag)
+    has_error = ~np.isnan(reference_error)
+    sums = [
+        x[:, np.newaxis]
+        for x in (
+            has_magnitude.sum(axis=0, dtype=np.float64),
+            np.where(has_magnitude, reference_mag, 0).sum(axis=0),
+            has_error.sum(axis=0, dtype=np.float64),
+            (np.where(has_error, reference_error, 0) ** 2).sum(axis=0),
+        )
+    ]
+    target_mag = target["magnitude"].to_numpy()[:, np.newaxis]
+    target_error = target["error"].to_numpy()[:, np.newaxis]
+    for combine in (_combine_arrays, _combine_loops, _combine_kernel()):
+        adm, ade = combine(target_mag, target_error, *sums, np.asarray([N]))
+        assert np.allclose(adm[:, 0], expected_adm, equal_nan=True)
+        assert np.allclose(ade[:, 0], expected_ade)
+
+
+@given(timeseries_stars(min_stars=2, max_stars=4, min_entries=2, max_entries=6))
+def test_weighted_photometry(stars):
+    data = stars[-1].timeseries.data
+    stars[-1] = Star(
+        name=stars[-1].name,
+        x=0,
+        y=0,
+        timeseries=StarTimeseries(data=data.iloc[1:].copy()),
+    )
+    matrix = StarMatrix.from_stars(stars)
+    reference = np.ones((len(stars), len(stars)), dtype=np.bool_)
+    np.fill_diagonal(reference, False)
+    field_differential(matrix, reference, weighted=True)
+    for idx in range(len(stars)):
+        expected = average_differential(
+            stars[idx], [x for i, x in enumerate(stars) if i != idx], weighted=True
+        ).timeseries
+        result = matrix.get(stars[idx].name).timeseries
+        for column in ("differential_magnitude", "differential_error"):
+            assert np.allclose(
+                getattr(result, column),
+                getattr(expected, column),
+                equal_nan=True,
+                rtol=1e-4,
+                atol=1e-3,
+            )
+
+
+def test_weighted_photometry_favours_precise_references():
+    index = pd.date_range("2020-01-01", periods=2, freq="1min", tz="UTC", name="time")
+    stars = [
+        Star(
+            name=name,
+            x=0,
+            y=0,
+            timeseries=StarTimeseries.from_arrays(index, [mag] * 2, [error] * 2),
+        )
+        for name, mag, error in (("A", 10, 0.01), ("B", 11, 0.01), ("C", 13, 0.1))
+    ]
+    target = average_differential(stars[0], stars[1:], weighted=True).timeseries
+    # weights of 10000 and 100
+    assert np.allclose(target.differential_magnitude, 10 - (11 * 100 + 13) / 101)
+    assert np.allclose(
+        target.differential_error, np.sqrt(0.01 ** 2 + 1 / 10100), rtol=1e-4
+    )
+
+
+def _copy(star):
+    data = star.timeseries.data.copy()
+    return Star(name=star.name, x=0, y=0, timeseries=StarTimeseries(data=data))
+
+
+@given(timeseries_stars(min_stars=3, max_stars=5, min_entries=2, max_entries=6))
+def test_aggregate_photometry(stars):
+    # one reference star is missing its first epoch, one target its last epoch
+    data = stars[-1].timeseries.data
+    stars[-1] = Star(
+        name=stars[-1].name,
+        x=0,
+        y=0,
+        timeseries=StarTimeseries(data=data.iloc[1:].copy()),
+    )
+    data = stars[1].timeseries.data
+    stars[1] = Star(
+        name=stars[1].name,
+        x=0,
+        y=0,
+        timeseries=StarTimeseries(data=data.iloc[:-1].copy()),
+    )
+    reference = stars[2:]
+    aggregate = aggregate_reference(reference)
+    for weighted in (False, True):
+        # both targets are calculated against the same sums
+        for target in stars[:2]:
+            expected = average_differential(
+                _copy(target), reference, weighted=weighted
+            ).timeseries
+            result = aggregate_differential(
+                _copy(target), aggregate, weighted=weighted
+            ).timeseries
+            for column in ("differential_magnitude", "differential_error"):
+                assert getattr(result, column).index.equals(
+                    getattr(expected, column).index
+                )
+                assert np.allclose(
+                    getattr(result, column),
+                    getattr(expected, column),
+                    equal_nan=True,
+                    rtol=1e-4,
+                    atol=1e-3,
+                )
+
+
+@given(timeseries_stars(min_stars=3, max_stars=5, min_entries=2, max_entries=6))
+def test_field_photometry_shared_references(stars):
+    # every star but the first two has the first two as its reference stars
+    matrix = StarMatrix.from_stars(stars)
+    reference = np.zeros((len(stars), len(stars)), dtype=np.bool_)
+    reference[2:, :2] = True
+    reference[0, 1] = True
+    field_differential(matrix, reference)
+    assert not matrix.differential[1]
+    for idx in [0, *range(2, len(stars))]:
+        references = [stars[1]] if idx == 0 else stars[:2]
+        expected = average_differential(_copy(stars[idx]), references).timeseries
+        result = matrix.get(stars[idx].name).timeseries
+        for column in ("differential_magnitude", "differential_error"):
+            assert np.allclose(
+                getattr(result, column),
+                getattr(expected, column),
+                equal_nan=True,
+                rtol=1e-4,
+                atol=1e-3,
+            )
+
+
+def test_weighted_photometry_by_hand():
+    index = pd.date_range("2020-01-01", periods=4, freq="1min", tz="UTC", name="time")
+    nan = np.nan
+    columns = {
+        "A": ([10, 10, nan, 10], [0.01, 0.02, 0.01, 0.01]),
+        # an error below the floor weighs as much as the floor
+        "B": ([11, 11, 11, 11], [0.01, 0.01, nan, 1e-5]),
+        "C": ([13, nan, 13, 13], [0.1, 0.1, 0.1, 0.1]),
+    }
+    stars = [
+        Star(
+            name=name,
+            x=0,
+            y=0,
+            timeseries=StarTimeseries.from_arrays(index, mag, error),
+        )
+        for name, (mag, error) in columns.items()
+    ]
+    # inverse variance weighted means of B and C, with C missing at the second
+    # epoch and A missing at the third
+    weights = np.asarray([1e4 + 1e2, 1e4, nan, 1e6 + 1e2])
+    mean = np.asarray([11e4 + 13e2, 11e4, nan, 11e6 + 13e2]) / weights
+    adm = np.asarray(columns["A"][0]) - mean
+    ade = np.sqrt(np.asarray(columns["A"][1]) ** 2 + 1 / weights)
+    matrix = StarMatrix.from_stars(stars)
+    reference = np.zeros((3, 3), dtype=np.bool_)
+    reference[0, 1:] = True
+    field_differential(matrix, reference, weighted=True)
+    by_star = average_differential(_copy(stars[0]), stars[1:], weighted=True)
+    for result in (matrix.get("A").timeseries, by_star.timeseries):
+        assert np.allclose(
+            result.differential_magnitude, adm, equal_nan=True, rtol=1e-5, atol=1e-5
+        )
+        assert np.allclose(
+            result.differential_error, ade, equal_nan=True, rtol=1e-4, atol=1e-6
+        )
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+import shutterbug.differential as differential
+from shutterbug.data import Dataset
+from shutterbug.data.db.reader import DBReader
+from shutterbug.data.db.writer import DBWriter
+from shutterbug.data.star import Star, StarTimeseries
+from shutterbug.data_nodes import DatasetLeaf
+from shutterbug.process_nodes import DifferentialNode
+from tests.unit.data.db.db_test_tools import sqlite_memory
+
+
+def test_differential_node_star_by_star():
+    # every time is repeated, so the dataset cannot be held as one matrix
+    time = pd.DatetimeIndex(
+        pd.date_range("2020-01-01", periods=3, freq="1min", tz="UTC").repeat(2),
+        name="time",
+    )
+    positions = {"A": (0, 0), "B": (1, 0), "C": (2, 0), "Far": (1000, 1000)}
+    stars = [
+        Star(
+            name=name,
+            x=x,
+            y=y,
+            timeseries=StarTimeseries.from_arrays(
+                time, 10 + np.arange(len(time)) / 100, np.full(len(time), 0.01)
+            ),
+        )
+        for name, (x, y) in positions.items()
+    ]
+    with sqlite_memory(future=True) as session:
+        writer = DBWriter(session=session, dataset="test")
+        writer.write(stars)
+        reader = DBReader(
+            dataset="test", session=session, mag_limit=1, distance_limit=10
+        )
+        dataset = Dataset("test", reader, writer, store_in_memory=True)
+        dataset._write_cache = []
+        node = DifferentialNode(DatasetLeaf(dataset), differential)
+        # the star without reference stars is skipped rather than stopping the pass
+        list(node.execute())
+        for star in dataset:
+            calculated = star.timeseries.differential_magnitude.notna().any()
+            assert calculated == (star.name != "Far")
+        expected = differential.average_differential(
+            stars[0], dataset.similar_to(stars[0])
+        ).timeseries
+        result = dataset.get_ids(reader.catalog.ids_of(["A"]))[0].timeseries
+        assert np.allclose(
+            result.differential_magnitude, expected.differential_magnitude
+        )
+
+
+class EnsembleOnly:
+    """Photometer without whole field calculation, counting the reference sets
+    it sums"""
+
+    def __init__(self):
+        self.sums = 0
+
+    def average_differential(self, target, reference, weighted=False):
+        return differential.average_differential(target, reference, weighted)
+
+    def aggregate_reference(self, reference):
+        self.sums += 1
+        return differential.aggregate_reference(reference)
+
+    def aggregate_differential(self, target, aggregate, weighted=False):
+        return differential.aggregate_differential(target, aggregate, weighted)
+
+
+def test_differential_node_shares_reference_sums():
+    time = pd.date_range("2020-01-01", periods=4, freq="1min", tz="UTC", name="time")
+    rng = np.random.default_rng(0)
+    # variable stars are never reference stars, so both targets have the
+    # same two reference stars
+    variable = {"R1": False, "R2": False, "T1": True, "T2": True}
+    stars = [
+        Star(
+            name=name,
+            x=0,
+            y=0,
+            timeseries=StarTimeseries.from_arrays(
+                time, 10 + rng.normal(0, 0.1, len(time)), np.full(len(time), 0.01)
+            ),
+            variable=is_variable,
+        )
+        for name, is_variable in variable.items()
+    ]
+    with sqlite_memory(future=True) as session:
+        writer = DBWriter(session=session, dataset="test")
+        writer.write(stars)
+        reader = DBReader(
+            dataset="test", session=session, mag_limit=1, distance_limit=10
+        )
+        dataset = Dataset("test", reader, writer, store_in_memory=True)
+        dataset._write_cache = []
+        photometer = EnsembleOnly()
+        list(DifferentialNode(DatasetLeaf(dataset), photometer).execute())
+        # R1 and R2 against each other, T1 and T2 against both
+        assert photometer.sums == 3
+        for star, original in zip(dataset, stars):
+            expected = differential.average_differential(
+                original, [x for x in stars if not x.variable and x is not original]
+            ).timeseries
+            assert np.allclose(
+                star.timeseries.differential_magnitude,
+                expected.differential_magnitude,
+                atol=1e-5,
+            )
+
+
+def test_differential_node_bounds_reference_sums():
+    time = pd.date_range("2020-01-01", periods=4, freq="1min", tz="UTC", name="time")
+    rng = np.random.default_rng(1)
+    # T1 and T2 share their reference stars, but R1 and R2 are calculated
+    # between them
+    variable = {"T1": True, "R1": False, "R2": False, "T2": True}
+    stars = [
+        Star(
+            name=name,
+            x=0,
+            y=0,
+            timeseries=StarTimeseries.from_arrays(
+                time, 10 + rng.normal(0, 0.1, len(time)), np.full(len(time), 0.01)
+            ),
+            variable=is_variable,
+        )
+        for name, is_variable in variable.items()
+    ]
+    for cached, sums in ((16, 3), (2, 4), (1, 4)):
+        with sqlite_memory(future=True) as session:
+            writer = DBWriter(session=session, dataset="test")
+            writer.write(stars)
+            reader = DBReader(
+                dataset="test", session=session, mag_limit=1, distance_limit=10
+            )
+            dataset = Dataset("test", reader, writer, store_in_memory=True)
+            dataset._write_cache = []
+            photometer = EnsembleOnly()
+            node = DifferentialNode(
+                DatasetLeaf(dataset), photometer, cached_aggregates=cached
+            )
+            list(node.execute())
+            # the sums of T1 are dropped before T2 when too few are held
+            assert photometer.sums == sums
+            for star, original in zip(dataset, stars):
+                expected = differential.average_differential(
+                    original, [x for x in stars if not x.variable and x is not original]
+                ).timeseries
+                assert np.allclose(
+                    star.timeseries.differential_magnitude,
+                    expected.differential_magnitude,
+                    atol=1e-5,
+                )